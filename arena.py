@@ -0,0 +1,109 @@
+"""Arenas larger than the screen: obstacles streamed in by chunk and a camera view.
+
+The world is cut into CHUNK_SIZE squares. An obstacle source says which
+obstacles overlap a chunk, and the ChunkMap keeps only the chunks around
+the view loaded, so collision and drawing costs follow what the player can
+see rather than the size of the world.
+"""
+import random
+
+import pygame
+
+CHUNK_SIZE = 800  # pixels per side
+LOAD_MARGIN = CHUNK_SIZE // 2  # chunks this close to the view are loaded
+UNLOAD_MARGIN = CHUNK_SIZE  # and unloaded once they are this far away
+
+class StaticObstacles:
+    """A fixed list of obstacle rects, handed out by chunk."""
+
+    def __init__(self, rects):
+        self.rects = [pygame.Rect(rect) for rect in rects]
+
+    def chunk(self, cx, cy, chunk_size=CHUNK_SIZE):
+        """(key, rect) for every obstacle overlapping the chunk; keys order obstacles across chunks."""
+        area = pygame.Rect(cx * chunk_size, cy * chunk_size, chunk_size, chunk_size)
+        return [(i, rect) for i, rect in enumerate(self.rects) if rect.colliderect(area)]
+
+class ScatteredObstacles:
+    """Random obstacles generated per chunk from a seed, so any chunk can be rebuilt identically.
+
+    Each obstacle lies inside its own chunk, and none are placed over
+    `keep_clear` (the player's start).
+    """
+
+    def __init__(self, seed, per_chunk=(2, 5), sizes=(40, 220), margin=40, keep_clear=pygame.Rect(0, 0, 200, 200)):
+        self.seed = seed
+        self.per_chunk = per_chunk
+        self.sizes = sizes
+        self.margin = margin
+        self.keep_clear = keep_clear
+
+    def chunk(self, cx, cy, chunk_size=CHUNK_SIZE):
+        # String seeds are hashed the same way on every run and platform
+        rng = random.Random(f"{self.seed}:{cx}:{cy}")
+        obstacles = []
+        for i in range(rng.randint(*self.per_chunk)):
+            width = rng.randint(*self.sizes)
+            height = rng.randint(*self.sizes)
+            x = cx * chunk_size + rng.randint(self.margin, chunk_size - self.margin - width)
+            y = cy * chunk_size + rng.randint(self.margin, chunk_size - self.margin - height)
+            rect = pygame.Rect(x, y, width, height)
+            if not rect.colliderect(self.keep_clear):
+                obstacles.append(((cy, cx, i), rect))
+        return obstacles
+
+def chunk_range(rect, chunk_size=CHUNK_SIZE):
+    """Every (cx, cy) chunk a rect overlaps."""
+    return [(cx, cy)
+            for cx in range(rect.left // chunk_size, (rect.right - 1) // chunk_size + 1)
+            for cy in range(rect.top // chunk_size, (rect.bottom - 1) // chunk_size + 1)]
+
+class ChunkMap:
+    """The chunks of obstacles currently loaded around the view."""
+
+    def __init__(self, bounds, source, obstacle_class, chunk_size=CHUNK_SIZE):
+        self.bounds = bounds
+        self.source = source
+        self.obstacle_class = obstacle_class
+        self.chunk_size = chunk_size
+        self.chunks = {}  # (cx, cy) -> [(key, obstacle)]
+        self.loads = 0
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def area(self):
+        """Bounding rect of the loaded chunks, within the world."""
+        size = self.chunk_size
+        rects = [pygame.Rect(cx * size, cy * size, size, size) for cx, cy in self.chunks]
+        return rects[0].unionall(rects[1:]).clip(self.bounds) if rects else pygame.Rect(0, 0, 0, 0)
+
+    def update(self, view):
+        """Load the chunks near the view and drop far ones. Returns whether anything changed."""
+        wanted = set(chunk_range(view.inflate(2 * LOAD_MARGIN, 2 * LOAD_MARGIN).clip(self.bounds), self.chunk_size))
+        keep = set(chunk_range(view.inflate(2 * UNLOAD_MARGIN, 2 * UNLOAD_MARGIN).clip(self.bounds), self.chunk_size))
+        changed = False
+        for chunk in list(self.chunks):
+            if chunk not in keep:
+                del self.chunks[chunk]
+                changed = True
+        for chunk in wanted - set(self.chunks):
+            self.chunks[chunk] = [(key, self.obstacle_class(*rect))
+                                  for key, rect in self.source.chunk(*chunk, self.chunk_size)]
+            self.loads += 1
+            changed = True
+        return changed
+
+    def obstacles(self):
+        """The loaded obstacles in a fixed order; one overlapping several chunks appears once."""
+        found = {}
+        for chunk in self.chunks.values():
+            for key, obstacle in chunk:
+                found.setdefault(key, obstacle)
+        return [found[key] for key in sorted(found)]
+
+def follow_view(target, view_size, bounds):
+    """The view rect centred on the target rect and kept inside the bounds."""
+    view = pygame.Rect((0, 0), view_size)
+    view.center = target.center
+    return view.clamp(bounds)
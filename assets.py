@@ -0,0 +1,104 @@
+"""Fonts and sounds, loaded in the background or on first use.
+
+Nothing here blocks the first frame: fonts are created when first asked for,
+and the mixer and sound effects are brought up on a background thread. Until
+a sound has loaded, or if audio isn't available at all, playing it does
+nothing.
+"""
+import os
+import sys
+import threading
+import time
+
+import pygame
+
+from world import EVENT_ECHO, EVENT_DEATH, EVENT_SHATTER, EVENT_LEVEL_UP, EVENT_PAUSE
+from voices import VoiceManager, VoicePolicy, NUM_VOICES
+
+MIXER_BUFFER = 512  # samples; smaller is lower latency but needs a faster machine
+LOW_LATENCY_BUFFER = 128
+MIXER_SETTINGS = dict(frequency=44100, size=-16, channels=2, buffer=MIXER_BUFFER)
+
+# Event -> (file, volume, voice policy)
+SOUNDS = {
+    EVENT_ECHO: ('sounds/echo.wav', 0.5, VoicePolicy(priority=1, max_voices=2, cooldown=40)),
+    EVENT_DEATH: ('sounds/death.wav', 0.9, VoicePolicy(priority=3, max_voices=1)),  # Increased death sound volume
+    EVENT_SHATTER: ('sounds/shatter.wav', 0.8, VoicePolicy(priority=1, max_voices=3, cooldown=30)),  # Increased shatter sound volume
+    EVENT_LEVEL_UP: ('sounds/level_up.wav', 0.8, VoicePolicy(priority=2, max_voices=1)),
+    EVENT_PAUSE: ('sounds/pause.wav', 0.3, VoicePolicy(priority=2, max_voices=1, cooldown=100)),
+}
+
+def resource_path(relative_path):
+    """Get the absolute path to a resource, works for dev and PyInstaller"""
+    base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_path, relative_path)
+
+class AssetManager:
+    def __init__(self, sounds=SOUNDS, mixer_settings=MIXER_SETTINGS, background=True, num_voices=NUM_VOICES):
+        self.sound_files = sounds
+        self.mixer_settings = mixer_settings
+        self.background = background
+        self.num_voices = num_voices
+        self.fonts = {}
+        self.sounds = {}
+        self.voices = None
+        self.audio = None  # None until the mixer has been tried, then True or False
+        self.thread = None
+        self.loaded_at = None  # perf_counter() when every sound had been tried
+        self.lock = threading.Lock()
+
+    def font(self, size):
+        """pygame's default font at `size`, created on first use."""
+        font = self.fonts.get(size)
+        if font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            # Same font as SysFont(None, size), without scanning the system fonts
+            font = self.fonts[size] = pygame.font.Font(None, size)
+        return font
+
+    def start(self):
+        """Start loading audio. Without background loading, it happens on the first play() instead."""
+        if self.background and self.thread is None:
+            self.thread = threading.Thread(target=self.load_sounds, name='asset-loader', daemon=True)
+            self.thread.start()
+
+    def wait(self, timeout=None):
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def init_audio(self):
+        if self.audio is None:
+            try:
+                pygame.mixer.init(**self.mixer_settings)
+                self.voices = VoiceManager(self.num_voices)
+                self.audio = True
+            except pygame.error as e:
+                print(f"Could not initialize mixer, continuing without sound: {e}")
+                self.audio = False
+        return self.audio
+
+    def load_sounds(self):
+        with self.lock:
+            if self.loaded_at is not None:
+                return
+            if self.init_audio():
+                for name, (path, volume, _) in self.sound_files.items():
+                    try:
+                        sound = pygame.mixer.Sound(resource_path(path))
+                    except (pygame.error, FileNotFoundError) as e:
+                        print(f"Error loading sound {path}, it will be silent: {e}")
+                        continue
+                    sound.set_volume(volume)
+                    self.sounds[name] = sound
+            self.loaded_at = time.perf_counter()
+
+    def play(self, name):
+        sound = self.sounds.get(name)
+        if sound is None:
+            if self.loaded_at is None and not self.background:
+                self.load_sounds()
+                sound = self.sounds.get(name)
+            if sound is None:
+                return
+        self.voices.play(name, sound, self.sound_files[name][2])
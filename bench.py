@@ -0,0 +1,267 @@
+"""Seeded, uncapped benchmark scenarios with JSON results for comparing commits.
+
+Each scenario builds a World in a known state and steps and renders it as
+fast as possible into a headless display. Frame and per-phase times are
+reported as p50/p95/p99 in milliseconds, alongside allocation counts and
+peak traced memory from a second, untimed pass under tracemalloc.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import numpy as np
+import pygame
+
+import world as world_module
+from world import World, Level, NO_INPUTS, WIDTH, HEIGHT, FPS, MIN_SPAWN_DISTANCE
+from swarm import ENEMY_SIZE
+from headless import random_bot
+from profiler import PhaseTimer, PHASES, RENDER_PHASES
+from render import Renderer, DirtyRectRenderer
+from assets import AssetManager
+from memory import GCController, GC_MODES
+
+PERCENTILES = (50, 95, 99)
+
+def set_level(world, level_number):
+    """Jump a fresh world to a level, with that level's wave."""
+    world.level_number = level_number
+    world.level = Level(level_number)
+    world.enemies.keep(np.zeros(len(world.enemies), dtype=bool))
+    world.spawn_wave()
+
+def scenario_level_1(seed):
+    world = World(seed=seed)
+    return world, random_bot(random.Random(seed)), None
+
+def scenario_level_20(seed):
+    world = World(seed=seed)
+    set_level(world, 20)
+    return world, random_bot(random.Random(seed)), None
+
+def scenario_mass_shatter(seed):
+    """50 enemies shattered on the first frame, then left to fly and fade."""
+    world = World(seed=seed)
+    # One more than gets shattered, so the level doesn't end; none of them move
+    world.level = Level(48)
+    world.enemies.keep(np.zeros(len(world.enemies), dtype=bool))
+    world.spawn_wave()
+    world.enemies.speed[:] = 0
+
+    def setup(frame):
+        if frame == 0:
+            for enemy in list(world.enemies)[:50]:
+                world.shatter_enemy(enemy)
+    return world, lambda world: NO_INPUTS, setup
+
+def scenario_many_echoes(seed):
+    """An echo every frame, so dozens are alive at once."""
+    world = World(seed=seed)
+    set_level(world, 10)
+    bot = random_bot(random.Random(seed))
+    return world, lambda world: bot(world)._replace(echo=True), None
+
+def scenario_dead(seed):
+    """The player dies on the first frame and the fragments settle."""
+    world = World(seed=seed)
+    set_level(world, 5)
+
+    def setup(frame):
+        if frame == 0:
+            world.kill_player()
+    return world, lambda world: NO_INPUTS, setup
+
+def scenario_spawn(seed):
+    """One enemy placed per frame through generate_enemy_position, ten to a wave."""
+    world = World(seed=seed)
+    rng = random.Random(seed)
+
+    def setup(frame):
+        if frame % 10 == 0:
+            world.enemies.keep(np.zeros(len(world.enemies), dtype=bool))
+        pos = world_module.generate_enemy_position(world.player.pos, world.obstacles, world.enemies,
+                                                   MIN_SPAWN_DISTANCE, ENEMY_SIZE, world.bounds, rng)
+        if pos is not None:
+            world.enemies.spawn(*pos, 0, rng=rng)
+    return world, lambda world: NO_INPUTS, setup
+
+def scenario_pursuit(seed):
+    """A hundred enemies chasing a player who can't die, along the shared flow field."""
+    world = World(seed=seed, enemy_ai='pursue')
+    world.systems.remove('check_player_death')
+    set_level(world, 97)
+    bot = random_bot(random.Random(seed))
+    return world, bot, None
+
+SCENARIOS = {
+    'level_1': (scenario_level_1, 1200),
+    'level_20': (scenario_level_20, 1200),
+    'mass_shatter': (scenario_mass_shatter, 600),
+    'many_echoes': (scenario_many_echoes, 1200),
+    'dead': (scenario_dead, 1800),
+    'spawn': (scenario_spawn, 600),
+    'pursuit': (scenario_pursuit, 1200),
+}
+
+def summarize(values, scale=1000):
+    """Percentiles, mean and max; seconds become milliseconds by default."""
+    values = np.asarray(values, dtype=np.float64) * scale
+    if not len(values):
+        return None
+    summary = {f'p{p}': round(float(np.percentile(values, p)), 4) for p in PERCENTILES}
+    summary['mean'] = round(float(values.mean()), 4)
+    summary['max'] = round(float(values.max()), 4)
+    return summary
+
+def run_frames(name, seed, frames, renderer, timer=None, gc_control=None):
+    """Step and render a scenario. Returns per-frame times and statistics."""
+    build, _ = SCENARIOS[name]
+    world, policy, setup = build(seed)
+    dt = 1 / FPS
+    step_times, render_times, frame_times = [], [], []
+    phases = defaultdict(list)
+    blocks = []
+    max_echoes = max_enemies = max_fragments = 0
+    perf_counter = time.perf_counter
+    for frame in range(frames):
+        start = perf_counter()
+        before = sys.getallocatedblocks()
+        if setup is not None:
+            setup(frame)
+        world.step(policy(world), dt)
+        if gc_control is not None:
+            gc_control.update(world.state, world.events)
+        stepped = perf_counter()
+        renderer.render(world)
+        end = perf_counter()
+        blocks.append(sys.getallocatedblocks() - before)
+        step_times.append(stepped - start)
+        render_times.append(end - stepped)
+        frame_times.append(end - start)
+        if timer is not None:
+            totals = timer.take()
+            for phase in {phase for phase, _, _ in PHASES + RENDER_PHASES} | set(totals):
+                phases[phase].append(totals.get(phase, 0.0))
+        max_echoes = max(max_echoes, len(world.echoes))
+        max_enemies = max(max_enemies, len(world.enemies))
+        max_fragments = max(max_fragments, len(world.fragments))
+    return {
+        'step': step_times,
+        'render': render_times,
+        'frame': frame_times,
+        'phases': phases,
+        'blocks': blocks,
+        'world': {
+            'final_state': world.state,
+            'level': world.level_number,
+            'score': world.score,
+            'checksum': world.checksum(),
+            'max_echoes': max_echoes,
+            'max_enemies': max_enemies,
+            'max_fragments': max_fragments,
+            'pools': {'shattered_enemies': dict(world.shattered_pool.stats)},
+        },
+    }
+
+def run_scenario(name, seed, frames, renderer_class, screen, fonts, gc_mode='auto'):
+    # Timed pass
+    gc.collect()
+    collections = [stats['collections'] for stats in gc.get_stats()]
+    gc_control = GCController(gc_mode)
+    gc_control.start()
+    try:
+        with PhaseTimer(PHASES + RENDER_PHASES) as timer:
+            timed = run_frames(name, seed, frames, renderer_class(screen, *fonts), timer, gc_control)
+    finally:
+        gc_control.stop()
+    collections = [stats['collections'] - before for stats, before in zip(gc.get_stats(), collections)]
+
+    # Memory pass; tracemalloc slows everything down, so it isn't timed
+    gc.collect()
+    tracemalloc.start()
+    traced = run_frames(name, seed, frames, renderer_class(screen, *fonts))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    frame_total = sum(timed['frame'])
+    return {
+        'frames': frames,
+        'fps': round(frames / frame_total, 1) if frame_total > 0 else None,
+        'frame_ms': summarize(timed['frame']),
+        'step_ms': summarize(timed['step']),
+        'render_ms': summarize(timed['render']),
+        'phases_ms': {phase: summarize(times) for phase, times in sorted(timed['phases'].items())},
+        'allocations': {
+            'net_blocks_per_frame': summarize(timed['blocks'], scale=1),
+            'gc_collections': collections,
+            'gc_control': gc_control.stats,
+        },
+        'memory': {
+            'peak_traced_bytes': peak,
+            'final_traced_bytes': current,
+        },
+        'world': timed['world'],
+        'deterministic': timed['world']['checksum'] == traced['world']['checksum'],
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help="run only this scenario (repeatable); default is all")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--frames', type=float, default=1.0, help="scale every scenario's frame count")
+    parser.add_argument('--dirty-rects', action='store_true', help="render with the dirty-rectangle renderer")
+    parser.add_argument('--gc', choices=GC_MODES, default='auto', help="garbage collection during the timed pass (see memory.py)")
+    parser.add_argument('--out', default='bench.json', help="where to write the JSON results")
+    args = parser.parse_args()
+
+    pygame.display.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    assets = AssetManager()
+    fonts = (assets.font(36), assets.font(72))
+    renderer_class = DirtyRectRenderer if args.dirty_rects else Renderer
+
+    results = {
+        'commit': git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'renderer': renderer_class.__name__,
+        'gc': args.gc,
+        'scenarios': {},
+    }
+    for name in args.scenario or SCENARIOS:
+        frames = max(1, int(SCENARIOS[name][1] * args.frames))
+        result = run_scenario(name, args.seed, frames, renderer_class, screen, fonts, args.gc)
+        results['scenarios'][name] = result
+        frame = result['frame_ms']
+        print(f"{name:14} {result['fps']:>9} fps  frame p50 {frame['p50']:.3f}  p95 {frame['p95']:.3f}  "
+              f"p99 {frame['p99']:.3f} ms  peak {result['memory']['peak_traced_bytes'] / 1024:.0f} KiB")
+
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -87,9 +87,9 @@ echo "Setting up a virtual environment..."
 python3 -m venv venv
 source venv/bin/activate
 
-# Install Pygame
-echo "Installing Pygame..."
-pip install pygame
+# Install Pygame and NumPy
+echo "Installing Pygame and NumPy..."
+pip install pygame numpy
 
 # Run the game
 echo "Running the game..."
@@ -0,0 +1,253 @@
+"""Video capture of the game screen, encoded off the game thread.
+
+Each captured frame is a straight copy of the screen's pixel memory into
+one of a ring of preallocated buffers, which is all the game thread pays
+for. A worker thread turns the buffers into RGB and hands them to a sink:
+a numbered PNG sequence, or an ffmpeg process fed raw frames through a
+pipe. The video runs at the tick rate: each capture stands for the ticks
+simulated since the last one, so it plays back at game speed whatever the
+frame rate. Live capture drops frames when every buffer is still waiting to
+be encoded, so the game never waits for it, and the previous frame is shown
+for the dropped ticks instead; offline capture (capturing a replay, below)
+waits instead, so every tick ends up in the video.
+
+    python3 capture.py replays/<file>.replay clip.mp4
+
+renders a recorded session headlessly, as fast as it can encode. PNGs are
+compressed on one thread per core; with only a core or two, capture to a
+video file (ffmpeg) to run faster than real time.
+"""
+import argparse
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+import numpy as np
+import pygame
+
+from world import World, WIDTH, HEIGHT, FPS
+from replay import Replay
+
+RING_SIZE = 8  # frame buffers; enough to ride out an encoder hiccup of a few frames
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.webm', '.mov', '.avi')
+
+class ImageSequenceSink:
+    """Writes frames as numbered PNG files into a directory.
+
+    PNG compression is the slow part, and pygame lets go of the GIL while it
+    saves, so frames are copied into a small ring of their own and saved by
+    `workers` threads at once. write() waits while they are all busy.
+    """
+
+    def __init__(self, directory, size, workers=None):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.size = size
+        workers = workers or os.cpu_count() or 1
+        width, height = size
+        self.buffers = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(2 * workers)]
+        self.free = queue.Queue()
+        for i in range(len(self.buffers)):
+            self.free.put(i)
+        self.filled = queue.Queue()
+        self.error = None
+        self.threads = [threading.Thread(target=self.run, name='png-writer', daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def write(self, rgb, number):
+        if self.error is not None:
+            raise self.error
+        i = self.free.get()
+        np.copyto(self.buffers[i], rgb)
+        self.filled.put((i, number))
+
+    def close(self):
+        for _ in self.threads:
+            self.filled.put(None)
+        for thread in self.threads:
+            thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def run(self):
+        while True:
+            item = self.filled.get()
+            if item is None:
+                return
+            i, number = item
+            if self.error is None:
+                try:
+                    image = pygame.image.frombuffer(self.buffers[i], self.size, 'RGB')
+                    pygame.image.save(image, os.path.join(self.directory, f"frame_{number:06d}.png"))
+                except (OSError, pygame.error) as e:
+                    self.error = e
+            self.free.put(i)
+
+class FFmpegSink:
+    """Pipes raw RGB frames into an ffmpeg process that encodes them to a video file."""
+
+    def __init__(self, path, size, fps=FPS):
+        executable = shutil.which('ffmpeg')
+        if executable is None:
+            raise RuntimeError("ffmpeg was not found on the PATH; capture to a directory of PNGs instead")
+        width, height = size
+        self.process = subprocess.Popen(
+            [executable, '-loglevel', 'error', '-y',
+             '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+             '-pix_fmt', 'yuv420p', path],
+            stdin=subprocess.PIPE)
+
+    def write(self, rgb, number):
+        self.process.stdin.write(rgb)
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+def open_sink(path, size, fps=FPS):
+    """A video file for known video extensions, otherwise a directory of PNGs."""
+    if path.lower().endswith(VIDEO_EXTENSIONS):
+        return FFmpegSink(path, size, fps)
+    return ImageSequenceSink(path, size)
+
+class VideoCapture:
+    """Copies frames into a ring of reused buffers for a worker thread to encode.
+
+    With `block`, capture() waits for a free buffer instead of dropping the frame.
+    """
+
+    def __init__(self, surface, sink, ring_size=RING_SIZE, block=False):
+        if surface.get_bytesize() != 4:
+            raise ValueError("Capture needs a 32-bit surface")
+        self.sink = sink
+        self.block = block
+        self.size = surface.get_size()
+        width, height = self.size
+        # Where R, G and B sit within each 4-byte pixel
+        self.channels = [shift // 8 for shift in surface.get_shifts()[:3]]
+        self.buffers = [np.empty((height, surface.get_pitch()), dtype=np.uint8) for _ in range(ring_size)]
+        # The worker's conversion buffer, which also keeps the last frame to repeat for dropped ones
+        self.rgb = np.zeros((height, width, 3), dtype=np.uint8)
+        self.free = queue.Queue()
+        for i in range(ring_size):
+            self.free.put(i)
+        self.filled = queue.Queue()
+        self.thread = None
+        self.error = None
+        self.stats = {'captured': 0, 'dropped': 0, 'encoded': 0, 'copy_ms': 0.0}
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='video-capture', daemon=True)
+            self.thread.start()
+
+    def capture(self, surface, ticks=1):
+        """Copy the surface into the next free buffer, as the video's next `ticks` frames.
+
+        Returns False if nothing was copied: a frame drawn between ticks
+        isn't recorded, and a dropped frame repeats the previous one instead.
+        """
+        if ticks < 1:
+            return False
+        try:
+            i = self.free.get() if self.block else self.free.get_nowait()
+        except queue.Empty:
+            self.filled.put((None, ticks))
+            self.stats['dropped'] += 1
+            return False
+        start = time.perf_counter()
+        buffer = self.buffers[i]
+        buffer.reshape(-1)[:] = memoryview(surface.get_buffer())
+        self.filled.put((i, ticks))
+        self.stats['captured'] += 1
+        self.stats['copy_ms'] += (time.perf_counter() - start) * 1000
+        return True
+
+    def close(self):
+        """Encode the frames still queued, then stop the worker and the sink."""
+        if self.thread is not None:
+            self.filled.put(None)
+            self.thread.join()
+            self.thread = None
+        try:
+            self.sink.close()
+        except (OSError, pygame.error) as e:
+            self.error = self.error or e
+        if self.error is not None:
+            print(f"Video capture stopped early: {self.error}")
+
+    def run(self):
+        width, height = self.size
+        rgb = self.rgb
+        while True:
+            item = self.filled.get()
+            if item is None:
+                return
+            i, ticks = item
+            if self.error is None:
+                if i is not None:
+                    pixels = self.buffers[i][:, :width * 4].reshape(height, width, 4)
+                    for channel, offset in enumerate(self.channels):
+                        rgb[:, :, channel] = pixels[:, :, offset]
+                try:
+                    for _ in range(ticks):
+                        self.sink.write(rgb, self.stats['encoded'])
+                        self.stats['encoded'] += 1
+                except (OSError, pygame.error) as e:
+                    # Keep draining so capture() never waits on a dead sink
+                    self.error = e
+            if i is not None:
+                self.free.put(i)
+
+def capture_replay(replay, output, every=1, dirty_rects=False):
+    """Render a replay into `output` one frame per `every` ticks, as fast as the encoder goes."""
+    from render import Renderer, DirtyRectRenderer
+
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    renderer_class = DirtyRectRenderer if dirty_rects else Renderer
+    renderer = renderer_class(screen, pygame.font.Font(None, 36), pygame.font.Font(None, 72))
+    capture = VideoCapture(screen, open_sink(output, screen.get_size(), replay.tick_rate / every), block=True)
+    capture.start()
+    world = World(seed=replay.seed)
+    dt = replay.dt
+    try:
+        for tick, inputs in enumerate(replay.inputs()):
+            world.step(inputs, dt)
+            if tick % every == 0:
+                renderer.render(world)
+                capture.capture(screen)
+    finally:
+        capture.close()
+    return world, capture
+
+def main():
+    # Set here rather than on import, since the game imports this module too
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    parser = argparse.ArgumentParser(description="Render a replay to a video or a PNG sequence without a window.")
+    parser.add_argument('replay')
+    parser.add_argument('output', help=f"a video file ({', '.join(VIDEO_EXTENSIONS)}, needs ffmpeg) or a directory")
+    parser.add_argument('--every', type=int, default=1, help="capture one frame every N ticks")
+    parser.add_argument('--dirty-rects', action='store_true', help="render with the dirty-rectangle renderer")
+    args = parser.parse_args()
+
+    replay = Replay.load(args.replay)
+    start = time.perf_counter()
+    try:
+        world, capture = capture_replay(replay, args.output, args.every, args.dirty_rects)
+    except (RuntimeError, OSError) as e:
+        print(f"Could not capture: {e}")
+        raise SystemExit(1)
+    elapsed = time.perf_counter() - start
+    frames = capture.stats['encoded']
+    print(f"{frames} frames ({world.steps} ticks) in {elapsed:.2f} s: {world.steps / elapsed / replay.tick_rate:.1f}x real time, "
+          f"{capture.stats['copy_ms'] / max(frames, 1):.2f} ms per frame copy")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Array-backed echoes of the player.
+
+Every echo is a row in one EntityStore: a window (end, length) onto the
+shared history buffer and how far it has replayed. All echoes step one
+sample back along the player's path per tick in a single vectorised update.
+"""
+import numpy as np
+import pygame
+
+from fragments import SpriteCache
+from soa import EntityStore, round_half_away, lerp, to_view
+
+class EchoStore(EntityStore):
+    FIELDS = {
+        'x': np.int64,  # rect topleft
+        'y': np.int64,
+        'end': np.int64,  # history index just after the newest sample replayed
+        'length': np.int64,  # samples to replay
+        'step': np.int64,  # samples replayed so far
+        'handle': np.int64,
+        'px': np.float64,  # topleft before the current step, for drawing between steps
+        'py': np.float64,
+    }
+
+    def __init__(self, history, size, color, capacity=16):
+        super().__init__(capacity)
+        self.history = history
+        self.size = size
+        self.color = color
+        self.sprites = SpriteCache()
+
+    def spawn(self):
+        """Start an echo from the newest history sample. Returns its handle."""
+        i = self.spawn_rows(1)
+        self._end[i] = self.history.written
+        self._length[i] = len(self.history)
+        self._step[i] = 0
+        self._x[i] = self._y[i] = 0
+        self._px[i] = self._py[i] = 0
+        return int(self._handle[i])
+
+    def advance(self):
+        """Move every echo one sample back along the path; echoes already at the end are despawned.
+
+        Returns a mask of the rows that moved.
+        """
+        step = self.step
+        live = step < self.length
+        if not live.all():
+            for handle in self.handle[~live].tolist():
+                self.despawn(handle)
+        if not live.any():
+            return live
+        history = self.history
+        positions = history.positions[(self.end[live] - step[live] - 1) % history.capacity].astype(np.float64)
+        self.x[live] = round_half_away(positions[:, 0])
+        self.y[live] = round_half_away(positions[:, 1])
+        # A new echo has no previous position to draw from
+        new = step == 0
+        if new.any():
+            self.px[new] = self.x[new]
+            self.py[new] = self.y[new]
+        step[live] += 1
+        return live
+
+    def save_previous(self):
+        self.px[:] = self.x
+        self.py[:] = self.y
+
+    def rect_array(self, alpha=1.0):
+        """(n, 4) int64 array of the echoes' rects as x, y, w, h."""
+        rects = np.empty((self.count, 4), dtype=np.int64)
+        if alpha >= 1:
+            rects[:, 0] = self.x
+            rects[:, 1] = self.y
+        else:
+            rects[:, 0] = round_half_away(lerp(self.px, self.x, alpha))
+            rects[:, 1] = round_half_away(lerp(self.py, self.y, alpha))
+        rects[:, 2:] = self.size
+        return rects
+
+    def rects(self, alpha=1.0, view=None):
+        return [pygame.Rect(rect) for rect in to_view(self.rect_array(alpha), view).tolist()]
+
+    def draw(self, surface, alpha=1.0, view=None):
+        """Draw every echo in view with one batched blit."""
+        if not self.count:
+            return
+        sprite = self.sprites.get(self.color, self.size, None)
+        sequence = [(sprite, (x, y)) for x, y in to_view(self.rect_array(alpha), view)[:, :2].tolist()]
+        fblits = getattr(surface, 'fblits', None)
+        if fblits is not None:
+            fblits(sequence)
+        else:
+            surface.blits(sequence, doreturn=False)
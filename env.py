@@ -0,0 +1,667 @@
+"""Gym-style environments for training bots on the game's rules.
+
+VectorEnv runs N independent games in lockstep without any World objects:
+the rules of the standard single-player arena are applied to all of them at
+once, with every piece of state held as an (N, ...) array (player positions,
+history rings, echo, enemy and fragment slots), so a step is a fixed number
+of NumPy operations however many games there are, and finished games are
+reset in place. Observations are stacked into preallocated arrays, one row
+per game. EchoesEnv is the single-game version with the usual
+reset()/step() interface.
+
+The batched rules follow world.py tick for tick. Enemies live in one
+EnemySwarm and fragments in one FragmentStore, each with a fixed block of
+rows per game, and are moved by the same EnemySwarm.move and
+FragmentStore.update that World uses; only the player, the echoes and wave
+placement are batched here. Each game keeps fragments for its last
+BURST_SLOTS shattered enemies only, and the randomness comes from one
+generator for the batch, drawn in a different order, so games don't replay
+the same as a World with the same seed.
+
+Spaces come from gymnasium when it is installed; otherwise small stand-ins
+with the same attributes (shape, dtype, n, sample()) are used.
+"""
+import argparse
+import os
+import time
+import warnings
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import numpy as np
+import pygame
+
+from world import (
+    Inputs, Obstacle, FPS, WIDTH, HEIGHT, DEFAULT_TUNING, DEFAULT_OBSTACLES, PLAYER_SIZE, PLAYER_SPEED, PLAYER_STARTS,
+    FRAGMENTS_PER_BURST, GREEN,
+)
+from swarm import EnemySwarm, ENEMY_SIZE
+from fragments import FragmentStore, push_apart
+from spawn import SpawnPlanner
+from soa import round_half_away
+
+MAX_ENEMIES = 32  # enemies beyond this are left out of the observation, farthest first
+MAX_ECHOES = 8
+GRID_CELL = 40  # pixels per fragment occupancy cell
+MAX_EPISODE_STEPS = 5 * 60 * FPS
+
+BURST_SLOTS = 8  # shattered enemies each game keeps fragments for
+FRAGMENT_SIZE = ENEMY_SIZE // 5
+SPAWN_CANDIDATES = 8  # free cells tried per enemy in a wave
+FIRST_WAVE_SPACING = 50  # World spaces its first wave as if enemies were this big
+
+KILL_REWARD = 1.0
+DEATH_REWARD = -5.0
+SURVIVAL_REWARD = 0.01  # per step
+
+# Action n moves in DIRECTIONS[n // 2] and echoes when n is odd
+DIRECTIONS = [(0, 0), (0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1)]
+ACTIONS = [Inputs(left=dx < 0, right=dx > 0, up=dy < 0, down=dy > 0, echo=echo)
+           for dx, dy in DIRECTIONS for echo in (False, True)]
+# The same as arrays: the unit movement and echo flag of each action
+ACTION_DX = np.array([dx for dx, dy in DIRECTIONS for _ in (False, True)], np.float64)
+ACTION_DY = np.array([dy for dx, dy in DIRECTIONS for _ in (False, True)], np.float64)
+ACTION_LENGTH = np.maximum(np.hypot(ACTION_DX, ACTION_DY), 1)
+ACTION_DX /= ACTION_LENGTH
+ACTION_DY /= ACTION_LENGTH
+ACTION_ECHO = np.array([echo for _ in DIRECTIONS for echo in (False, True)])
+
+try:
+    from gymnasium.spaces import Box, Discrete, MultiDiscrete, Dict
+except ImportError:
+    class Box:
+        def __init__(self, low, high, shape, dtype=np.float32):
+            self.low, self.high, self.shape, self.dtype = low, high, shape, np.dtype(dtype)
+
+        def sample(self):
+            return np.random.uniform(self.low, self.high, self.shape).astype(self.dtype)
+
+    class Discrete:
+        def __init__(self, n):
+            self.n, self.shape, self.dtype = n, (), np.dtype(np.int64)
+
+        def sample(self):
+            return int(np.random.randint(self.n))
+
+    class MultiDiscrete:
+        def __init__(self, nvec):
+            self.nvec = np.asarray(nvec)
+            self.shape, self.dtype = self.nvec.shape, np.dtype(np.int64)
+
+        def sample(self):
+            return np.random.randint(self.nvec)
+
+    class Dict(dict):
+        def sample(self):
+            return {name: space.sample() for name, space in self.items()}
+
+def observation_spaces(num_envs, max_enemies=MAX_ENEMIES, max_echoes=MAX_ECHOES, width=WIDTH, height=HEIGHT):
+    """Shapes of each observation array; num_envs None leaves out the batch dimension."""
+    batch = () if num_envs is None else (num_envs,)
+    grid = (height // GRID_CELL, width // GRID_CELL)
+    return Dict({
+        # x, y (as fractions of the arena), alive
+        'player': Box(0, 1, batch + (3,), np.float32),
+        # x, y, direction x, direction y, present
+        'enemies': Box(-1, 1, batch + (max_enemies, 5), np.float32),
+        # x, y, fraction of its replay left, present
+        'echoes': Box(0, 1, batch + (max_echoes, 4), np.float32),
+        'fragments': Box(0, 1, batch + grid, np.float32),
+    })
+
+class SlotColumns:
+    """(games, slots) arrays, one per field, for the entities each game has a few of.
+
+    Like ColumnStore, the columns are named in FIELDS (here passed in) and
+    grow() adds slots by doubling. A slot is in use while `active` is set.
+    """
+
+    def __init__(self, fields, games, slots):
+        self.fields = dict(fields, active=np.bool_)
+        self.slots = slots
+        for name, dtype in self.fields.items():
+            setattr(self, name, np.zeros((games, slots), dtype=dtype))
+
+    def grow(self, needed):
+        slots = self.slots
+        while slots < needed:
+            slots *= 2
+        for name in self.fields:
+            old = getattr(self, name)
+            new = np.zeros((len(old), slots), dtype=old.dtype)
+            new[:, :self.slots] = old
+            setattr(self, name, new)
+        self.slots = slots
+
+class SwarmSlots:
+    """An EnemySwarm with `slots` rows for each game, game after game, seen as (games, slots) arrays.
+
+    Rows never move: a slot is in use while `active` is set, and move()
+    runs World's EnemySwarm.move on the slots in use of every game at once.
+    grow() adds slots by doubling, as SlotColumns does.
+    """
+
+    def __init__(self, games, slots, bounds):
+        self.games = games
+        self.slots = slots
+        self.bounds = bounds
+        self.active = np.zeros((games, slots), bool)
+        self.build()
+
+    def build(self):
+        self.swarm = EnemySwarm(self.bounds, GREEN, 1 / FPS, capacity=self.games * self.slots)
+        self.swarm.add_rows(self.games * self.slots)
+        self.swarm.size[:] = ENEMY_SIZE
+        for name in EnemySwarm.FIELDS:
+            setattr(self, name, getattr(self.swarm, '_' + name).reshape(self.games, self.slots))
+
+    def grow(self, needed):
+        old = {name: getattr(self, name) for name in EnemySwarm.FIELDS}
+        old['active'] = self.active
+        while self.slots < needed:
+            self.slots *= 2
+        self.active = np.zeros((self.games, self.slots), bool)
+        self.build()
+        for name, column in old.items():
+            getattr(self, name)[:, :column.shape[1]] = column
+
+    def move(self, dt, obstacles, rng):
+        self.swarm.move(dt, obstacles, rng, rows=np.flatnonzero(self.active))
+
+ECHO_FIELDS = {
+    'x': np.int64,  # rect topleft
+    'y': np.int64,
+    'end': np.int64,  # history index just after the newest sample replayed
+    'length': np.int64,  # samples to replay
+    'step': np.int64,  # samples replayed so far
+    'order': np.int64,  # how many echoes the game had made before this one, so hits go in order
+}
+
+def touching(x, y, size, r):
+    """Which squares of `size` at x, y (rounded as a pygame.Rect would) overlap the rect r."""
+    left, top = round_half_away(x), round_half_away(y)
+    return (left < r.right) & (left + size > r.left) & (top < r.bottom) & (top + size > r.top)
+
+class VectorEnv:
+    """N games stepped together; finished games reset themselves on the next step.
+
+    reset() returns (observations, info) and step(actions) returns
+    (observations, rewards, terminated, truncated, info), all arrays with one
+    row per game. The returned arrays are reused by the next call, so copy
+    them to keep them. A game that ends on a step reports its final score and
+    level in that step's info, and comes back as a new game on the following
+    step, as with gymnasium's next-step autoreset. With a seed, the whole
+    batch plays out the same for the same actions.
+    """
+
+    def __init__(self, num_envs, tuning=DEFAULT_TUNING, max_episode_steps=MAX_EPISODE_STEPS,
+                 max_enemies=MAX_ENEMIES, max_echoes=MAX_ECHOES, frame_skip=1,
+                 burst_slots=BURST_SLOTS):
+        self.num_envs = num_envs
+        self.tuning = tuning
+        self.max_episode_steps = max_episode_steps
+        self.frame_skip = frame_skip
+        self.max_enemies = max_enemies
+        self.max_echoes = max_echoes
+        self.single_observation_space = observation_spaces(None, max_enemies, max_echoes)
+        self.observation_space = observation_spaces(num_envs, max_enemies, max_echoes)
+        self.single_action_space = Discrete(len(ACTIONS))
+        self.action_space = MultiDiscrete([len(ACTIONS)] * num_envs)
+
+        self.observations = {name: np.zeros(space.shape, np.float32) for name, space in self.observation_space.items()}
+        self.rewards = np.zeros(num_envs, np.float32)
+        self.terminated = np.zeros(num_envs, bool)
+        self.truncated = np.zeros(num_envs, bool)
+        self.info = {
+            'score': np.zeros(num_envs, np.int64),
+            'level': np.zeros(num_envs, np.int64),
+            'episode_steps': np.zeros(num_envs, np.int64),
+        }
+        self.episode_steps = np.zeros(num_envs, np.int64)
+        self.needs_reset = np.zeros(num_envs, bool)
+        self.rng = np.random.default_rng()
+        self.scale = np.array([1 / WIDTH, 1 / HEIGHT], np.float32)
+        self.games = np.arange(num_envs)
+
+        bounds = pygame.Rect(0, 0, WIDTH, HEIGHT)
+        self.obstacles = [Obstacle(*rect) for rect in DEFAULT_OBSTACLES]
+        # The first wave is spaced for bigger enemies, as in World
+        self.planners = {size: SpawnPlanner(bounds, self.obstacles, size) for size in (FIRST_WAVE_SPACING, ENEMY_SIZE)}
+        self.time = 0  # simulated milliseconds, the same in every game as they tick together
+
+        # The games themselves, one row each
+        self.x = np.zeros(num_envs)
+        self.y = np.zeros(num_envs)
+        self.alive = np.zeros(num_envs, bool)
+        self.score = np.zeros(num_envs, np.int64)
+        self.level = np.zeros(num_envs, np.int64)
+        self.kills = np.zeros(num_envs, np.int64)  # during the last tick
+        self.history_length = int(tuning.echo_duration * FPS)
+        self.history_capacity = 2 * self.history_length + 1  # as HistoryBuffer
+        self.history = np.zeros((num_envs, self.history_capacity, 2), np.float32)
+        self.written = np.zeros(num_envs, np.int64)
+        self.enemies = SwarmSlots(num_envs, tuning.base_enemies + tuning.enemies_per_level, bounds)
+        # An echo lasts at most the history's length and one can start per tick, so this many can be alive
+        self.echoes = SlotColumns(ECHO_FIELDS, num_envs, self.history_length + 1)
+        self.echoes_made = np.zeros(num_envs, np.int64)
+        # Every game's bursts as rows of one FragmentStore; a burst is in use until its fragments have faded out
+        self.burst_slots = burst_slots
+        rows = num_envs * burst_slots * FRAGMENTS_PER_BURST
+        self.fragments = FragmentStore(bounds, capacity=rows)
+        self.fragments.add_rows(rows)
+        self.fragments.size[:] = FRAGMENT_SIZE
+        self.fragments.fade[:] = True
+        self.burst_active = np.zeros((num_envs, burst_slots), bool)
+
+    def reset(self, seed=None):
+        """Start a new game in every row."""
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self.reset_rows(self.games)
+        self.observe()
+        self.info['score'][:] = 0
+        self.info['level'][:] = 1
+        self.info['episode_steps'][:] = 0
+        return self.observations, self.info
+
+    def reset_rows(self, rows):
+        """Put the given games back at the start of level 1, reusing their arrays."""
+        self.x[rows], self.y[rows] = PLAYER_STARTS[0]
+        self.alive[rows] = True
+        self.score[rows] = 0
+        self.level[rows] = 1
+        self.written[rows] = 0
+        self.echoes.active[rows] = False
+        self.echoes_made[rows] = 0
+        self.burst_active[rows] = False
+        self.fragment_column('alpha').reshape(self.num_envs, -1)[rows] = 0
+        self.episode_steps[rows] = 0
+        self.needs_reset[rows] = False
+        self.spawn_wave(rows, FIRST_WAVE_SPACING)
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        rewards = self.rewards
+        rewards[:] = 0
+        info = self.info
+
+        # Games that ended on the last step start again instead of acting
+        restart = np.flatnonzero(self.needs_reset)
+        playing = ~self.needs_reset
+        dx, dy = ACTION_DX[actions], ACTION_DY[actions]
+        echo = ACTION_ECHO[actions] & playing
+        died = np.zeros(self.num_envs, bool)
+        for _ in range(self.frame_skip):
+            self.tick(dx, dy, echo, playing)
+            rewards += self.kills * KILL_REWARD
+            died |= playing & ~self.alive
+            playing &= self.alive
+            if not playing.any():
+                break
+            # Echo only on the first of the repeated ticks
+            echo = np.zeros_like(echo)
+
+        self.episode_steps += 1
+        rewards += np.where(died, DEATH_REWARD, SURVIVAL_REWARD)
+        self.terminated[:] = died
+        self.truncated[:] = ~died & (self.episode_steps >= self.max_episode_steps)
+        if len(restart):
+            self.reset_rows(restart)
+            rewards[restart] = 0
+            self.terminated[restart] = False
+            self.truncated[restart] = False
+        self.needs_reset[:] = self.terminated | self.truncated
+        info['score'][:] = self.score
+        info['level'][:] = self.level
+        info['episode_steps'][:] = self.episode_steps
+        self.observe()
+        return self.observations, rewards, self.terminated, self.truncated, info
+
+    def tick(self, dx, dy, echo, playing):
+        """One tick of every game, in the order of World.systems. Games not `playing` only move their enemies."""
+        dt = 1 / FPS
+        self.time += dt * 1000
+        self.kills[:] = 0
+        self.spawn_echoes(echo & (self.written > 0))
+        self.move_players(dx, dy, playing, dt)
+        self.check_player_death(playing)
+        self.update_echoes(playing & self.alive)
+        enemies = self.enemies
+        self.push_fragments(playing & self.alive, round_half_away(enemies.x), round_half_away(enemies.y), ENEMY_SIZE,
+                            enemies.active)
+        enemies.move(dt, self.obstacles, self.rng)
+        self.update_fragments(dt)
+        cleared = playing & self.alive & ~self.enemies.active.any(axis=1)
+        if cleared.any():
+            self.next_level(np.flatnonzero(cleared))
+
+    def spawn_echoes(self, spawning):
+        rows = np.flatnonzero(spawning)
+        if not len(rows):
+            return
+        echoes = self.echoes
+        # The slots are a ring per game: the echo made a ring's length ago has always finished
+        made = self.echoes_made[rows]
+        slot = made % echoes.slots
+        written = self.written[rows]
+        echoes.active[rows, slot] = True
+        echoes.end[rows, slot] = written
+        echoes.length[rows, slot] = np.minimum(written, self.history_length)
+        echoes.step[rows, slot] = 0
+        echoes.order[rows, slot] = made
+        self.echoes_made[rows] += 1
+
+    def move_players(self, dx, dy, playing, dt):
+        x, y = self.x, self.y
+        move_x = np.where(playing, dx * (PLAYER_SPEED * dt), 0.0)
+        move_y = np.where(playing, dy * (PLAYER_SPEED * dt), 0.0)
+        start_x, start_y = x.copy(), y.copy()
+        x += move_x
+        y += move_y
+        for obstacle in self.obstacles:
+            r = obstacle.rect
+            hit = playing & touching(x, y, PLAYER_SIZE, r)
+            if not hit.any():
+                continue
+            # As Player.handle_collision: back to the start, then one axis at a time
+            x[hit] = start_x[hit]
+            y[hit] = start_y[hit]
+            along = hit & (move_x != 0)
+            x[along] += move_x[along]
+            blocked = along & touching(x, y, PLAYER_SIZE, r)
+            x[blocked] = np.where(move_x[blocked] > 0, r.left - PLAYER_SIZE, r.right)
+            along = hit & (move_y != 0)
+            y[along] += move_y[along]
+            blocked = along & touching(x, y, PLAYER_SIZE, r)
+            y[blocked] = np.where(move_y[blocked] > 0, r.top - PLAYER_SIZE, r.bottom)
+        # As Player.apply_movement, fragments are pushed before the player is clamped to the arena
+        self.push_fragments(playing, round_half_away(x)[:, None], round_half_away(y)[:, None], PLAYER_SIZE)
+        np.clip(x, 0, WIDTH - PLAYER_SIZE, out=x)
+        np.clip(y, 0, HEIGHT - PLAYER_SIZE, out=y)
+
+        rows = np.flatnonzero(playing)
+        slots = self.written[rows] % self.history_capacity
+        self.history[rows, slots, 0] = x[rows]
+        self.history[rows, slots, 1] = y[rows]
+        self.written[rows] += 1
+
+    def push_fragments(self, playing, left, top, size, present=None):
+        """Push the fragments of each playing game away from that game's squares of `size`.
+
+        left and top are (games, k) arrays, with `present` marking the squares
+        that are there; every fragment is pushed by every square it overlaps.
+        """
+        bursts = np.flatnonzero(self.burst_active & playing[:, None])
+        if not len(bursts):
+            return
+        games = bursts // self.burst_slots
+        x, y = self.fragment_column('x', bursts)[..., None], self.fragment_column('y', bursts)[..., None]
+        hit, push_x, push_y = push_apart(x, y, FRAGMENT_SIZE, left[games, None], top[games, None], size, size)
+        if present is not None:
+            hit &= present[games, None]
+        if not hit.any():
+            return
+        self.fragment_column('vx')[bursts] += np.where(hit, push_x, 0.0).sum(axis=2)
+        self.fragment_column('vy')[bursts] += np.where(hit, push_y, 0.0).sum(axis=2)
+
+    def fragment_column(self, name, bursts=None):
+        """A FragmentStore column as (games * burst slots, fragments) rows, or just the given rows of it."""
+        column = getattr(self.fragments, '_' + name).reshape(-1, FRAGMENTS_PER_BURST)
+        return column if bursts is None else column[bursts]
+
+    def enemy_overlap(self, games, left, top, size):
+        """(k, enemy slots) overlap of k squares of `size` at left, top, each in the given game, with its enemies."""
+        # Whole pixels in the arena fit in int16, which keeps the (k, slots) temporaries small
+        enemies = self.enemies
+        enemy_left = round_half_away(enemies.x).astype(np.int16)[games]
+        enemy_top = round_half_away(enemies.y).astype(np.int16)[games]
+        left, top = left.astype(np.int16)[:, None], top.astype(np.int16)[:, None]
+        return (enemies.active[games] & (enemy_left < left + size) & (enemy_left + ENEMY_SIZE > left) &
+                (enemy_top < top + size) & (enemy_top + ENEMY_SIZE > top))
+
+    def check_player_death(self, playing):
+        caught = playing & self.enemy_overlap(self.games, round_half_away(self.x), round_half_away(self.y),
+                                              PLAYER_SIZE).any(axis=1)
+        self.alive &= ~caught
+
+    def update_echoes(self, playing):
+        """Move every echo one sample back along its path; while playing, each shatters the first enemy it touches."""
+        echoes = self.echoes
+        echoes.active &= echoes.step < echoes.length
+        moved = np.flatnonzero(echoes.active)
+        if not len(moved):
+            return
+        games = moved // echoes.slots
+        step = echoes.step.ravel()[moved]
+        index = (echoes.end.ravel()[moved] - step - 1) % self.history_capacity
+        x = round_half_away(self.history[games, index, 0]).astype(np.int64)
+        y = round_half_away(self.history[games, index, 1]).astype(np.int64)
+        echoes.x.ravel()[moved] = x
+        echoes.y.ravel()[moved] = y
+        echoes.step.ravel()[moved] = step + 1
+
+        hitting = playing[games]
+        moved, games, x, y = moved[hitting], games[hitting], x[hitting], y[hitting]
+        hits = self.enemy_overlap(games, x, y, PLAYER_SIZE)
+        hitting = np.flatnonzero(hits.any(axis=1))
+        if not len(hitting):
+            return
+        # Oldest echo first, each taking the first enemy an earlier echo didn't
+        moved, games, hits = moved[hitting], games[hitting], hits[hitting]
+        order = np.lexsort((echoes.order.ravel()[moved], games))
+        moved, games, hits = moved[order], games[order], hits[order]
+        rank = np.arange(len(games)) - np.searchsorted(games, games)
+        taken = np.zeros((self.num_envs, self.enemies.slots), bool)
+        for r in range(int(rank.max()) + 1):
+            turn = rank == r
+            free = hits[turn] & ~taken[games[turn]]
+            got = free.any(axis=1)
+            taken[games[turn][got], free[got].argmax(axis=1)] = True
+            echoes.active.ravel()[moved[turn][got]] = False
+        self.enemies.active &= ~taken
+        kills = taken.sum(axis=1)
+        self.kills += kills
+        self.score += 10 * kills
+        self.shatter(*np.nonzero(taken))
+
+    def shatter(self, rows, slots):
+        """Burst the enemies at (rows, slots) into fragments, each in a burst slot of its game."""
+        enemies = self.enemies
+        # Bursts are handed out one kill per game at a time, so two kills in a game get different slots
+        rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+        half = ENEMY_SIZE // 2
+        birth = self.fragment_column('birth')[:, 0].reshape(self.num_envs, self.burst_slots)
+        for r in range(int(rank.max()) + 1):
+            game, slot = rows[rank == r], slots[rank == r]
+            # A free burst slot if there is one, otherwise the oldest burst's
+            burst = np.where(self.burst_active[game], birth[game], -np.inf).argmin(axis=1)
+            self.burst_active[game, burst] = True
+            shape = (len(game), FRAGMENTS_PER_BURST)
+            offset_x = self.rng.integers(-half, half + 1, shape)
+            offset_y = self.rng.integers(-half, half + 1, shape)
+            angle = np.radians(self.rng.uniform(0, 360, shape))
+            speed = self.rng.uniform(100, 300, shape)
+            index = game * self.burst_slots + burst
+            # Truncated to whole pixels, as FragmentStore.spawn does
+            self.fragment_column('x')[index] = np.trunc(enemies.x[game, slot][:, None] + offset_x)
+            self.fragment_column('y')[index] = np.trunc(enemies.y[game, slot][:, None] + offset_y)
+            self.fragment_column('vx')[index] = speed * np.cos(angle)
+            self.fragment_column('vy')[index] = speed * np.sin(angle)
+            self.fragment_column('alpha')[index] = 255
+            self.fragment_column('birth')[index] = self.time
+
+    def update_fragments(self, dt):
+        """FragmentStore.update on the bursts in use; a burst is freed once its fragments have faded out."""
+        bursts = np.flatnonzero(self.burst_active)
+        if not len(bursts):
+            return
+        fragments = self.fragments
+        fragments.select((bursts[:, None] * FRAGMENTS_PER_BURST + np.arange(FRAGMENTS_PER_BURST)).ravel())
+        try:
+            fragments.update(dt, self.obstacles, self.time, np.ones(fragments.count, bool))
+        finally:
+            fragments.restore()
+        self.burst_active.ravel()[bursts] = self.fragment_column('alpha', bursts)[:, 0] > 0
+
+    def next_level(self, rows):
+        self.level[rows] += 1
+        self.spawn_wave(rows)
+        self.echoes.active[rows] = False
+
+    def spawn_wave(self, rows, size=ENEMY_SIZE):
+        """Place the wave for each given game's level, like SpawnPlanner.plan but for all of them at once.
+
+        Each enemy takes the first of SPAWN_CANDIDATES random free cells per
+        enemy that is far enough from the player and from the enemies placed
+        before it, spaced as if enemies were `size`. A wave that runs out of
+        candidates is left short, with the same warning World gives when its
+        arena is full.
+        """
+        tuning = self.tuning
+        enemies = self.enemies
+        level = self.level[rows]
+        counts = tuning.base_enemies + tuning.enemies_per_level * level
+        most = int(counts.max())
+        if most > enemies.slots:
+            enemies.grow(most)
+        enemies.active[rows] = False
+
+        planner = self.planners[size]
+        shape = (len(rows), SPAWN_CANDIDATES * most)
+        cells = self.rng.integers(len(planner), size=shape)
+        x = np.minimum(planner.free_x[cells] + self.rng.integers(0, planner.step, shape), planner.max_x)
+        y = np.minimum(planner.free_y[cells] + self.rng.integers(0, planner.step, shape), planner.max_y)
+        centre_x, centre_y = x + size / 2, y + size / 2
+        player_x = self.x[rows, None] + PLAYER_SIZE / 2
+        player_y = self.y[rows, None] + PLAYER_SIZE / 2
+        free = np.hypot(centre_x - player_x, centre_y - player_y) >= tuning.min_spawn_distance + size / 2
+
+        speed = tuning.base_speed + tuning.speed_per_level * level
+        candidates = np.arange(len(rows))
+        for slot in range(most):
+            pick = free.argmax(axis=1)
+            placed = np.flatnonzero(free[candidates, pick] & (slot < counts))
+            if not len(placed):
+                break
+            game, pick = rows[placed], pick[placed]
+            new_x, new_y = x[placed, pick], y[placed, pick]
+            angle = np.radians(self.rng.uniform(0, 360, len(game)))
+            enemies.active[game, slot] = True
+            enemies.x[game, slot] = enemies.last_x[game, slot] = new_x
+            enemies.y[game, slot] = enemies.last_y[game, slot] = new_y
+            enemies.dx[game, slot] = np.cos(angle)
+            enemies.dy[game, slot] = np.sin(angle)
+            enemies.speed[game, slot] = speed[placed]
+            enemies.stuck[game, slot] = 0
+            enemies.collisions[game, slot] = 0
+            # No two enemies' centres closer than an enemy's size
+            free[placed] &= np.hypot(centre_x[placed] - (new_x + size / 2)[:, None],
+                                     centre_y[placed] - (new_y + size / 2)[:, None]) >= size
+
+        placed = enemies.active[rows].sum(axis=1)
+        for short in np.flatnonzero(placed < counts).tolist():
+            warnings.warn(f"Level {level[short]}: Arena is full: placed {placed[short]} of {counts[short]} enemies")
+
+    def observe(self):
+        """Write every game's observation into its row of the observation arrays."""
+        scale = self.scale
+        observations = self.observations
+        games = self.games[:, None]
+
+        player = observations['player']
+        player[:, 0] = self.x * scale[0]
+        player[:, 1] = self.y * scale[1]
+        player[:, 2] = self.alive
+
+        enemies = self.enemies
+        out = observations['enemies']
+        out[:] = 0
+        n = min(enemies.slots, self.max_enemies)
+        if enemies.slots > self.max_enemies:
+            distance = np.hypot(enemies.x - self.x[:, None], enemies.y - self.y[:, None])
+            distance[~enemies.active] = np.inf
+            slots = np.sort(np.argpartition(distance, self.max_enemies, axis=1)[:, :self.max_enemies], axis=1)
+            pick = lambda column: column[games, slots]
+        else:
+            pick = lambda column: column
+        present = pick(enemies.active)
+        out[:, :n, 0] = pick(enemies.x) * scale[0]
+        out[:, :n, 1] = pick(enemies.y) * scale[1]
+        out[:, :n, 2] = pick(enemies.dx)
+        out[:, :n, 3] = pick(enemies.dy)
+        out[:, :n, 4] = 1
+        out[:, :n] *= present[..., None]
+
+        echoes = self.echoes
+        out = observations['echoes']
+        n = min(echoes.slots, self.max_echoes)
+        # The last n echoes made, oldest first, straight from each game's ring
+        slots = (self.echoes_made[:, None] + np.arange(-n, 0)) % echoes.slots
+        present = echoes.active[games, slots]
+        out[:, :n, 0] = echoes.x[games, slots] * scale[0]
+        out[:, :n, 1] = echoes.y[games, slots] * scale[1]
+        out[:, :n, 2] = 1 - echoes.step[games, slots] / np.maximum(echoes.length[games, slots], 1)
+        out[:, :n, 3] = 1
+        out[:, :n] *= present[..., None]
+
+        grid = observations['fragments']
+        grid[:] = 0
+        bursts = np.flatnonzero(self.burst_active)
+        if len(bursts):
+            _, rows, columns = grid.shape
+            cell_x = np.clip(self.fragment_column('x', bursts) // GRID_CELL, 0, columns - 1).astype(np.intp)
+            cell_y = np.clip(self.fragment_column('y', bursts) // GRID_CELL, 0, rows - 1).astype(np.intp)
+            grid[(bursts // self.burst_slots)[:, None], cell_y, cell_x] = 1
+
+    def close(self):
+        pass
+
+class EchoesEnv:
+    """A single game with reset()/step(); call reset() again once it ends."""
+
+    def __init__(self, tuning=DEFAULT_TUNING, max_episode_steps=MAX_EPISODE_STEPS, **kwargs):
+        self.vector = VectorEnv(1, tuning, max_episode_steps, **kwargs)
+        self.observation_space = self.vector.single_observation_space
+        self.action_space = self.vector.single_action_space
+        self.single = {name: array[0] for name, array in self.vector.observations.items()}
+
+    def reset(self, seed=None):
+        _, info = self.vector.reset(seed)
+        return self.single, {name: int(values[0]) for name, values in info.items()}
+
+    def step(self, action):
+        vector = self.vector
+        if vector.needs_reset[0]:
+            raise RuntimeError("step() called on a finished game; call reset() first")
+        _, rewards, terminated, truncated, info = vector.step((action,))
+        return (self.single, float(rewards[0]), bool(terminated[0]), bool(truncated[0]),
+                {name: int(values[0]) for name, values in info.items()})
+
+    def close(self):
+        self.vector.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Step vectorised environments with random actions and report throughput")
+    parser.add_argument('--envs', type=int, default=64)
+    parser.add_argument('--steps', type=int, default=1000, help="steps of the whole vector")
+    parser.add_argument('--frame-skip', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    env = VectorEnv(args.envs, frame_skip=args.frame_skip)
+    env.reset(seed=args.seed)
+    rng = np.random.default_rng(args.seed)
+    actions = rng.integers(len(ACTIONS), size=(args.steps, args.envs))
+    episodes = 0
+    start = time.perf_counter()
+    for step in range(args.steps):
+        _, _, terminated, truncated, _ = env.step(actions[step])
+        episodes += int(terminated.sum() + truncated.sum())
+    elapsed = time.perf_counter() - start
+    env_steps = args.steps * args.envs
+    print(f"{env_steps} env steps ({env_steps * args.frame_skip} ticks) in {elapsed:.2f} s: "
+          f"{env_steps / elapsed:.0f} env steps/s, {episodes} episodes finished")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Navigation flow field towards the player, shared by every pursuing enemy.
+
+The area is cut into FLOW_CELL cells and a breadth-first search runs out
+from the player's cell over the cells an enemy could stand in. Each cell
+then stores the direction to its neighbour closest to the player, so an
+enemy finds its way round obstacles with one lookup however many enemies
+there are. The search runs as a NumPy wavefront (one array pass per ring of
+cells) and only when the player moves into a new cell.
+"""
+import numpy as np
+import pygame
+
+FLOW_CELL = 25  # pixels per field cell
+AGENT_SIZE = 50  # the largest enemies; a cell is open if one centred in it misses every obstacle
+MAX_DISTANCE = 80  # cells searched out from the player; enemies further away keep wandering
+UNREACHABLE = np.iinfo(np.int32).max
+
+# (row, column) steps to the 8 neighbours, diagonals first so they win ties
+NEIGHBOURS = [(-1, -1), (-1, 1), (1, -1), (1, 1), (-1, 0), (1, 0), (0, -1), (0, 1)]
+STEER = np.array([(dc, dr) for dr, dc in NEIGHBOURS], dtype=np.float64)
+STEER /= np.hypot(STEER[:, 0], STEER[:, 1])[:, None]
+
+class FlowField:
+    def __init__(self, area, obstacles, cell=FLOW_CELL, agent_size=AGENT_SIZE, max_distance=MAX_DISTANCE):
+        self.cell = cell
+        self.agent_size = agent_size
+        self.max_distance = max_distance
+        self.builds = 0
+        self.reset(area, obstacles)
+
+    def reset(self, area, obstacles):
+        """Cover a new area or obstacle layout; the field is rebuilt on the next update()."""
+        self.area = pygame.Rect(area)
+        cell, size = self.cell, self.agent_size
+        self.rows = max(1, -(-self.area.height // cell))
+        self.columns = max(1, -(-self.area.width // cell))
+        left = self.area.left + (np.arange(self.columns) + 0.5) * cell - size / 2
+        top = self.area.top + (np.arange(self.rows) + 0.5) * cell - size / 2
+        blocked = np.zeros((self.rows, self.columns), dtype=bool)
+        for obstacle in obstacles:
+            r = obstacle.rect
+            blocked |= (((left < r.right) & (left + size > r.left))[None, :] &
+                        ((top < r.bottom) & (top + size > r.top))[:, None])
+        self.open = ~blocked
+        self.distance = np.full((self.rows, self.columns), UNREACHABLE, dtype=np.int32)
+        self.dx = np.zeros((self.rows, self.columns))
+        self.dy = np.zeros((self.rows, self.columns))
+        self.target = None
+        self.target_x = self.target_y = 0.0
+
+    def cell_of(self, x, y):
+        column = min(max(int((x - self.area.left) // self.cell), 0), self.columns - 1)
+        row = min(max(int((y - self.area.top) // self.cell), 0), self.rows - 1)
+        return row, column
+
+    def update(self, x, y):
+        """Point the field at (x, y). Returns whether it had to be rebuilt."""
+        self.target_x, self.target_y = x, y
+        target = self.cell_of(x, y)
+        if target == self.target:
+            return False
+        self.target = target
+        self.build()
+        return True
+
+    def build(self):
+        distance = self.distance
+        distance[:] = UNREACHABLE
+        open_ = self.open
+        reached = np.zeros_like(open_)
+        frontier = np.zeros_like(open_)
+        # The player's own cell counts as open even if it is tight against an obstacle
+        frontier[self.target] = True
+        grow = np.empty_like(open_)
+        for ring in range(self.max_distance + 1):
+            distance[frontier] = ring
+            reached |= frontier
+            grow[:] = False
+            grow[1:] |= frontier[:-1]
+            grow[:-1] |= frontier[1:]
+            grow[:, 1:] |= frontier[:, :-1]
+            grow[:, :-1] |= frontier[:, 1:]
+            frontier = grow & open_ & ~reached
+            if not frontier.any():
+                break
+
+        # Each cell steers to its nearest-to-the-player neighbour. Diagonal
+        # steps need both cells beside them open, so paths don't clip corners.
+        rows, columns = self.rows, self.columns
+        padded = np.full((rows + 2, columns + 2), UNREACHABLE, dtype=np.int32)
+        padded[1:-1, 1:-1] = distance
+        passable = np.zeros((rows + 2, columns + 2), dtype=bool)
+        passable[1:-1, 1:-1] = open_
+        candidates = np.empty((len(NEIGHBOURS), rows, columns), dtype=np.int32)
+        for k, (dr, dc) in enumerate(NEIGHBOURS):
+            candidates[k] = padded[1 + dr:1 + dr + rows, 1 + dc:1 + dc + columns]
+            if dr and dc:
+                corner = (passable[1 + dr:1 + dr + rows, 1:1 + columns] &
+                          passable[1:1 + rows, 1 + dc:1 + dc + columns])
+                candidates[k][~corner] = UNREACHABLE
+        best = candidates.argmin(axis=0)
+        downhill = np.take_along_axis(candidates, best[None], axis=0)[0] < distance
+        self.dx[:] = np.where(downhill, STEER[best, 0], 0)
+        self.dy[:] = np.where(downhill, STEER[best, 1], 0)
+        self.builds += 1
+
+    def steer(self, swarm):
+        """Turn every enemy in the field towards the player, keeping the speed it has.
+
+        Enemies next to the player's cell head straight for the target point;
+        those outside the field, or out of its reach, keep their direction.
+        """
+        if not swarm.count:
+            return
+        half = swarm.size / 2
+        centre_x = swarm.x + half
+        centre_y = swarm.y + half
+        column = (centre_x - self.area.left) // self.cell
+        row = (centre_y - self.area.top) // self.cell
+        inside = (column >= 0) & (column < self.columns) & (row >= 0) & (row < self.rows)
+        column = np.clip(column, 0, self.columns - 1).astype(np.intp)
+        row = np.clip(row, 0, self.rows - 1).astype(np.intp)
+        dx = self.dx[row, column]
+        dy = self.dy[row, column]
+
+        to_x = self.target_x - centre_x
+        to_y = self.target_y - centre_y
+        length = np.hypot(to_x, to_y)
+        close = inside & (self.distance[row, column] <= 1) & (length > 0)
+        if close.any():
+            dx[close] = to_x[close] / length[close]
+            dy[close] = to_y[close] / length[close]
+        steer = inside & ((dx != 0) | (dy != 0))
+        swarm.dx[steer] = dx[steer]
+        swarm.dy[steer] = dy[steer]
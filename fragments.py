@@ -0,0 +1,329 @@
+"""Shared, array-backed store for the fragments of shattered entities.
+
+Every fragment of every shattered entity lives in one set of NumPy arrays
+(structure of arrays), so decay, bounds clamping, obstacle resolution and
+pushing run as a handful of vectorised operations per step instead of a Python
+loop over per-fragment dicts. ShatteredEntity objects are small handles onto a
+group of rows in the store.
+"""
+import random
+
+import numpy as np
+import pygame
+
+from soa import ColumnStore, round_half_away, lerp
+from spatial import CELL_SIZE
+
+# Fragment velocity decay factor
+FRAGMENT_VELOCITY_DECAY = 0.95
+MIN_FRAGMENT_VELOCITY = 5  # Minimum threshold velocity below which fragments stop moving
+
+FRAGMENT_FADE_DELAY = 1000  # ms before enemy fragments start to fade
+FRAGMENT_FADE_STEP = 10  # alpha lost per update once fading
+PUSH_VELOCITY = 100  # Increased push velocity
+
+ALPHA_QUANTUM = 5  # Fading steps of 10 from 255 land on multiples of 5, so nothing is lost
+
+def as_rect_array(rects):
+    """An (n, 4) int64 array of x, y, w, h from a list of pygame.Rects (arrays pass through)."""
+    if isinstance(rects, np.ndarray):
+        return rects
+    return np.array([tuple(rect) for rect in rects], dtype=np.int64).reshape(-1, 4)
+
+def cell_keys(columns, rows):
+    # One sortable int64 per grid cell
+    return columns << 32 | rows & 0xffffffff
+
+def push_apart(x, y, size, rx, ry, rw, rh):
+    """The push each fragment at x, y of `size` gets from the rect paired with it.
+
+    Arguments are matching arrays, one (fragment, rect) pair per element.
+    Returns whether each pair overlaps, and the velocity added along x and y,
+    PUSH_VELOCITY away from the rect's centre (zero where it doesn't overlap).
+    """
+    hit = (x < rx + rw) & (x + size > rx) & (y < ry + rh) & (y + size > ry)
+    dx = x + size // 2 - (rx + rw // 2)
+    dy = y + size // 2 - (ry + rh // 2)
+    length = np.sqrt(dx * dx + dy * dy)
+    hit &= length != 0
+    length = np.where(hit, length, 1)
+    return hit, np.where(hit, dx / length * PUSH_VELOCITY, 0.0), np.where(hit, dy / length * PUSH_VELOCITY, 0.0)
+
+class SpriteCache:
+    """Pre-rendered fragment squares per (colour, size, alpha); alpha None means opaque."""
+
+    def __init__(self):
+        self.sprites = {}
+
+    def __len__(self):
+        return len(self.sprites)
+
+    def get(self, color, size, alpha):
+        key = (color, size, alpha)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            if alpha is None:
+                sprite = pygame.Surface((size, size))
+                sprite.fill(color)
+            else:
+                sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+                sprite.fill((*color, alpha))
+            if pygame.display.get_surface() is not None:
+                sprite = sprite.convert_alpha() if alpha is not None else sprite.convert()
+            self.sprites[key] = sprite
+        return sprite
+
+class FragmentStore(ColumnStore):
+    FIELDS = {
+        'x': np.float64,
+        'y': np.float64,
+        'size': np.float64,
+        'vx': np.float64,
+        'vy': np.float64,
+        'alpha': np.int16,
+        'birth': np.float64,
+        'fade': np.bool_,
+        'group': np.int64,
+        'px': np.float64,  # position before the current step, for drawing between steps
+        'py': np.float64,
+    }
+
+    def __init__(self, bounds, capacity=256):
+        super().__init__(capacity)
+        self.bounds = bounds
+        self.colors = {}  # group id -> color
+        self.next_group = 0
+        self.released = set()
+        self.sprites = SpriteCache()
+        self.velocity = pygame.Vector2()  # scratch vector for spawn()
+
+    def spawn(self, x, y, size, color, num_fragments, velocity_range, fade, now, rng=random):
+        """Add a burst of fragments around (x, y). Returns the id of the new group."""
+        start = self.add_rows(num_fragments)
+        end = start + num_fragments
+        group = self.next_group
+        self.next_group += 1
+        self.colors[group] = color
+
+        fragment_size = size // 5
+        velocity = self.velocity
+        for i in range(start, end):
+            offset_x = rng.randint(-size//2, size//2)
+            offset_y = rng.randint(-size//2, size//2)
+            angle = rng.uniform(0, 360)
+            speed = rng.uniform(*velocity_range)
+            velocity.update(speed, 0)
+            velocity.rotate_ip(angle)
+            # Truncated to whole pixels, as a pygame.Rect would
+            self._x[i] = self._px[i] = int(x + offset_x)
+            self._y[i] = self._py[i] = int(y + offset_y)
+            self._vx[i] = velocity.x
+            self._vy[i] = velocity.y
+        self._size[start:end] = fragment_size
+        self._alpha[start:end] = 255
+        self._birth[start:end] = now
+        self._fade[start:end] = fade
+        self._group[start:end] = group
+        return group
+
+    def release(self, group):
+        self.released.add(group)
+        self.colors.pop(group, None)
+
+    def compact(self):
+        """Drop the rows of released groups, keeping the order of the rest."""
+        if not self.released:
+            return
+        self.keep(~np.isin(self.group, list(self.released)))
+        self.released.clear()
+
+    def rows(self, groups):
+        """Boolean mask of the live rows that belong to any of the given groups."""
+        return np.isin(self.group, list(groups))
+
+    def visible_groups(self):
+        # A fading group is gone once every fragment is fully transparent
+        visible = ~self.fade | (self.alpha > 0)
+        return set(np.unique(self.group[visible]).tolist())
+
+    def update(self, dt, obstacles, now, rows):
+        if not rows.any():
+            return
+        x, y, size = self.x, self.y, self.size
+        vx, vy = self.vx, self.vy
+        bounds = self.bounds
+
+        x[rows] = round_half_away(x[rows] + vx[rows] * dt)
+        y[rows] = round_half_away(y[rows] + vy[rows] * dt)
+
+        # Apply decay to velocity, but stop if below minimum threshold
+        moving = np.sqrt(vx * vx + vy * vy) > MIN_FRAGMENT_VELOCITY
+        vx[rows] = np.where(moving[rows], vx[rows] * FRAGMENT_VELOCITY_DECAY, 0.0)
+        vy[rows] = np.where(moving[rows], vy[rows] * FRAGMENT_VELOCITY_DECAY, 0.0)
+
+        hit_x = rows & ((x <= bounds.left) | (x + size >= bounds.right))
+        vx[hit_x] = 0.0
+        x[hit_x] = np.clip(x[hit_x], bounds.left, bounds.right - size[hit_x])
+        hit_y = rows & ((y <= bounds.top) | (y + size >= bounds.bottom))
+        vy[hit_y] = 0.0
+        y[hit_y] = np.clip(y[hit_y], bounds.top, bounds.bottom - size[hit_y])
+
+        for obstacle in obstacles:
+            r = obstacle.rect
+            hit = rows & (x < r.right) & (x + size > r.left) & (y < r.bottom) & (y + size > r.top)
+            if not hit.any():
+                continue
+            vx[hit] = 0.0
+            vy[hit] = 0.0
+            half = size[hit] // 2
+            x[hit] = np.where(x[hit] + half < r.centerx, r.left - size[hit], r.right)
+            y[hit] = np.where(y[hit] + half < r.centery, r.top - size[hit], r.bottom)
+
+        fading = rows & self.fade & (now - self.birth >= FRAGMENT_FADE_DELAY)
+        self.alpha[fading] = np.maximum(self.alpha[fading] - FRAGMENT_FADE_STEP, 0)
+
+    def push(self, rects, rows):
+        """Push the selected fragments away from every rect they overlap.
+
+        `rects` is a list of pygame.Rects or an (n, 4) array of x, y, w, h.
+        Fragments are binned into the spatial grid by their top-left cell, so
+        each rect only tests the fragments in the cells around it.
+        """
+        rects = as_rect_array(rects)
+        if not len(rects) or not rows.any():
+            return
+        index = np.flatnonzero(rows)
+        x, y, size = self.x[index], self.y[index], self.size[index]
+        keys = cell_keys((x // CELL_SIZE).astype(np.int64), (y // CELL_SIZE).astype(np.int64))
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+
+        # Cells each rect has to look in. A fragment overlapping a rect can
+        # start up to its size left of/above it.
+        reach = int(size.max()) - 1
+        left, top, width, height = rects.T
+        first_col = (left - reach) // CELL_SIZE
+        first_row = (top - reach) // CELL_SIZE
+        cols = (left + width - 1) // CELL_SIZE - first_col + 1
+        cells_per_rect = cols * ((top + height - 1) // CELL_SIZE - first_row + 1)
+        query_rects = np.repeat(np.arange(len(rects)), cells_per_rect)
+        k = np.arange(len(query_rects)) - np.repeat(np.cumsum(cells_per_rect) - cells_per_rect, cells_per_rect)
+        query_keys = cell_keys(first_col[query_rects] + k % cols[query_rects],
+                               first_row[query_rects] + k // cols[query_rects])
+
+        lo = np.searchsorted(sorted_keys, query_keys, 'left')
+        counts = np.searchsorted(sorted_keys, query_keys, 'right') - lo
+        total = int(counts.sum())
+        if total == 0:
+            return
+
+        # Expand the matching cell slices into candidate (fragment, rect) pairs
+        starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+        candidate = order[np.arange(total) + starts]
+        rect_index = np.repeat(query_rects, counts)
+        rx, ry, rw, rh = rects[rect_index].T
+
+        hit, push_x, push_y = push_apart(x[candidate], y[candidate], size[candidate], rx, ry, rw, rh)
+        if not hit.any():
+            return
+        target = index[candidate[hit]]
+        np.add.at(self._vx, target, push_x[hit])
+        np.add.at(self._vy, target, push_y[hit])
+
+    def save_previous(self):
+        self.px[:] = self.x
+        self.py[:] = self.y
+
+    def positions(self, index, alpha=1.0):
+        """Integer x and y of the given rows, `alpha` of the way from the previous step."""
+        if alpha >= 1:
+            return self.x[index].astype(np.int64), self.y[index].astype(np.int64)
+        return (round_half_away(lerp(self.px[index], self.x[index], alpha)).astype(np.int64),
+                round_half_away(lerp(self.py[index], self.y[index], alpha)).astype(np.int64))
+
+    def group_bounds(self, group, alpha=1.0):
+        """Bounding rect of a group's fragments."""
+        rows = self.group == group
+        if not rows.any():
+            return None
+        (x, y), size = self.positions(rows, alpha), self.size[rows]
+        left, top = int(x.min()), int(y.min())
+        return pygame.Rect(left, top, int((x + size).max()) - left, int((y + size).max()) - top)
+
+    def draw(self, surface, rows, alpha=1.0, view=None):
+        """Draw the selected fragments that are in view with one batched blit of cached sprites."""
+        index = np.flatnonzero(rows & (~self.fade | (self.alpha > 0)))
+        if view is not None and len(index):
+            x, y = self.positions(index, alpha)
+            size = self.size[index]
+            index = index[(x < view.right) & (x + size > view.left) & (y < view.bottom) & (y + size > view.top)]
+        if not len(index):
+            return
+        fade = self.fade[index]
+        opacity = (self.alpha[index] + ALPHA_QUANTUM // 2) // ALPHA_QUANTUM * ALPHA_QUANTUM
+        opacity = np.where(fade, np.minimum(opacity, 255), -1)
+        keys = np.stack((self.group[index], self.size[index].astype(np.int64), opacity.astype(np.int64)), axis=1)
+        unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+        sprites = [self.sprites.get(self.colors[group], size, opacity if opacity >= 0 else None)
+                   for group, size, opacity in unique.tolist()]
+        x, y = self.positions(index, alpha)
+        if view is not None:
+            x -= view.x
+            y -= view.y
+        sequence = [(sprites[k], (x, y)) for k, x, y in zip(inverse.ravel().tolist(), x.tolist(), y.tolist())]
+        fblits = getattr(surface, 'fblits', None)
+        if fblits is not None:
+            fblits(sequence)
+        else:
+            surface.blits(sequence, doreturn=False)
+
+def push_fragments(shattered_entities, rects):
+    """Push the fragments of all the given shattered entities away from rects in one pass."""
+    if not shattered_entities:
+        return
+    store = shattered_entities[0].store
+    store.push(rects, store.rows(s.group for s in shattered_entities))
+
+class ShatteredEntity:
+    def __init__(self, store, x, y, size, color, num_fragments=15, velocity_range=(50, 150), fade=False, now=0, rng=random):
+        self.reset(store, x, y, size, color, num_fragments, velocity_range, fade, now, rng)
+
+    def reset(self, store, x, y, size, color, num_fragments=15, velocity_range=(50, 150), fade=False, now=0, rng=random):
+        """Point a released handle at a new burst of fragments, for pooling."""
+        self.store = store
+        self.size = size
+        self.color = color
+        self.fade = fade
+        self.group = store.spawn(x, y, size, color, num_fragments, velocity_range, fade, now, rng)
+
+    def rows(self):
+        return self.store.group == self.group
+
+    def update(self, dt, obstacles, now):
+        self.store.update(dt, obstacles, now, self.rows())
+
+    def handle_push(self, entities):
+        push_fragments([self], [entity.rect for entity in entities])
+
+    def is_faded(self):
+        return self.group not in self.store.visible_groups()
+
+    def release(self):
+        self.store.release(self.group)
+
+    def draw(self, surface, alpha=1.0, view=None):
+        self.store.draw(surface, self.rows(), alpha, view)
+
+class ShatteredPlayer(ShatteredEntity):
+    def __init__(self, store, x, y, size, color, num_fragments=15, now=0, rng=random):
+        self.reset(store, x, y, size, color, num_fragments, now, rng)
+
+    def reset(self, store, x, y, size, color, num_fragments=15, now=0, rng=random):
+        super().reset(store, x, y, size, color, num_fragments=num_fragments, velocity_range=(50, 150), fade=False, now=now, rng=rng)
+
+class ShatteredEnemy(ShatteredEntity):
+    def __init__(self, store, x, y, size, color, num_fragments=15, now=0, rng=random):
+        self.reset(store, x, y, size, color, num_fragments, now, rng)
+
+    def reset(self, store, x, y, size, color, num_fragments=15, now=0, rng=random):
+        super().reset(store, x, y, size, color, num_fragments=num_fragments, velocity_range=(100, 300), fade=True, now=now, rng=rng)
@@ -1,674 +1,379 @@
-import os
-import pygame
-import sys
-from collections import deque
-import random
-import sys
-
-def resource_path(relative_path):
-    """Get the absolute path to a resource, works for dev and PyInstaller"""
-    base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
-    return os.path.join(base_path, relative_path)
-
-# Initialize Pygame
-pygame.init()
-
-# Initialize Mixer
-try:
-    pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=512)
-except pygame.error as e:
-    print(f"Could not initialize mixer: {e}")
-    sys.exit(1)
-
-# Screen settings
-WIDTH, HEIGHT = 800, 600
-SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Echoes of Time")
-
-# Colors
-WHITE = (255, 255, 255)
-BLUE = (0, 120, 215)
-RED = (220, 20, 60)
-DARK_RED = (139, 0, 0)
-GREEN = (0, 255, 0)
-BLACK = (0, 0, 0)
-GRAY = (200, 200, 200)
-TINT_COLOR = (0, 0, 0, 180)  # Semi-transparent black
-
-# Player settings
-PLAYER_SIZE = 50
-PLAYER_SPEED = 300  # pixels per second
-
-# Echo settings
-ECHO_DURATION = 2  # seconds
-FPS = 60
-
-# Minimum spawn distance for enemies
-MIN_SPAWN_DISTANCE = 100  # Adjusted to balance spawning
-
-# Fragment velocity decay factor
-FRAGMENT_VELOCITY_DECAY = 0.95
-MIN_FRAGMENT_VELOCITY = 5  # Minimum threshold velocity below which fragments stop moving
-
-# Font
-font = pygame.font.SysFont(None, 36)
-large_font = pygame.font.SysFont(None, 72)
-
-clock = pygame.time.Clock()
-
-# Game states
-PLAYING = 'playing'
-PAUSED = 'paused'
-DEAD = 'dead'
-
-def render_text_with_shadow(text, font, main_color, shadow_color, shadow_offset=(2, 2)):
-    text_surface = font.render(text, True, main_color)
-    shadow_surface = font.render(text, True, shadow_color)
-    combined_surface = pygame.Surface(
-        (text_surface.get_width() + shadow_offset[0], text_surface.get_height() + shadow_offset[1]),
-        pygame.SRCALPHA
-    )
-    combined_surface.blit(shadow_surface, shadow_offset)
-    combined_surface.blit(text_surface, (0, 0))
-    return combined_surface
-
-def check_collision(rect1, rect2):
-    return rect1.colliderect(rect2)
-
-def generate_enemy_position(player_pos, obstacles, enemies, min_distance, enemy_size):
-    attempts = 0
-    buffer = 50
-    max_attempts = 500  # Reduce maximum attempts to prevent excessive looping
-    max_time = 1.0  # Maximum time in seconds for finding a position
-    start_time = pygame.time.get_ticks()
-
-    while attempts < max_attempts and (pygame.time.get_ticks() - start_time) / 1000 < max_time:
-        x = random.randint(buffer, WIDTH - enemy_size - buffer)
-        y = random.randint(buffer, HEIGHT - enemy_size - buffer)
-        enemy_rect = pygame.Rect(x, y, enemy_size, enemy_size)
-
-        player_center = pygame.Vector2(player_pos.x + PLAYER_SIZE / 2, player_pos.y + PLAYER_SIZE / 2)
-        enemy_center = pygame.Vector2(x + enemy_size / 2, y + enemy_size / 2)
-        distance = player_center.distance_to(enemy_center)
-        if distance < min_distance + (enemy_size / 2):
-            attempts += 1
-            continue
-
-        overlap = any(enemy_rect.colliderect(obstacle.rect) for obstacle in obstacles)
-        if overlap:
-            attempts += 1
-            continue
-
-        overlap_with_enemy = any(enemy_center.distance_to(pygame.Vector2(enemy.rect.x + enemy.size / 2, enemy.rect.y + enemy.size / 2)) < (enemy_size + enemy.size) / 2 for enemy in enemies)
-        if overlap_with_enemy:
-            attempts += 1
-            continue
-
-        if not SCREEN.get_rect().contains(enemy_rect):
-            attempts += 1
-            continue
-
-        return (x, y)
-    return None
-
-class Level:
-    def __init__(self, level_number):
-        self.level_number = level_number
-        self.num_enemies = 3 + level_number
-        self.enemy_speed = 120 + (level_number * 20)
-
-class Player:
-    def __init__(self, x, y):
-        self.pos = pygame.Vector2(x, y)
-        self.size = PLAYER_SIZE
-        self.color = BLUE
-        self.speed = PLAYER_SPEED
-        self.history = deque(maxlen=int(ECHO_DURATION * FPS))
-        self.rect = pygame.Rect(self.pos.x, self.pos.y, self.size, self.size)
-        self.visible = True
-
-    def handle_movement(self, keys_pressed, obstacles, shattered_enemies, dt):
-        original_pos = self.pos.copy()
-        movement = self.get_movement_vector(keys_pressed, dt)
-        self.apply_movement(movement, obstacles, shattered_enemies, original_pos)
-        self.clamp_position()
-
-    def get_movement_vector(self, keys_pressed, dt):
-        movement = pygame.Vector2(0, 0)
-        if keys_pressed[pygame.K_LEFT]:
-            movement.x -= 1
-        if keys_pressed[pygame.K_RIGHT]:
-            movement.x += 1
-        if keys_pressed[pygame.K_UP]:
-            movement.y -= 1
-        if keys_pressed[pygame.K_DOWN]:
-            movement.y += 1
-
-        if movement.length_squared() > 0:
-            movement = movement.normalize() * self.speed * dt
-        return movement
-
-    def apply_movement(self, movement, obstacles, shattered_enemies, original_pos):
-        self.pos += movement
-        self.rect.topleft = self.pos
-        for obstacle in obstacles:
-            if self.rect.colliderect(obstacle.rect):
-                self.handle_collision(movement, obstacle, original_pos)
-
-        for shattered_enemy in shattered_enemies:
-            for fragment in shattered_enemy.fragments:
-                if self.rect.colliderect(fragment['rect']):
-                    fragment_center = pygame.Vector2(fragment['rect'].center)
-                    player_center = pygame.Vector2(self.rect.center)
-                    push_direction = fragment_center - player_center
-                    if push_direction.length() != 0:
-                        push_direction = push_direction.normalize()
-                        fragment['velocity'] += push_direction * 100  # Increased push velocity
-
-    def handle_collision(self, movement, obstacle, original_pos):
-        self.pos = original_pos
-        self.rect.topleft = self.pos
-
-        if movement.x != 0:
-            self.pos.x += movement.x
-            self.rect.x = self.pos.x
-            if self.rect.colliderect(obstacle.rect):
-                if movement.x > 0:
-                    self.pos.x = obstacle.rect.left - self.size
-                elif movement.x < 0:
-                    self.pos.x = obstacle.rect.right
-            self.rect.x = self.pos.x
-
-        if movement.y != 0:
-            self.pos.y += movement.y
-            self.rect.y = self.pos.y
-            if self.rect.colliderect(obstacle.rect):
-                if movement.y > 0:
-                    self.pos.y = obstacle.rect.top - self.size
-                elif movement.y < 0:
-                    self.pos.y = obstacle.rect.bottom
-            self.rect.y = self.pos.y
-
-    def clamp_position(self):
-        self.pos.x = max(0, min(WIDTH - self.size, self.pos.x))
-        self.pos.y = max(0, min(HEIGHT - self.size, self.pos.y))
-        self.rect.topleft = self.pos
-
-    def update_history(self):
-        self.history.append(self.pos.copy())
-
-    def draw(self, surface, color=None):
-        if self.visible:
-            if color is None:
-                color = self.color
-            pygame.draw.rect(surface, color, self.rect)
-
-class Echo:
-    def __init__(self, history):
-        self.history = list(history)
-        self.current_step = 0
-        self.size = PLAYER_SIZE
-        self.color = DARK_RED
-        self.rect = pygame.Rect(0, 0, self.size, self.size)
-
-    def update(self):
-        if self.current_step < len(self.history):
-            pos = self.history[-self.current_step - 1]
-            self.rect.topleft = pos
-            self.current_step += 1
-            return pos
-        return None
-
-    def draw(self, surface):
-        pos = self.update()
-        if pos:
-            pygame.draw.rect(surface, self.color, self.rect)
-            return True
-        return False
-
-MAX_COLLISIONS_BEFORE_RANDOM_DIRECTION = 3
-
-class Enemy:
-    def __init__(self, x, y, speed):
-        self.pos = pygame.Vector2(x, y)
-        self.size = 40
-        self.color = GREEN
-        self.speed = speed
-        angle = random.uniform(0, 360)
-        self.direction = pygame.Vector2(1, 0).rotate(angle).normalize()
-        self.rect = pygame.Rect(self.pos.x, self.pos.y, self.size, self.size)
-        self.stuck_timer = 0
-        self.last_pos = pygame.Vector2(self.pos)
-        self.collision_count = 0
-
-    def move(self, dt, obstacles, shattered_player):
-        adjusted_dt = self.get_adjusted_dt(dt)
-        self.update_position(adjusted_dt)
-        self.handle_bounds_collision()
-        self.handle_obstacle_collision(obstacles)
-        self.update_stuck_timer(adjusted_dt)
-        self.handle_shattered_player_collision(shattered_player)
-
-    def get_adjusted_dt(self, dt):
-        return min(dt, 1 / FPS) if dt > 1 / FPS else dt
-
-    def update_position(self, adjusted_dt):
-        adjusted_speed = self.speed * adjusted_dt
-        self.pos += self.direction * adjusted_speed
-        self.rect.topleft = self.pos
-
-    def handle_bounds_collision(self):
-        stuck = False
-
-        if self.pos.x < 0:
-            self.pos.x = 0
-            self.direction.x *= -1
-            stuck = True
-        elif self.pos.x > WIDTH - self.size:
-            self.pos.x = WIDTH - self.size
-            self.direction.x *= -1
-            stuck = True
-
-        if self.pos.y < 0:
-            self.pos.y = 0
-            self.direction.y *= -1
-            stuck = True
-        elif self.pos.y > HEIGHT - self.size:
-            self.pos.y = HEIGHT - self.size
-            self.direction.y *= -1
-            stuck = True
-
-        self.rect.topleft = self.pos
-        return stuck
-
-    def handle_obstacle_collision(self, obstacles):
-        for obstacle in obstacles:
-            if self.rect.colliderect(obstacle.rect):
-                self.collision_count += 1
-                overlap_x, overlap_y = self.calculate_overlap(obstacle)
-                self.resolve_obstacle_collision(overlap_x, overlap_y, obstacle)
-                self.rect.topleft = self.pos
-
-                if self.collision_count > MAX_COLLISIONS_BEFORE_RANDOM_DIRECTION:
-                    self.randomize_direction()
-                    self.collision_count = 0
-
-    def handle_shattered_player_collision(self, shattered_player):
-        if shattered_player:
-            for fragment in shattered_player.fragments:
-                if self.rect.colliderect(fragment['rect']):
-                    fragment_center = pygame.Vector2(fragment['rect'].center)
-                    enemy_center = pygame.Vector2(self.rect.center)
-                    push_direction = fragment_center - enemy_center
-                    if push_direction.length() != 0:
-                        push_direction = push_direction.normalize()
-                        fragment['velocity'] += push_direction * 100  # Increased push velocity
-
-    def calculate_overlap(self, obstacle):
-        overlap_x = min(self.rect.right, obstacle.rect.right) - max(self.rect.left, obstacle.rect.left)
-        overlap_y = min(self.rect.bottom, obstacle.rect.bottom) - max(self.rect.top, obstacle.rect.top)
-        return overlap_x, overlap_y
-
-    def resolve_obstacle_collision(self, overlap_x, overlap_y, obstacle):
-        if overlap_x < overlap_y:
-            if self.direction.x > 0:
-                self.pos.x = obstacle.rect.left - self.size
-            else:
-                self.pos.x = obstacle.rect.right
-            self.direction.x *= -1
-        else:
-            if self.direction.y > 0:
-                self.pos.y = obstacle.rect.top - self.size
-            else:
-                self.pos.y = obstacle.rect.bottom
-            self.direction.y *= -1
-        self.direction = self.direction.normalize()
-
-    def randomize_direction(self):
-        self.direction = pygame.Vector2(random.uniform(-1, 1), random.uniform(-1, 1)).normalize()
-
-    def update_stuck_timer(self, adjusted_dt):
-        if self.last_pos.distance_to(self.pos) < 1:
-            self.stuck_timer += adjusted_dt
-        else:
-            self.stuck_timer = 0
-
-        if self.stuck_timer > 1.0:
-            self.adjust_direction()
-            self.stuck_timer = 0
-
-        self.last_pos.update(self.pos)
-
-    def adjust_direction(self):
-        self.direction.rotate_ip(random.uniform(-45, 45))
-        self.direction = self.direction.normalize()
-
-    def draw(self, surface):
-        pygame.draw.rect(surface, self.color, self.rect)
-
-class Obstacle:
-    def __init__(self, x, y, width, height):
-        self.rect = pygame.Rect(x, y, width, height)
-        self.color = BLACK
-
-    def draw(self, surface):
-        pygame.draw.rect(surface, self.color, self.rect)
-
-class ShatteredEntity:
-    def __init__(self, x, y, size, color, num_fragments=15, velocity_range=(50, 150), fade=False):
-        self.fragments = []
-        self.size = size
-        self.color = color
-        self.fade = fade
-        fragment_size = size // 5
-        for _ in range(num_fragments):
-            offset_x = random.randint(-size//2, size//2)
-            offset_y = random.randint(-size//2, size//2)
-            fragment_rect = pygame.Rect(x + offset_x, y + offset_y, fragment_size, fragment_size)
-            angle = random.uniform(0, 360)
-            speed = random.uniform(*velocity_range)
-            velocity = pygame.Vector2(speed, 0).rotate(angle)
-            fragment = {
-                'rect': fragment_rect,
-                'velocity': velocity,
-                'alpha': 255 if fade else None,
-                'fade_timer': pygame.time.get_ticks() if fade else None
-            }
-            self.fragments.append(fragment)
-        self.fade_delay = 1000 if fade else None
-
-    def update(self, dt, obstacles):
-        current_time = pygame.time.get_ticks()
-        for fragment in self.fragments:
-            fragment['rect'].x += fragment['velocity'].x * dt
-            fragment['rect'].y += fragment['velocity'].y * dt
-
-            # Apply decay to velocity, but stop if below minimum threshold
-            if fragment['velocity'].length() > MIN_FRAGMENT_VELOCITY:
-                fragment['velocity'] *= FRAGMENT_VELOCITY_DECAY
-            else:
-                fragment['velocity'] = pygame.Vector2(0, 0)
-
-            if fragment['rect'].left <= 0 or fragment['rect'].right >= WIDTH:
-                fragment['velocity'].x = 0
-                fragment['rect'].x = max(0, min(fragment['rect'].x, WIDTH - fragment['rect'].width))
-            if fragment['rect'].top <= 0 or fragment['rect'].bottom >= HEIGHT:
-                fragment['velocity'].y = 0
-                fragment['rect'].y = max(0, min(fragment['rect'].y, HEIGHT - fragment['rect'].height))
-
-            for obstacle in obstacles:
-                if fragment['rect'].colliderect(obstacle.rect):
-                    fragment['velocity'] = pygame.Vector2(0, 0)
-                    if fragment['rect'].centerx < obstacle.rect.centerx:
-                        fragment['rect'].right = obstacle.rect.left
-                    else:
-                        fragment['rect'].left = obstacle.rect.right
-                    if fragment['rect'].centery < obstacle.rect.centery:
-                        fragment['rect'].bottom = obstacle.rect.top
-                    else:
-                        fragment['rect'].top = obstacle.rect.bottom
-
-            if self.fade and current_time - fragment['fade_timer'] >= self.fade_delay:
-                fragment['alpha'] -= 10  # Increased fade rate
-                fragment['alpha'] = max(fragment['alpha'], 0)
-
-    def draw(self, surface):
-        for fragment in self.fragments:
-            if self.fade and fragment['alpha'] > 0:
-                fragment_surface = pygame.Surface((fragment['rect'].width, fragment['rect'].height), pygame.SRCALPHA)
-                fragment_color = (*self.color, fragment['alpha'])
-                pygame.draw.rect(fragment_surface, fragment_color, (0, 0, fragment['rect'].width, fragment['rect'].height))
-                surface.blit(fragment_surface, fragment['rect'].topleft)
-            elif not self.fade:
-                pygame.draw.rect(surface, self.color, fragment['rect'])
-
-    def handle_push(self, entities):
-        # Optimize by limiting collision checks to nearby entities only
-        nearby_entities = [entity for entity in entities if self.is_near(entity)]
-        for fragment in self.fragments:
-            fragment_rect = fragment['rect']
-            for entity in nearby_entities:
-                if fragment_rect.colliderect(entity.rect):
-                    fragment_center = pygame.Vector2(fragment_rect.center)
-                    entity_center = pygame.Vector2(entity.rect.center)
-                    push_direction = fragment_center - entity_center
-                    if push_direction.length() != 0:
-                        push_direction = push_direction.normalize()
-                        fragment['velocity'] += push_direction * 100  # Increased push velocity
-
-    def is_near(self, entity):
-        # Consider entities within a 200-pixel radius as "near"
-        return self.fragments[0]['rect'].centerx - 200 < entity.rect.centerx < self.fragments[0]['rect'].centerx + 200 and \
-               self.fragments[0]['rect'].centery - 200 < entity.rect.centery < self.fragments[0]['rect'].centery + 200
-
-class ShatteredPlayer(ShatteredEntity):
-    def __init__(self, x, y, size, color, num_fragments=15):
-        super().__init__(x, y, size, color, num_fragments=num_fragments, velocity_range=(50, 150), fade=False)
-
-class ShatteredEnemy(ShatteredEntity):
-    def __init__(self, x, y, size, color, num_fragments=15):
-        super().__init__(x, y, size, color, num_fragments=num_fragments, velocity_range=(100, 300), fade=True)
-
-try:
-    SOUND_ECHO = pygame.mixer.Sound(resource_path('sounds/echo.wav'))
-    SOUND_DEATH = pygame.mixer.Sound(resource_path('sounds/death.wav'))
-    SOUND_SHATTER = pygame.mixer.Sound(resource_path('sounds/shatter.wav'))
-    SOUND_LEVEL_UP = pygame.mixer.Sound(resource_path('sounds/level_up.wav'))
-    SOUND_PAUSE = pygame.mixer.Sound(resource_path('sounds/pause.wav'))
-except pygame.error as e:
-    print(f"Error loading sound: {e}")
-    sys.exit(1)
-
-# Set sound volumes
-SOUND_ECHO.set_volume(0.5)
-SOUND_DEATH.set_volume(0.9)  # Increased death sound volume
-SOUND_SHATTER.set_volume(0.8)  # Increased shatter sound volume
-SOUND_LEVEL_UP.set_volume(0.8)
-SOUND_PAUSE.set_volume(0.3)
-
-def run_game():
-    player = Player(50, 50)
-    echoes = []
-    shattered_enemies = []
-    shattered_player = None
-
-    obstacles = [
-        Obstacle(200, 150, 100, 300),
-        Obstacle(500, 100, 50, 400),
-        Obstacle(350, 250, 100, 100)
-    ]
-
-    current_level_number = 1
-    level = Level(current_level_number)
-
-    enemies = []
-    for _ in range(level.num_enemies):
-        pos = generate_enemy_position(player.pos, obstacles, enemies, MIN_SPAWN_DISTANCE, 50)
-        if pos:
-            enemies.append(Enemy(pos[0], pos[1], level.enemy_speed))
-
-    score = 0
-    game_state = PLAYING
-    death_time = None
-    death_text_surface = None
-
-    while True:
-        dt = clock.tick(FPS) / 1000
-        current_time = pygame.time.get_ticks()
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_p:
-                    if game_state == PLAYING:
-                        game_state = PAUSED
-                        SOUND_PAUSE.play()
-                    elif game_state == PAUSED:
-                        game_state = PLAYING
-                        SOUND_PAUSE.play()
-                if game_state == PLAYING and event.key == pygame.K_e:
-                    if len(player.history) > 0:
-                        echo = Echo(player.history)
-                        echoes.append(echo)
-                        SOUND_ECHO.play()
-                if game_state == DEAD:
-                    if death_time and (current_time - death_time >= 500):
-                        if event.key not in [pygame.K_LCTRL, pygame.K_RCTRL,
-                                             pygame.K_LALT, pygame.K_RALT,
-                                             pygame.K_LSHIFT, pygame.K_RSHIFT]:
-                            enemies.clear()
-                            return
-
-        keys = pygame.key.get_pressed()
-
-        if game_state == PLAYING:
-            player.visible = True
-            player.handle_movement(keys, obstacles, shattered_enemies, dt)
-            player.update_history()
-            
-            # Broad-phase collision detection to reduce unnecessary fine checks
-            potential_colliders = [enemy for enemy in enemies if player.rect.colliderect(enemy.rect.inflate(50, 50))]
-
-            # Check collisions and handle game logic
-            player_rect = player.rect
-            for enemy in potential_colliders:
-                enemy_rect = enemy.rect
-                if check_collision(player_rect, enemy_rect):
-                    shattered_player = ShatteredPlayer(
-                        player.pos.x,
-                        player.pos.y,
-                        player.size,
-                        player.color,
-                        num_fragments=25  # Increased number of fragments
-                    )
-                    game_state = DEAD
-                    player.visible = False
-                    death_time = current_time
-                    death_text_surface = render_text_with_shadow("YOU ARE DEAD", large_font, DARK_RED, GRAY, shadow_offset=(5,5))
-                    SOUND_DEATH.play()
-                    break
-
-            for echo in echoes[:]:
-                active = echo.draw(SCREEN)
-                echo_pos = echo.update()
-                if echo_pos:
-                    echo_rect = echo.rect
-                    for enemy in enemies[:]:
-                        enemy_rect = enemy.rect
-                        if check_collision(echo_rect, enemy_rect):
-                            shattered_enemy = ShatteredEnemy(
-                                enemy.pos.x,
-                                enemy.pos.y,
-                                enemy.size,
-                                enemy.color,
-                                num_fragments=25  # Increased number of fragments
-                            )
-                            shattered_enemies.append(shattered_enemy)
-                            enemies.remove(enemy)
-                            echoes.remove(echo)
-                            score += 10
-                            SOUND_SHATTER.play()
-                            break
-                else:
-                    echoes.remove(echo)
-
-            if shattered_player:
-                shattered_player.handle_push([player] + enemies)
-            for shattered_enemy in shattered_enemies:
-                shattered_enemy.handle_push(enemies)
-
-            if not enemies:
-                current_level_number += 1
-                level = Level(current_level_number)
-
-                for i in range(level.num_enemies):
-                    pos = generate_enemy_position(player.pos, obstacles, enemies, MIN_SPAWN_DISTANCE, enemy_size=40)
-                    if pos:
-                        enemies.append(Enemy(pos[0], pos[1], level.enemy_speed))
-
-                echoes.clear()
-                SOUND_LEVEL_UP.play()
-
-        elif game_state == PAUSED:
-            pause_text = render_text_with_shadow("Paused", large_font, WHITE, GRAY, shadow_offset=(3, 3))
-            pause_rect = pause_text.get_rect(center=(WIDTH//2, HEIGHT//2))
-            SCREEN.blit(pause_text, pause_rect)
-            pygame.display.flip()
-            continue
-
-        elif game_state == DEAD:
-            if shattered_player:
-                shattered_player.update(dt, obstacles)
-            player.visible = False
-
-        # Keep enemies and shattered entities moving even when DEAD
-        if game_state != PAUSED:
-            for enemy in enemies:
-                enemy.move(dt, obstacles, shattered_player)
-
-        for shattered_enemy in shattered_enemies[:]:
-            shattered_enemy.update(dt, obstacles)
-            if all(fragment['alpha'] == 0 for fragment in shattered_enemy.fragments):
-                shattered_enemies.remove(shattered_enemy)
-
-        SCREEN.fill(WHITE)
-
-        for obstacle in obstacles:
-            obstacle.draw(SCREEN)
-
-        for echo in echoes[:]:
-            active = echo.draw(SCREEN)
-            if not active:
-                echoes.remove(echo)
-
-        for shattered_enemy in shattered_enemies:
-            shattered_enemy.draw(SCREEN)
-
-        for enemy in enemies:
-            enemy.draw(SCREEN)
-
-        if shattered_player:
-            shattered_player.draw(SCREEN)
-
-        player.draw(SCREEN)
-
-        # Display Score
-        score_text = font.render(f"Score: {score}", True, BLACK)
-        SCREEN.blit(score_text, (WIDTH - 150, 20))
-
-        # Display Number of Enemies
-        enemy_text = font.render(f"Enemies: {len(enemies)}", True, BLACK)
-        SCREEN.blit(enemy_text, (WIDTH // 2 - enemy_text.get_width() // 2, 60))
-
-        # Display Current Level
-        level_text = font.render(f"Level: {current_level_number}", True, BLACK)
-        SCREEN.blit(level_text, (WIDTH // 2 - level_text.get_width() // 2, 20))
-
-        # Display Instructions
-        if game_state == PLAYING:
-            instructions = [
-                "Move: Arrow Keys",
-                "Echo: 'E'",
-                "Pause: 'P'"
-            ]
-            for i, line in enumerate(instructions):
-                instr_surface = render_text_with_shadow(line, font, BLACK, GRAY, shadow_offset=(1,1))
-                SCREEN.blit(instr_surface, (20, 20 + i * 30))
-
-        # Display Death Overlay
-        if game_state == DEAD and death_text_surface:
-            overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-            overlay.fill(TINT_COLOR)
-            SCREEN.blit(overlay, (0, 0))
-            SCREEN.blit(death_text_surface, death_text_surface.get_rect(center=(WIDTH//2, HEIGHT//2)))
-
-        pygame.display.flip()
-
-def main():
-    while True:
-        run_game()
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+import time
+STARTED = time.perf_counter()  # before the other imports, for the startup report
+
+import argparse
+import os
+import pygame
+import random
+import sys
+
+from world import World, Inputs, WIDTH, HEIGHT, FPS, DEAD, ENEMY_AI_MODES, GAME_MODES, DEFAULT_TUNING
+from render import Renderer, DirtyRectRenderer
+from replay import Replay, SEED_LIMIT
+from profiler import FrameProfiler, ProfilerOverlay, PROFILE_DIR
+from assets import AssetManager, MIXER_SETTINGS, LOW_LATENCY_BUFFER
+from memory import GCController, GC_MODES
+from arena import ScatteredObstacles
+from levels import LevelLayout
+from telemetry import SessionLog, SessionStats, HighScores, SESSION_LOG
+from capture import VideoCapture, open_sink
+from net import NetHost, NetClient, PORT, check_arena
+
+IMPORTED = time.perf_counter()
+
+TICK = 1 / FPS  # seconds of simulation per step
+MAX_FRAME_TIME = 0.25  # longer frames are cut short rather than caught up on
+
+clock = pygame.time.Clock()
+
+def open_window(vsync=False):
+    # Only the display is needed up front; fonts and audio come up on demand
+    pygame.display.init()
+    if vsync:
+        # pygame only honours vsync for its SDL renderer, which SCALED uses
+        try:
+            screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.SCALED, vsync=1)
+        except pygame.error as e:
+            print(f"Could not enable vsync: {e}")
+            screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    else:
+        screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Echoes of Time")
+    return screen
+
+def report_startup(window_opened, assets, wait_for_audio=False):
+    """Print how long it took from start-up to the first frame on screen."""
+    first_frame = time.perf_counter()
+    ms = lambda t: (t - STARTED) * 1000
+    print(f"Startup: imports {ms(IMPORTED):.0f} ms, window {ms(window_opened):.0f} ms, "
+          f"first frame {ms(first_frame):.0f} ms")
+    if wait_for_audio:
+        assets.wait()
+        if assets.loaded_at is not None:
+            print(f"Audio {'ready' if assets.audio else 'unavailable'} at {ms(assets.loaded_at):.0f} ms")
+
+MODIFIER_KEYS = [pygame.K_LCTRL, pygame.K_RCTRL,
+                 pygame.K_LALT, pygame.K_RALT,
+                 pygame.K_LSHIFT, pygame.K_RSHIFT]
+
+# Profiler hotkeys: overlay on/off, cProfile capture start/stop, export frame timings
+PROFILER_KEYS = {
+    pygame.K_F3: FrameProfiler.toggle,
+    pygame.K_F4: FrameProfiler.toggle_capture,
+    pygame.K_F5: FrameProfiler.export,
+}
+
+def read_inputs(keys_pressed, echo_pressed, pause_pressed):
+    return Inputs(
+        left=keys_pressed[pygame.K_LEFT],
+        right=keys_pressed[pygame.K_RIGHT],
+        up=keys_pressed[pygame.K_UP],
+        down=keys_pressed[pygame.K_DOWN],
+        echo=echo_pressed,
+        pause=pause_pressed,
+    )
+
+def save_replay(replay, world, record_dir):
+    replay.checksum = world.checksum()
+    os.makedirs(record_dir, exist_ok=True)
+    path = os.path.join(record_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{replay.seed}.replay")
+    replay.save(path)
+    print(f"Saved replay to {path}")
+
+def new_world(seed=None, arena=None, layout=None, enemy_ai='bounce', mode='coop', tuning=DEFAULT_TUNING):
+    """The standard world, one built from a compiled level, or with arena=(width, height)
+    a scrolling one with scattered obstacles."""
+    options = dict(seed=seed, tuning=tuning, enemy_ai=enemy_ai, mode=mode)
+    if layout is not None:
+        return World(layout=layout, **options)
+    if arena is None:
+        return World(**options)
+    # The obstacle layout comes from the same seed as the game
+    if seed is None:
+        options['seed'] = seed = random.randrange(2 ** 32)
+    return World(*arena, obstacles=ScatteredObstacles(seed), **options)
+
+def parse_arena(text):
+    try:
+        width, height = (int(n) for n in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {text!r}")
+    if width < WIDTH or height < HEIGHT:
+        raise argparse.ArgumentTypeError(f"the arena can't be smaller than the screen ({WIDTH}x{HEIGHT})")
+    return width, height
+
+def parse_address(text):
+    host, _, port = text.rpartition(':')
+    if not host:
+        return text, PORT
+    try:
+        return host, int(port)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected HOST or HOST:PORT, got {text!r}")
+
+def end_session(stats, world, session_log, high_scores):
+    """Hand the finished session to the log's writer thread; nothing touches the disk here."""
+    entry = stats.record(world)
+    if session_log is not None:
+        session_log.record(entry)
+    if high_scores is not None:
+        high_scores.add(entry)
+
+def run_game(renderer, assets, seed=None, record_dir=None, profiler=None, first_frame=None, max_fps=FPS, gc_control=None,
+             arena=None, layout=None, enemy_ai='bounce', session_log=None, high_scores=None, capture=None,
+             mode='coop', host=None):
+    # Recording needs a deterministic world, so pick a seed if none was given
+    if record_dir and seed is None:
+        seed = random.randrange(2 ** 32)
+    world = new_world(seed, arena, layout, enemy_ai, mode)
+    if host is not None:
+        host.attach(world)
+    replay = Replay(world.seed) if record_dir else None
+    if profiler is None:
+        profiler = FrameProfiler()
+    if gc_control is None:
+        gc_control = GCController()
+    # A new game is a safe point for a full collection
+    gc_control.start()
+    stats = SessionStats(world.seed, enemy_ai=enemy_ai, arena=arena and f"{arena[0]}x{arena[1]}",
+                         level_file=layout and os.path.basename(layout.path))
+    try:
+        play_session(world, replay, renderer, assets, profiler, first_frame, max_fps, gc_control, stats, capture, host)
+    finally:
+        end_session(stats, world, session_log, high_scores)
+        if replay:
+            save_replay(replay, world, record_dir)
+
+def play_session(world, replay, renderer, assets, profiler, first_frame=None, max_fps=FPS, gc_control=None, stats=None,
+                 capture=None, host=None):
+    # The world always advances in fixed ticks of 1/FPS, as many per frame
+    # as the time that passed calls for. Frames are drawn as often as max_fps
+    # (0 for uncapped) or vsync allow, interpolated between the last two ticks.
+    # When hosting, the host steps the world with the remote players' inputs too.
+    world.interpolate = True
+    step = host.step if host is not None else world.step
+    accumulator = 0.0
+    echo_pressed = False
+    pause_pressed = False
+    while True:
+        frame_dt = clock.tick(max_fps) / 1000
+        profiler.begin_frame()
+        accumulator += min(frame_dt, MAX_FRAME_TIME)
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            if event.type == pygame.KEYDOWN:
+                if event.key in PROFILER_KEYS:
+                    PROFILER_KEYS[event.key](profiler)
+                    continue
+                if event.key == pygame.K_p:
+                    pause_pressed = True
+                elif event.key == pygame.K_e:
+                    echo_pressed = True
+                if world.state == DEAD:
+                    since_death = world.time_since_death()
+                    if since_death is not None and since_death >= 500:
+                        if event.key not in MODIFIER_KEYS:
+                            return
+
+        keys_pressed = pygame.key.get_pressed()
+        profiler.mark('input')
+        events = []
+        ticks = 0
+        while accumulator >= TICK:
+            # Presses go to the first tick; they wait for one if this frame has none
+            inputs = read_inputs(keys_pressed, echo_pressed, pause_pressed)
+            echo_pressed = pause_pressed = False
+            step(inputs, TICK)
+            if gc_control is not None:
+                gc_control.update(world.state, world.events)
+            accumulator -= TICK
+            ticks += 1
+            if replay:
+                replay.record(inputs)
+            events.extend(world.events)
+        profiler.mark('simulate')
+        if stats is not None:
+            stats.frame(frame_dt, events)
+        for event_name in events:
+            assets.play(event_name)
+        profiler.mark('audio')
+
+        renderer.render(world, accumulator / TICK)
+        profiler.mark('render')
+        if capture is not None:
+            # The video runs at the tick rate, so this frame stands for the ticks just simulated
+            capture.capture(renderer.screen, ticks)
+        if first_frame is not None:
+            first_frame()
+            first_frame = None
+
+def play_remote(client, renderer, assets, profiler, first_frame=None, max_fps=FPS, capture=None):
+    """Play in a game hosted elsewhere: send the keys, draw what the host sends back."""
+    echo_pressed = False
+    capture_ticks = 0.0  # host ticks the frames drawn so far have covered, for the video
+    while True:
+        frame_dt = clock.tick(max_fps) / 1000
+        profiler.begin_frame()
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                client.close()
+                pygame.quit()
+                sys.exit()
+            if event.type == pygame.KEYDOWN:
+                if event.key in PROFILER_KEYS:
+                    PROFILER_KEYS[event.key](profiler)
+                elif event.key == pygame.K_e:
+                    echo_pressed = True
+        client.send_inputs(read_inputs(pygame.key.get_pressed(), echo_pressed, False))
+        echo_pressed = False
+        profiler.mark('input')
+        client.poll()
+        events = client.world.update(frame_dt)
+        profiler.mark('simulate')
+        for event_name in events:
+            assets.play(event_name)
+        profiler.mark('audio')
+
+        renderer.render(client.world)
+        profiler.mark('render')
+        if capture is not None:
+            capture_ticks += min(frame_dt, MAX_FRAME_TIME) * FPS
+            ticks = int(capture_ticks)
+            capture_ticks -= ticks
+            capture.capture(renderer.screen, ticks)
+        if first_frame is not None:
+            first_frame()
+            first_frame = None
+
+def main():
+    parser = argparse.ArgumentParser(description="Echoes of Time")
+    parser.add_argument('--seed', type=int, default=None, help="play a deterministic game")
+    parser.add_argument('--record', metavar='DIR', default=None, help="save a replay of every session into DIR")
+    parser.add_argument('--dirty-rects', action='store_true', help="only redraw and present the parts of the screen that change")
+    parser.add_argument('--max-fps', type=int, default=FPS, help="cap on frames drawn per second, 0 for uncapped; the game itself always runs at 60 ticks/s")
+    parser.add_argument('--vsync', action='store_true', help="draw in step with the display's refresh")
+    parser.add_argument('--profile', action='store_true', help="start with the frame profiler on (F3 toggles it)")
+    parser.add_argument('--profile-dir', default=PROFILE_DIR, help="where F4 captures and F5 exports are saved")
+    parser.add_argument('--lazy-assets', action='store_true', help="load sounds on first use instead of in the background")
+    parser.add_argument('--audio-buffer', type=int, default=MIXER_SETTINGS['buffer'], help="mixer buffer size in samples")
+    parser.add_argument('--low-latency', action='store_true', help=f"use a {LOW_LATENCY_BUFFER}-sample mixer buffer")
+    parser.add_argument('--gc', choices=GC_MODES, default='auto', help="'defer' keeps garbage collection out of active play")
+    parser.add_argument('--arena', type=parse_arena, default=None, metavar='WxH',
+                        help="play in a scrolling arena of this size, e.g. 4000x3000")
+    parser.add_argument('--enemy-ai', choices=ENEMY_AI_MODES, default='bounce',
+                        help="'pursue' makes enemies chase the player round obstacles")
+    parser.add_argument('--level', metavar='FILE', default=None,
+                        help="play a level file (.lvl, or a .json source, compiled first if needed)")
+    parser.add_argument('--session-log', default=SESSION_LOG, metavar='FILE',
+                        help="append a record of every session here and read high scores from it")
+    parser.add_argument('--no-session-log', action='store_true', help="don't record sessions")
+    parser.add_argument('--capture', metavar='PATH', default=None,
+                        help="record the screen to a video file (needs ffmpeg) or a directory of PNGs")
+    parser.add_argument('--host', type=int, nargs='?', const=PORT, default=None, metavar='PORT',
+                        help=f"host a networked game on this UDP port (default {PORT}) and play in it")
+    parser.add_argument('--connect', type=parse_address, default=None, metavar='HOST[:PORT]',
+                        help="join a networked game")
+    parser.add_argument('--mode', choices=GAME_MODES, default='coop',
+                        help="when hosting: 'versus' lets echoes shatter the other players")
+    parser.add_argument('--measure-startup', action='store_true', help="report time to first frame and audio, then quit")
+    args = parser.parse_args()
+    if (args.arena or args.level or args.enemy_ai != 'bounce') and args.record:
+        parser.error("replays only cover the standard game; --arena, --level and --enemy-ai can't be combined with --record")
+    if args.arena and args.level:
+        parser.error("--arena and --level are alternatives")
+    if args.host is not None and args.connect:
+        parser.error("--host and --connect are alternatives")
+    if (args.host is not None or args.connect) and args.record:
+        parser.error("replays only cover single-player games; --host and --connect can't be combined with --record")
+    if args.record and args.seed is not None and not 0 <= args.seed < SEED_LIMIT:
+        parser.error(f"replays store the seed in 64 bits; --seed must be from 0 to {SEED_LIMIT - 1} with --record")
+    if args.connect and (args.arena or args.level or args.seed is not None or args.enemy_ai != 'bounce'):
+        parser.error("the host chooses the game; --connect can't be combined with --arena, --level, --seed or --enemy-ai")
+    layout = None
+    if args.level:
+        try:
+            layout = LevelLayout.load(args.level)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Could not load level {args.level}: {e}")
+            sys.exit(1)
+    if args.host is not None and (args.arena or layout):
+        try:
+            check_arena(*(args.arena or (layout.width, layout.height)))
+        except ValueError as e:
+            parser.error(str(e))
+
+    client = host = None
+    try:
+        if args.connect:
+            client = NetClient(*args.connect)
+            client.connect()
+        elif args.host is not None:
+            host = NetHost(args.host)
+            print(f"Hosting on UDP port {host.port}")
+    except (ConnectionError, OSError) as e:
+        print(f"Could not {'join' if args.connect else 'host'} the game: {e}")
+        sys.exit(1)
+
+    screen = open_window(args.vsync)
+    window_opened = time.perf_counter()
+    buffer = LOW_LATENCY_BUFFER if args.low_latency else args.audio_buffer
+    assets = AssetManager(mixer_settings=dict(MIXER_SETTINGS, buffer=buffer), background=not args.lazy_assets)
+    assets.start()
+
+    renderer_class = DirtyRectRenderer if args.dirty_rects else Renderer
+    renderer = renderer_class(screen, assets.font(36), assets.font(72))
+    profiler = FrameProfiler(enabled=args.profile, directory=args.profile_dir)
+    renderer.overlays.append(ProfilerOverlay(profiler, assets.font(20)))
+
+    def first_frame():
+        report_startup(window_opened, assets, wait_for_audio=args.measure_startup)
+        if args.measure_startup:
+            pygame.quit()
+            sys.exit()
+
+    session_log = high_scores = None
+    if not args.no_session_log and client is None:
+        session_log = SessionLog(args.session_log)
+        session_log.start()
+        high_scores = HighScores(args.session_log)
+        high_scores.start()
+        renderer.hud.high_scores = high_scores
+
+    capture = None
+    if args.capture:
+        try:
+            capture = VideoCapture(screen, open_sink(args.capture, screen.get_size()))
+        except (RuntimeError, ValueError, OSError) as e:
+            print(f"Could not start capture: {e}")
+            sys.exit(1)
+        capture.start()
+
+    max_fps = 0 if args.vsync else args.max_fps
+    gc_control = GCController(args.gc)
+    options = dict(arena=args.arena, layout=layout, enemy_ai=args.enemy_ai,
+                   session_log=session_log, high_scores=high_scores, capture=capture, mode=args.mode, host=host)
+    try:
+        if client is not None:
+            try:
+                play_remote(client, renderer, assets, profiler, first_frame, max_fps, capture)
+            except ConnectionError as e:
+                print(f"Left the game: {e}")
+                return
+        run_game(renderer, assets, args.seed, args.record, profiler, first_frame, max_fps, gc_control, **options)
+        while True:
+            run_game(renderer, assets, args.seed, args.record, profiler, max_fps=max_fps, gc_control=gc_control,
+                     **options)
+    finally:
+        # Quitting is the one place the game waits on the writer and the encoder
+        if session_log is not None:
+            session_log.close()
+        if capture is not None:
+            capture.close()
+        if host is not None:
+            host.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Run the simulation without a window, e.g. for automated playtests on CI."""
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import numpy as np
+
+from world import World, Inputs, DEAD, FPS, PLAYER_SIZE
+
+def random_bot(rng=None):
+    """Holds a random direction for a while and echoes now and then."""
+    rng = rng or random.Random()
+    state = {'inputs': Inputs(), 'hold': 0}
+
+    def policy(world):
+        if state['hold'] <= 0:
+            state['inputs'] = Inputs(
+                left=rng.random() < 0.3,
+                right=rng.random() < 0.3,
+                up=rng.random() < 0.3,
+                down=rng.random() < 0.3,
+            )
+            state['hold'] = rng.randint(5, 30)
+        state['hold'] -= 1
+        return state['inputs']._replace(echo=rng.random() < 0.02)
+    return policy
+
+def evasive_bot(rng=None, danger=150, echo_cooldown=30):
+    """Runs from the nearest enemy and drops an echo when one gets close."""
+    rng = rng or random.Random()
+    state = {'cooldown': 0, 'wander': random_bot(rng)}
+
+    def policy(world):
+        enemies = world.enemies
+        state['cooldown'] -= 1
+        if not len(enemies):
+            return Inputs()
+        px = world.player.pos.x + PLAYER_SIZE / 2
+        py = world.player.pos.y + PLAYER_SIZE / 2
+        dx = enemies.x + enemies.size / 2 - px
+        dy = enemies.y + enemies.size / 2 - py
+        distance = np.hypot(dx, dy)
+        nearest = int(distance.argmin())
+        if distance[nearest] > danger:
+            return state['wander'](world)._replace(echo=False)
+        echo = state['cooldown'] <= 0 and rng.random() < 0.5
+        if echo:
+            state['cooldown'] = echo_cooldown
+        # Head away from the enemy, sliding along walls rather than pressing into them
+        away_x, away_y = -dx[nearest], -dy[nearest]
+        bounds = world.bounds
+        if px < bounds.left + PLAYER_SIZE or px > bounds.right - PLAYER_SIZE:
+            away_x = 0
+        if py < bounds.top + PLAYER_SIZE or py > bounds.bottom - PLAYER_SIZE:
+            away_y = 0
+        return Inputs(left=away_x < -1, right=away_x > 1, up=away_y < -1, down=away_y > 1, echo=echo)
+    return policy
+
+def run_headless(steps, policy=None, dt=1 / FPS, restart_on_death=True, seed=None):
+    """Step fresh worlds for `steps` ticks. Returns (steps per second, finished worlds).
+
+    With a seed, the n-th world is seeded with seed + n and the default bot is
+    seeded too, so the whole run is reproducible.
+    """
+    policy = policy or random_bot(random.Random(seed))
+    world = World(seed=seed)
+    worlds = [world]
+    start = time.perf_counter()
+    for _ in range(steps):
+        world.step(policy(world), dt)
+        if restart_on_death and world.state == DEAD and world.time_since_death() >= 1000:
+            world = World(seed=None if seed is None else seed + len(worlds))
+            worlds.append(world)
+    elapsed = time.perf_counter() - start
+    return steps / elapsed if elapsed > 0 else float('inf'), worlds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--steps', type=int, default=10000)
+    parser.add_argument('--dt', type=float, default=1 / FPS)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    rate, worlds = run_headless(args.steps, dt=args.dt, seed=args.seed)
+    best = max(worlds, key=lambda w: w.score)
+    print(f"{args.steps} steps at {rate:.0f} steps/s, {len(worlds)} runs, best score {best.score} (level {best.level_number})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""Player position history shared by all echoes."""
+import numpy as np
+
+class HistoryBuffer:
+    """Preallocated float32 ring buffer holding one player position per tick.
+
+    Positions are addressed by an absolute tick index that only ever grows, so
+    an echo can keep a (end, count) window into the buffer instead of copying
+    it. The buffer holds twice the echo window: echoes replay one sample
+    per tick while one new sample is written per tick, so nothing
+    an echo still needs is overwritten.
+    """
+
+    def __init__(self, length):
+        self.length = length
+        self.capacity = 2 * length + 1
+        self.positions = np.zeros((self.capacity, 2), dtype=np.float32)
+        self.written = 0  # absolute index of the next sample
+
+    def __len__(self):
+        return min(self.written, self.length)
+
+    def append(self, x, y):
+        self.positions[self.written % self.capacity] = (x, y)
+        self.written += 1
+
+    def clear(self):
+        self.written = 0
+
+    def position(self, index):
+        x, y = self.positions[index % self.capacity].tolist()
+        return x, y
@@ -0,0 +1,126 @@
+"""HUD and overlay text, rendered once and reused until it changes."""
+from collections import OrderedDict
+
+import pygame
+
+from world import WIDTH, HEIGHT, WHITE, BLACK, GRAY, DARK_RED, TINT_COLOR, PLAYING
+
+INSTRUCTIONS = [
+    "Move: Arrow Keys",
+    "Echo: 'E'",
+    "Pause: 'P'"
+]
+
+def render_text_with_shadow(text, font, main_color, shadow_color, shadow_offset=(2, 2)):
+    text_surface = font.render(text, True, main_color)
+    shadow_surface = font.render(text, True, shadow_color)
+    combined_surface = pygame.Surface(
+        (text_surface.get_width() + shadow_offset[0], text_surface.get_height() + shadow_offset[1]),
+        pygame.SRCALPHA
+    )
+    combined_surface.blit(shadow_surface, shadow_offset)
+    combined_surface.blit(text_surface, (0, 0))
+    return combined_surface
+
+class TextCache:
+    """LRU cache of rendered text keyed on (text, font, colours, shadow offset)."""
+
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.surfaces)
+
+    def render(self, text, font, color, shadow_color=None, shadow_offset=None):
+        key = (text, font, color, shadow_color, shadow_offset)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        if shadow_color is None:
+            surface = font.render(text, True, color)
+        else:
+            surface = render_text_with_shadow(text, font, color, shadow_color, shadow_offset)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+class CounterLabel:
+    """A "Name: value" label that is only re-rendered when its value changes."""
+
+    def __init__(self, label, font, color):
+        self.label = label
+        self.font = font
+        self.color = color
+        self.value = None
+        self.surface = None
+
+    def render(self, value):
+        if self.surface is None or value != self.value:
+            self.value = value
+            self.surface = self.font.render(f"{self.label}: {value}", True, self.color)
+        return self.surface
+
+class Hud:
+    def __init__(self, font, large_font, text_cache=None):
+        self.font = font
+        self.large_font = large_font
+        self.text_cache = text_cache if text_cache is not None else TextCache()
+        self.score_label = CounterLabel("Score", font, BLACK)
+        self.enemy_label = CounterLabel("Enemies", font, BLACK)
+        self.level_label = CounterLabel("Level", font, BLACK)
+        self.best_label = CounterLabel("Best", font, BLACK)
+        self.high_scores = None  # a telemetry.HighScores, shown once it has loaded
+        self.overlays = {}
+
+    def items(self, world):
+        """The HUD for this frame as (surface, position) pairs."""
+        # Display Score
+        score_text = self.score_label.render(world.score)
+        items = [(score_text, (WIDTH - 150, 20))]
+
+        # Display the best score so far, once the high scores have loaded
+        best = self.high_scores.best() if self.high_scores is not None else None
+        if best is not None:
+            items.append((self.best_label.render(best), (WIDTH - 150, 50)))
+
+        # Display Number of Enemies
+        enemy_text = self.enemy_label.render(len(world.enemies))
+        items.append((enemy_text, (WIDTH // 2 - enemy_text.get_width() // 2, 60)))
+
+        # Display Current Level
+        level_text = self.level_label.render(world.level_number)
+        items.append((level_text, (WIDTH // 2 - level_text.get_width() // 2, 20)))
+
+        # Display Instructions
+        if world.state == PLAYING:
+            for i, line in enumerate(INSTRUCTIONS):
+                instr_surface = self.text_cache.render(line, self.font, BLACK, GRAY, (1, 1))
+                items.append((instr_surface, (20, 20 + i * 30)))
+        return items
+
+    def pause_text(self):
+        return self.text_cache.render("Paused", self.large_font, WHITE, GRAY, (3, 3))
+
+    def death_text(self):
+        return self.text_cache.render("YOU ARE DEAD", self.large_font, DARK_RED, GRAY, (5, 5))
+
+    def overlay(self, color, size=(WIDTH, HEIGHT)):
+        """A prebuilt full-screen tint."""
+        key = (color, size)
+        overlay = self.overlays.get(key)
+        if overlay is None:
+            overlay = pygame.Surface(size, pygame.SRCALPHA)
+            overlay.fill(color)
+            self.overlays[key] = overlay
+        return overlay
+
+    def death_overlay(self):
+        return self.overlay(TINT_COLOR)
@@ -0,0 +1,279 @@
+"""Level files: arena layouts written as JSON and compiled to a binary format that loads with mmap.
+
+A level source is a JSON object:
+
+    {
+        "width": 800, "height": 600,
+        "obstacles": [[x, y, width, height], ...],
+        "spawn_regions": [[x, y, width, height], ...],  (optional, default the whole arena)
+        "waves": [[enemies, speed], ...]  (level 1 first; optional)
+    }
+
+Levels past the end of "waves" keep growing from the last entry by the
+tuning's enemies_per_level and speed_per_level; with no waves at all the
+tuning's formula is used.
+
+Compiling adds an occupancy bitmap of the arena and its summed-area table,
+at the coarsest cell size (up to MAX_CELL pixels) that every obstacle edge
+falls on, so the table answers "does this rect touch an obstacle?" exactly
+with four lookups, however many obstacles there are. A compiled file is
+mapped into memory rather than read, so large levels load instantly and
+only the pages that are queried are ever read from disk.
+"""
+import argparse
+import json
+import math
+import mmap
+import os
+import struct
+
+import numpy as np
+import pygame
+
+MAGIC = b'EOTL'
+VERSION = 1
+# magic, version, cell size, width, height, obstacles, spawn regions, waves
+HEADER = struct.Struct('<4sBxHIIIII')
+MAX_CELL = 16  # pixels per occupancy cell at most
+ALIGN = 8  # sections start on multiples of this many bytes
+
+def cell_size(width, height, rects, max_cell=MAX_CELL):
+    """The largest cell size up to max_cell that every rect edge and the arena size are multiples of."""
+    edges = [width, height]
+    for x, y, w, h in rects:
+        edges.extend((x, y, x + w, y + h))
+    divisor = 0
+    for edge in edges:
+        divisor = math.gcd(divisor, edge)
+    return max(cell for cell in range(1, max_cell + 1) if divisor % cell == 0)
+
+def occupancy_bitmap(width, height, rects, cell):
+    """(rows, columns) bool grid of the cells covered by the rects, clipped to the arena."""
+    bounds = pygame.Rect(0, 0, width, height)
+    occupied = np.zeros((-(-height // cell), -(-width // cell)), dtype=bool)
+    for rect in rects:
+        r = pygame.Rect(rect).clip(bounds)
+        if r:
+            occupied[r.top // cell:r.bottom // cell, r.left // cell:r.right // cell] = True
+    return occupied
+
+def summed_area_table(occupied):
+    """(rows + 1, columns + 1) uint32 table; entry [r, c] counts the occupied cells above and left of it."""
+    table = np.zeros((occupied.shape[0] + 1, occupied.shape[1] + 1), dtype=np.uint32)
+    table[1:, 1:] = occupied.cumsum(axis=0, dtype=np.uint32).cumsum(axis=1, dtype=np.uint32)
+    return table
+
+def read_source(path):
+    """Load and check a JSON level source. Returns a dict of plain lists."""
+    with open(path) as f:
+        source = json.load(f)
+    width, height = int(source['width']), int(source['height'])
+    if width <= 0 or height <= 0:
+        raise ValueError(f"{path}: the arena must have a positive size")
+    level = {'width': width, 'height': height}
+    for name in ('obstacles', 'spawn_regions'):
+        rects = [tuple(int(v) for v in rect) for rect in source.get(name, [])]
+        for rect in rects:
+            if len(rect) != 4 or rect[2] <= 0 or rect[3] <= 0:
+                raise ValueError(f"{path}: {name} entries must be [x, y, width, height], got {list(rect)}")
+        level[name] = rects
+    waves = [(int(enemies), float(speed)) for enemies, speed in source.get('waves', [])]
+    if any(enemies < 0 or speed < 0 for enemies, speed in waves):
+        raise ValueError(f"{path}: waves need non-negative enemy counts and speeds")
+    level['waves'] = waves
+    return level
+
+def pad(out):
+    out.extend(bytes(-len(out) % ALIGN))
+
+def compile_level(source_path, out_path=None, max_cell=MAX_CELL):
+    """Compile a JSON level source into a .lvl file next to it (or to out_path). Returns the output path."""
+    if out_path is None:
+        out_path = os.path.splitext(source_path)[0] + '.lvl'
+    level = read_source(source_path)
+    width, height, obstacles = level['width'], level['height'], level['obstacles']
+    cell = cell_size(width, height, obstacles, max_cell)
+    occupied = occupancy_bitmap(width, height, obstacles, cell)
+
+    out = bytearray(HEADER.pack(MAGIC, VERSION, cell, width, height,
+                                len(obstacles), len(level['spawn_regions']), len(level['waves'])))
+    pad(out)
+    for array in (np.array(obstacles, dtype='<i4').reshape(-1, 4),
+                  np.array(level['spawn_regions'], dtype='<i4').reshape(-1, 4),
+                  np.array([enemies for enemies, _ in level['waves']], dtype='<i4'),
+                  np.array([speed for _, speed in level['waves']], dtype='<f8'),
+                  np.packbits(occupied, axis=1),
+                  summed_area_table(occupied).astype('<u4')):
+        out.extend(array.tobytes())
+        pad(out)
+    # Write next to the target and rename, so a running game never maps a half-written file
+    partial = out_path + '.part'
+    with open(partial, 'wb') as f:
+        f.write(out)
+    os.replace(partial, out_path)
+    return out_path
+
+class LevelLayout:
+    """A compiled level mapped into memory.
+
+    The arrays are read-only views onto the file's pages. Besides the level
+    data it works as an obstacle source for a ChunkMap (see arena.py).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.read_sections()
+        except Exception:
+            self.close()
+            raise
+        self.bounds = pygame.Rect(0, 0, self.width, self.height)
+        self.obstacle_rects = [pygame.Rect(rect) for rect in self.obstacles.tolist()]
+        self.spawn_regions = [pygame.Rect(rect) for rect in self.regions.tolist()]
+
+    def read_sections(self):
+        data = self.map
+        if len(data) < HEADER.size:
+            raise ValueError(f"{self.path}: not an Echoes of Time level")
+        magic, version, cell, width, height, obstacles, regions, waves = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path}: not an Echoes of Time level")
+        if version != VERSION:
+            raise ValueError(f"{self.path}: unsupported level version {version}")
+        self.cell, self.width, self.height = cell, width, height
+        rows, columns = -(-height // cell), -(-width // cell)
+        offset = HEADER.size + (-HEADER.size % ALIGN)
+
+        def section(dtype, shape):
+            nonlocal offset
+            count = int(np.prod(shape))
+            if offset + count * np.dtype(dtype).itemsize > len(data):
+                raise ValueError(f"{self.path}: level file is truncated")
+            array = np.frombuffer(data, dtype=dtype, count=count, offset=offset).reshape(shape)
+            offset += array.nbytes + (-array.nbytes % ALIGN)
+            return array
+
+        self.obstacles = section('<i4', (obstacles, 4))
+        self.regions = section('<i4', (regions, 4))
+        self.wave_enemies = section('<i4', (waves,))
+        self.wave_speeds = section('<f8', (waves,))
+        self.bitmap = section(np.uint8, (rows, (columns + 7) // 8))
+        self.table = section('<u4', (rows + 1, columns + 1))
+
+    @classmethod
+    def load(cls, path):
+        """Map a compiled level, compiling a .json source first if its .lvl is missing or older."""
+        if path.endswith('.json'):
+            compiled = os.path.splitext(path)[0] + '.lvl'
+            if not os.path.exists(compiled) or os.path.getmtime(compiled) < os.path.getmtime(path):
+                compile_level(path, compiled)
+            path = compiled
+        return cls(path)
+
+    def close(self):
+        # The arrays hold the map's buffer, so they go first
+        self.obstacles = self.regions = self.wave_enemies = self.wave_speeds = self.bitmap = self.table = None
+        self.map.close()
+
+    def wave(self, level_number, tuning):
+        """(enemies, speed) for a level, from the waves table or the tuning's formula."""
+        waves = len(self.wave_enemies)
+        if not waves:
+            return (tuning.base_enemies + tuning.enemies_per_level * level_number,
+                    tuning.base_speed + level_number * tuning.speed_per_level)
+        last = min(level_number, waves) - 1
+        extra = level_number - 1 - last
+        return (int(self.wave_enemies[last]) + tuning.enemies_per_level * extra,
+                float(self.wave_speeds[last]) + tuning.speed_per_level * extra)
+
+    def cell_span(self, start, end, cells):
+        return max(0, min(start // self.cell, cells)), max(0, min(-(-end // self.cell), cells))
+
+    def occupied_count(self, rect):
+        """Occupied cells a rect overlaps; empty rects overlap nothing, as with colliderect."""
+        if rect[2] <= 0 or rect[3] <= 0:
+            return 0
+        rows, columns = self.table.shape
+        c0, c1 = self.cell_span(rect[0], rect[0] + rect[2], columns - 1)
+        r0, r1 = self.cell_span(rect[1], rect[1] + rect[3], rows - 1)
+        if c0 >= c1 or r0 >= r1:
+            return 0
+        table = self.table
+        return int(table[r1, c1]) - int(table[r0, c1]) - int(table[r1, c0]) + int(table[r0, c0])
+
+    def rect_clear(self, rect):
+        """Whether a rect misses every obstacle."""
+        return self.occupied_count(rect) == 0
+
+    def rects_touching(self, left, top, right, bottom):
+        """Mask of the rects (as arrays of edges) that touch an obstacle."""
+        rows, columns = self.table.shape
+        cell = self.cell
+        c0 = np.clip(left // cell, 0, columns - 1).astype(np.intp)
+        c1 = np.clip(-(-right // cell), 0, columns - 1).astype(np.intp)
+        r0 = np.clip(top // cell, 0, rows - 1).astype(np.intp)
+        r1 = np.clip(-(-bottom // cell), 0, rows - 1).astype(np.intp)
+        table = self.table
+        counts = (table[r1, c1].astype(np.int64) - table[r0, c1] - table[r1, c0] + table[r0, c0])
+        return (counts > 0) & (c0 < c1) & (r0 < r1) & (right > left) & (bottom > top)
+
+    def point_blocked(self, x, y):
+        """Whether the pixel at (x, y) is inside an obstacle."""
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        column = int(x) // self.cell
+        return bool(self.bitmap[int(y) // self.cell, column >> 3] >> (7 - (column & 7)) & 1)
+
+    def chunk(self, cx, cy, chunk_size):
+        """(key, rect) for every obstacle overlapping a chunk, like arena.StaticObstacles."""
+        area = pygame.Rect(cx * chunk_size, cy * chunk_size, chunk_size, chunk_size)
+        return [(i, rect) for i, rect in enumerate(self.obstacle_rects) if rect.colliderect(area)]
+
+class OccupancyIndex:
+    """An obstacle SpatialGrid fronted by a level's occupancy table.
+
+    Rects the table says are clear skip the grid entirely; the rest are
+    looked up in the grid as usual, so results are unchanged.
+    """
+
+    def __init__(self, layout, grid):
+        self.layout = layout
+        self.grid = grid
+
+    def __len__(self):
+        return len(self.grid)
+
+    def rebuild(self, items):
+        self.grid.rebuild(items)
+
+    def query(self, rect):
+        if self.layout.rect_clear(rect):
+            return []
+        return self.grid.query(rect)
+
+    def sweep(self, rect):
+        if self.layout.rect_clear(rect):
+            return iter(())
+        return self.grid.sweep(rect)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile JSON level sources into mappable .lvl files.")
+    parser.add_argument('sources', nargs='+', metavar='level.json')
+    parser.add_argument('--max-cell', type=int, default=MAX_CELL, help="largest occupancy cell size in pixels")
+    args = parser.parse_args()
+
+    for source in args.sources:
+        try:
+            path = compile_level(source, max_cell=args.max_cell)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Could not compile {source}: {e}")
+            raise SystemExit(1)
+        layout = LevelLayout(path)
+        print(f"{path}: {layout.width}x{layout.height}, {len(layout.obstacle_rects)} obstacles, "
+              f"{len(layout.wave_enemies)} waves, {layout.cell}px cells, {os.path.getsize(path)} bytes")
+        layout.close()
+
+if __name__ == "__main__":
+    main()
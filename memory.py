@@ -0,0 +1,57 @@
+"""Garbage-collector control, to keep collection pauses out of active play."""
+import gc
+import time
+
+from world import PAUSED, EVENT_LEVEL_UP, EVENT_PAUSE, EVENT_DEATH
+
+GC_MODES = ('auto', 'defer')
+MAX_PENDING_OBJECTS = 50000  # young objects allowed to pile up before a deferred collection runs anyway
+
+class GCController:
+    """Keeps Python's cyclic garbage collector from pausing active play.
+
+    In 'defer' mode automatic collection is off during play. Garbage is
+    collected at safe points instead: a new game, a pause, the player's death
+    or a level change. The survivors are then frozen so later collections
+    don't rescan them. If too many new objects pile up between safe points,
+    a young-generation collection, which is quick, runs anyway. 'auto' leaves
+    the collector alone.
+    """
+
+    def __init__(self, mode='auto', max_pending=MAX_PENDING_OBJECTS):
+        if mode not in GC_MODES:
+            raise ValueError(f"Unknown GC mode {mode!r}, expected one of {GC_MODES}")
+        self.mode = mode
+        self.max_pending = max_pending
+        self.stats = {'collections': 0, 'young_collections': 0, 'collect_ms': 0.0}
+
+    def start(self):
+        """Call at a safe point before play starts."""
+        if self.mode == 'defer':
+            gc.disable()
+            self.collect()
+
+    def stop(self):
+        if self.mode == 'defer':
+            gc.unfreeze()
+            gc.enable()
+
+    def collect(self):
+        start = time.perf_counter()
+        gc.unfreeze()
+        gc.collect()
+        gc.freeze()
+        self.stats['collections'] += 1
+        self.stats['collect_ms'] += (time.perf_counter() - start) * 1000
+
+    def update(self, state, events):
+        """Call after each step with the world's state and events."""
+        if self.mode != 'defer':
+            return
+        # Pausing and dying are safe points, unpausing isn't
+        entered_pause = state == PAUSED and EVENT_PAUSE in events
+        if EVENT_LEVEL_UP in events or EVENT_DEATH in events or entered_pause:
+            self.collect()
+        elif gc.get_count()[0] > self.max_pending:
+            gc.collect(0)
+            self.stats['young_collections'] += 1
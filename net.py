@@ -0,0 +1,960 @@
+"""Networked co-op and versus: an authoritative host and clients over UDP.
+
+The host runs the only World. Clients send their inputs every frame; the
+host steps the world with everyone's inputs and every SNAPSHOT_EVERY ticks
+sends each client a snapshot of what is around that client's player:
+
+- positions quantised to QUANTUM pixels,
+- enemies and echoes as a delta against the last snapshot the client
+  acknowledged: moved ones as one-byte offsets, unchanged ones not at all,
+- only entities near the client's view, and at most MAX_ENEMIES and
+  MAX_ECHOES of those, nearest first,
+- no fragments: each burst is sent as its seed and origin, repeated until
+  acknowledged, and the client rebuilds it with the generator the host used.
+
+So what a snapshot costs to build and send depends on what one player can
+see, not on how many enemies or fragments the world holds. Clients draw
+the world SNAPSHOT_DELAY ticks behind the newest snapshot, interpolating
+between the two either side, and run the fragments themselves.
+
+    python3 net.py host --port 4711          # a dedicated host
+    python3 game.py --connect 127.0.0.1:4711  # join it with a window
+    python3 net.py local --clients 3          # a host and three bot clients, each its own process
+"""
+import argparse
+import json
+import random
+import socket
+import struct
+import subprocess
+import sys
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+import pygame
+
+from world import (
+    Obstacle, Inputs, NO_INPUTS, FPS, GREEN, PLAYER_SIZE, PLAYER_COLORS, ECHO_COLORS,
+    FRAGMENTS_PER_BURST, PLAYING, PAUSED, DEAD, GAME_MODES, EVENT_DEATH, EVENT_SHATTER, EVENT_LEVEL_UP,
+)
+from arena import ChunkMap, StaticObstacles, ScatteredObstacles, follow_view
+from fragments import FragmentStore, ShatteredEnemy, ShatteredPlayer, SpriteCache, push_fragments
+from soa import round_half_away, to_view
+
+PORT = 4711
+PROTOCOL = 1
+QUANTUM = 0.25  # pixels per unit of a sent position
+MAX_ARENA = int(0x10000 * QUANTUM)  # widest and tallest world whose uint16 positions can be sent
+SNAPSHOT_EVERY = 3  # ticks between snapshots, 20 a second
+SNAPSHOT_DELAY = 2 * SNAPSHOT_EVERY  # ticks clients draw behind the newest snapshot
+INTEREST_MARGIN = 200  # pixels beyond a client's view that are still sent
+MAX_ENEMIES = 96  # per snapshot, nearest first
+MAX_ECHOES = 32
+MAX_BURSTS = 16
+BURST_LIFETIME = 2 * FPS  # ticks a burst is worth resending for
+HISTORY = 32  # snapshots remembered per client as delta baselines
+TIMEOUT = 5.0  # seconds without a packet before a client is dropped
+RESTART_DELAY = 3.0  # seconds the dedicated host waits after everyone has fallen
+MAX_DATAGRAM = 65507
+
+# Packets start with a one-byte type
+HELLO, WELCOME, FULL, INPUT, BYE, SNAPSHOT = b'H', b'W', b'F', b'I', b'B', b'S'
+HELLO_PACKET = struct.Struct('<cB')  # type, protocol
+WELCOME_PACKET = struct.Struct('<cBBH')  # type, protocol, player index, round; then the world as JSON
+INPUT_PACKET = struct.Struct('<cIBB')  # type, newest snapshot received, held buttons, echo presses so far (wrapping)
+SNAPSHOT_HEADER = struct.Struct('<cIIHIHBiB')  # type, seq, baseline seq (0 for none), round, tick, level, state, score, players
+SECTION = struct.Struct('<HHH')  # removed, moved and added entries of a delta
+COUNT = struct.Struct('<H')
+
+PLAYER_ENTRY = np.dtype([('index', 'u1'), ('flags', 'u1'), ('x', '<u2'), ('y', '<u2'), ('score', '<i4')])
+MOVED_ENTRY = np.dtype([('handle', '<u4'), ('dx', 'i1'), ('dy', 'i1')])
+ADDED_ENTRY = np.dtype([('handle', '<u4'), ('x', '<u2'), ('y', '<u2'), ('size', 'u1')])
+BURST_ENTRY = np.dtype([('seed', '<u4'), ('x', '<i2'), ('y', '<i2'), ('size', 'u1'), ('kind', 'u1'), ('tick', '<u4')])
+
+ALIVE, VISIBLE = 1, 2
+BUTTONS = ('left', 'right', 'up', 'down')
+STATES = (PLAYING, PAUSED, DEAD)
+
+# Quantised entities sorted by handle; echo handles carry their owner's index in the top byte
+Entities = namedtuple('Entities', ['handle', 'x', 'y', 'size'])
+NO_ENTITIES = Entities(np.empty(0, np.uint32), np.empty(0, np.uint16), np.empty(0, np.uint16), np.empty(0, np.uint8))
+
+def check_arena(width, height):
+    """Raise ValueError if a world this size can't be hosted: positions past MAX_ARENA would be sent wrong."""
+    if width > MAX_ARENA or height > MAX_ARENA:
+        raise ValueError(f"a networked arena can be at most {MAX_ARENA}x{MAX_ARENA}, got {width}x{height}")
+
+def quantise(values):
+    return np.clip(np.round(np.asarray(values, dtype=np.float64) / QUANTUM), 0, 0xffff).astype(np.uint16)
+
+def nearest_entities(handle, x, y, size, area, centre, limit):
+    """The entities overlapping `area`, at most `limit` of them nearest `centre`, quantised."""
+    inside = (x < area.right) & (x + size > area.left) & (y < area.bottom) & (y + size > area.top)
+    rows = np.flatnonzero(inside)
+    if len(rows) > limit:
+        distance = np.hypot(x[rows] + size[rows] / 2 - centre[0], y[rows] + size[rows] / 2 - centre[1])
+        rows = rows[np.argpartition(distance, limit)[:limit]]
+    order = np.argsort(handle[rows], kind='stable')
+    rows = rows[order]
+    return Entities(handle[rows].astype(np.uint32), quantise(x[rows]), quantise(y[rows]),
+                    np.minimum(size[rows], 0xff).astype(np.uint8))
+
+def encode_delta(current, base):
+    """Bytes that turn the entities `base` into `current`."""
+    count = len(current.handle)
+    found = np.zeros(count, dtype=bool)
+    dx = dy = np.zeros(count, dtype=np.int32)
+    if len(base.handle) and count:
+        index = np.minimum(np.searchsorted(base.handle, current.handle), len(base.handle) - 1)
+        found = base.handle[index] == current.handle
+        dx = current.x.astype(np.int32) - base.x[index]
+        dy = current.y.astype(np.int32) - base.y[index]
+    unchanged = found & (dx == 0) & (dy == 0)
+    moved = found & ~unchanged & (np.abs(dx) <= 127) & (np.abs(dy) <= 127)
+    added = ~(unchanged | moved)
+    removed = base.handle[~np.isin(base.handle, current.handle, assume_unique=True)]
+
+    moved_entries = np.empty(int(moved.sum()), dtype=MOVED_ENTRY)
+    moved_entries['handle'] = current.handle[moved]
+    moved_entries['dx'] = dx[moved]
+    moved_entries['dy'] = dy[moved]
+    added_entries = np.empty(int(added.sum()), dtype=ADDED_ENTRY)
+    added_entries['handle'] = current.handle[added]
+    added_entries['x'] = current.x[added]
+    added_entries['y'] = current.y[added]
+    added_entries['size'] = current.size[added]
+    return b''.join((SECTION.pack(len(removed), len(moved_entries), len(added_entries)),
+                     removed.astype('<u4').tobytes(), moved_entries.tobytes(), added_entries.tobytes()))
+
+def decode_delta(data, offset, base):
+    """(entities, offset after the delta) from a delta against `base`. Raises ValueError if it doesn't apply."""
+    removed_count, moved_count, added_count = SECTION.unpack_from(data, offset)
+    offset += SECTION.size
+    removed = np.frombuffer(data, '<u4', removed_count, offset)
+    offset += removed.nbytes
+    moved = np.frombuffer(data, MOVED_ENTRY, moved_count, offset)
+    offset += moved.nbytes
+    added = np.frombuffer(data, ADDED_ENTRY, added_count, offset)
+    offset += added.nbytes
+
+    x = base.x.astype(np.int32)
+    y = base.y.astype(np.int32)
+    if moved_count:
+        if not len(base.handle):
+            raise ValueError("moves against an empty baseline")
+        index = np.minimum(np.searchsorted(base.handle, moved['handle']), len(base.handle) - 1)
+        if not (base.handle[index] == moved['handle']).all():
+            raise ValueError("moves for entities missing from the baseline")
+        x[index] += moved['dx']
+        y[index] += moved['dy']
+    keep = ~np.isin(base.handle, removed) & ~np.isin(base.handle, added['handle'])
+    handle = np.concatenate((base.handle[keep], added['handle'])).astype(np.uint32)
+    order = np.argsort(handle, kind='stable')
+    return Entities(handle[order],
+                    np.concatenate((x[keep], added['x'])).astype(np.uint16)[order],
+                    np.concatenate((y[keep], added['y'])).astype(np.uint16)[order],
+                    np.concatenate((base.size[keep], added['size'])).astype(np.uint8)[order]), offset
+
+def inputs_from_buttons(buttons, echo=False):
+    return Inputs(**{name: bool(buttons >> bit & 1) for bit, name in enumerate(BUTTONS)}, echo=echo)
+
+def buttons_from_inputs(inputs):
+    return sum(1 << bit for bit, name in enumerate(BUTTONS) if getattr(inputs, name))
+
+def describe_world(world):
+    """What a client needs to rebuild the arena, as JSON-ready data."""
+    source = world.chunks.source
+    if isinstance(source, ScatteredObstacles):
+        obstacles = {'scattered': source.seed}
+    else:
+        rects = source.rects if isinstance(source, StaticObstacles) else source.obstacle_rects
+        obstacles = {'rects': [list(rect) for rect in rects]}
+    return {'width': world.width, 'height': world.height, 'view': list(world.view_size),
+            'mode': world.mode, 'obstacles': obstacles}
+
+class Client:
+    """What the host knows about one connected client."""
+
+    def __init__(self, address, index, now):
+        self.address = address
+        self.index = index
+        self.last_seen = now
+        self.buttons = 0
+        self.echo_count = None
+        self.echo = False  # an echo press waiting for the next tick
+        self.seq = 0
+        self.acked = 0
+        self.sent = {}  # seq -> (enemies, echoes) as sent, for use as delta baselines
+        self.bursts = []  # [burst entry, seq it was first sent in] until acknowledged
+        self.stats = {'bytes': 0, 'snapshots': 0, 'full': 0, 'max_bytes': 0}
+
+    def take_inputs(self):
+        inputs = inputs_from_buttons(self.buttons, self.echo)
+        self.echo = False
+        return inputs
+
+    def forget(self):
+        self.sent.clear()
+        self.acked = 0
+        self.bursts.clear()
+
+class NetHost:
+    """Runs a world for everyone, listening on a UDP port.
+
+    With `local_player` the first player is played on the host itself;
+    otherwise the first client to join takes it.
+    """
+
+    def __init__(self, port=PORT, address='0.0.0.0', local_player=True):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((address, port))
+        self.sock.setblocking(False)
+        self.port = self.sock.getsockname()[1]
+        self.local_player = local_player
+        self.clients = {}  # address -> Client
+        self.world = None
+        self.round = 0
+        self.welcome = None
+        self.stats = {'ticks': 0, 'tick_ms': 0.0, 'snapshot_ms': 0.0, 'joined': 0, 'dropped': 0}
+
+    def attach(self, world):
+        """Host a new world, keeping everyone connected in the player slots they had.
+
+        Raises ValueError for a world too big to send (see check_arena()).
+        """
+        check_arena(world.width, world.height)
+        self.world = world
+        world.seeded_bursts = True
+        self.round = (self.round + 1) & 0xffff
+        taken = {client.index for client in self.clients.values()}
+        if self.local_player:
+            taken.add(0)
+        for _ in range(max(taken, default=0)):
+            world.add_player()
+        for player in world.players:
+            # An unclaimed first player is kept for the next client to join, unless others are playing already
+            if player.index not in taken and (player.index or taken):
+                world.drop_player(player)
+        self.welcome = json.dumps(describe_world(world), separators=(',', ':')).encode()
+        for client in self.clients.values():
+            client.forget()
+            self.send_welcome(client)
+
+    def close(self):
+        for client in self.clients.values():
+            self.send(BYE, client.address)
+        self.sock.close()
+
+    def send(self, data, address):
+        try:
+            self.sock.sendto(data, address)
+            return True
+        except OSError:
+            # e.g. the client's port has closed; it times out in the end
+            return False
+
+    def send_welcome(self, client):
+        self.send(WELCOME_PACKET.pack(WELCOME, PROTOCOL, client.index, self.round) + self.welcome, client.address)
+
+    def poll(self):
+        """Handle every packet waiting on the socket, and drop clients that have gone quiet."""
+        now = time.monotonic()
+        while True:
+            try:
+                data, address = self.sock.recvfrom(MAX_DATAGRAM)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                continue
+            if not data:
+                continue
+            kind = data[:1]
+            client = self.clients.get(address)
+            if kind == HELLO:
+                self.join(data, address, now)
+            elif client is None:
+                continue
+            elif kind == INPUT and len(data) == INPUT_PACKET.size:
+                _, ack, buttons, echo_count = INPUT_PACKET.unpack(data)
+                client.last_seen = now
+                client.buttons = buttons
+                if client.echo_count is not None and echo_count != client.echo_count:
+                    client.echo = True
+                client.echo_count = echo_count
+                if ack in client.sent and ack > client.acked:
+                    client.acked = ack
+            elif kind == BYE:
+                self.leave(client)
+        for client in list(self.clients.values()):
+            if now - client.last_seen > TIMEOUT:
+                print(f"Player {client.index + 1} timed out")
+                self.leave(client)
+
+    def join(self, data, address, now):
+        client = self.clients.get(address)
+        if client is not None:
+            # A repeated hello: the welcome was lost, or the client missed a new round
+            client.last_seen = now
+            self.send_welcome(client)
+            return
+        if len(data) != HELLO_PACKET.size or HELLO_PACKET.unpack(data)[1] != PROTOCOL:
+            return
+        index = self.free_slot()
+        if index is None:
+            self.send(FULL, address)
+            return
+        client = self.clients[address] = Client(address, index, now)
+        self.stats['joined'] += 1
+        print(f"Player {index + 1} joined from {address[0]}:{address[1]}")
+        self.send_welcome(client)
+
+    def free_slot(self):
+        taken = {client.index for client in self.clients.values()}
+        if self.local_player:
+            taken.add(0)
+        world = self.world
+        if world is None or (0 not in taken and world.player.active):
+            free = [index for index in range(len(PLAYER_COLORS)) if index not in taken]
+            return free[0] if free else None
+        try:
+            return world.add_player().index
+        except ValueError:
+            return None
+
+    def leave(self, client):
+        del self.clients[client.address]
+        self.stats['dropped'] += 1
+        if self.world is not None and client.index < len(self.world.players):
+            self.world.drop_player(self.world.players[client.index])
+        print(f"Player {client.index + 1} left")
+
+    def step(self, inputs=NO_INPUTS, dt=1 / FPS):
+        """Step the world with the local player's inputs and every client's, sending snapshots when due.
+
+        Returns the world's events.
+        """
+        start = time.perf_counter()
+        self.poll()
+        world = self.world
+        others = [NO_INPUTS] * (len(world.players) - 1)
+        for client in self.clients.values():
+            if client.index == 0:
+                inputs = client.take_inputs()
+            elif client.index < len(world.players):
+                others[client.index - 1] = client.take_inputs()
+        events = world.step(inputs, dt, others)
+        if world.bursts:
+            self.queue_bursts(world.bursts)
+        snapshot_start = time.perf_counter()
+        if world.steps % SNAPSHOT_EVERY == 0:
+            for client in self.clients.values():
+                self.send_snapshot(client)
+        end = time.perf_counter()
+        self.stats['ticks'] += 1
+        self.stats['tick_ms'] += (end - start) * 1000
+        self.stats['snapshot_ms'] += (end - snapshot_start) * 1000
+        return events
+
+    def interest(self, client):
+        """The part of the world a client is sent, and the point its entities are ranked from."""
+        player = self.world.players[client.index]
+        area = self.world.view_rect(player=player).inflate(2 * INTEREST_MARGIN, 2 * INTEREST_MARGIN)
+        return area, player.rect.center
+
+    def queue_bursts(self, bursts):
+        tick = self.world.steps
+        for client in self.clients.values():
+            area, _ = self.interest(client)
+            for seed, x, y, size, kind in bursts:
+                if area.collidepoint(x, y):
+                    client.bursts.append([(seed, x, y, size, kind, tick), 0])
+
+    def send_snapshot(self, client):
+        world = self.world
+        area, centre = self.interest(client)
+        enemies = world.enemies
+        visible_enemies = nearest_entities(enemies.handle, enemies.x, enemies.y, enemies.size, area, centre, MAX_ENEMIES)
+        stores = [player.echoes for player in world.players]
+        visible_echoes = nearest_entities(
+            np.concatenate([store.handle & 0xffffff | player.index << 24 for player, store in zip(world.players, stores)]),
+            np.concatenate([store.x for store in stores]),
+            np.concatenate([store.y for store in stores]),
+            np.concatenate([np.full(store.count, store.size) for store in stores]),
+            area, centre, MAX_ECHOES)
+
+        base = client.sent.get(client.acked)
+        baseline = client.acked if base is not None else 0
+        base_enemies, base_echoes = base if base is not None else (NO_ENTITIES, NO_ENTITIES)
+        client.seq += 1
+        client.sent[client.seq] = (visible_enemies, visible_echoes)
+        client.sent.pop(client.seq - HISTORY, None)
+
+        players = [player for player in world.players if player.active]
+        player_entries = np.empty(len(players), dtype=PLAYER_ENTRY)
+        for entry, player in zip(player_entries, players):
+            entry['index'] = player.index
+            entry['flags'] = (ALIVE if player.alive else 0) | (VISIBLE if player.visible else 0)
+            entry['x'], entry['y'] = quantise((player.pos.x, player.pos.y))
+            entry['score'] = player.score
+
+        client.bursts = [burst for burst in client.bursts
+                         if not (burst[1] and client.acked >= burst[1]) and burst[0][5] > world.steps - BURST_LIFETIME]
+        sending = client.bursts[:MAX_BURSTS]
+        for burst in sending:
+            if not burst[1]:
+                burst[1] = client.seq
+        burst_entries = np.array([burst[0] for burst in sending], dtype=BURST_ENTRY)
+
+        data = b''.join((
+            SNAPSHOT_HEADER.pack(SNAPSHOT, client.seq, baseline, self.round, world.steps, world.level_number,
+                                 STATES.index(world.state), world.score, len(players)),
+            player_entries.tobytes(),
+            encode_delta(visible_enemies, base_enemies),
+            encode_delta(visible_echoes, base_echoes),
+            COUNT.pack(len(burst_entries)),
+            burst_entries.tobytes(),
+        ))
+        if self.send(data, client.address):
+            stats = client.stats
+            stats['bytes'] += len(data)
+            stats['snapshots'] += 1
+            stats['full'] += not baseline
+            stats['max_bytes'] = max(stats['max_bytes'], len(data))
+
+class RemoteEntities:
+    """Interpolated positions of the entities in the latest snapshots, in world pixels."""
+
+    def __init__(self):
+        self.set(np.empty(0, np.uint32), np.empty(0), np.empty(0), np.empty(0, np.int64))
+
+    def set(self, handle, x, y, size):
+        self.handle = handle
+        self.x = x
+        self.y = y
+        self.size = size
+
+    def __len__(self):
+        return len(self.handle)
+
+    def rect_array(self):
+        rects = np.empty((len(self.handle), 4), dtype=np.int64)
+        rects[:, 0] = round_half_away(self.x)
+        rects[:, 1] = round_half_away(self.y)
+        rects[:, 2] = rects[:, 3] = self.size
+        return rects
+
+class RemotePlayer:
+    def __init__(self, index):
+        self.index = index
+        self.pos = pygame.Vector2()
+        self.rect = pygame.Rect(0, 0, PLAYER_SIZE, PLAYER_SIZE)
+        self.color = PLAYER_COLORS[index]
+        self.alive = self.visible = False
+        self.score = 0
+        self.shattered = None
+
+Snapshot = namedtuple('Snapshot', ['tick', 'players', 'enemies', 'echoes'])
+
+def lerp_entities(a, b, alpha):
+    """(handle, x, y, size) for the entities in snapshot b, moved back towards where they were in a."""
+    x = b.x.astype(np.float64) * QUANTUM
+    y = b.y.astype(np.float64) * QUANTUM
+    if len(a.handle) and len(b.handle) and alpha < 1:
+        index = np.minimum(np.searchsorted(a.handle, b.handle), len(a.handle) - 1)
+        both = a.handle[index] == b.handle
+        x[both] += (a.x[index[both]] * QUANTUM - x[both]) * (1 - alpha)
+        y[both] += (a.y[index[both]] * QUANTUM - y[both]) * (1 - alpha)
+    return b.handle, x, y, b.size.astype(np.int64)
+
+class RemoteWorld:
+    """A client's picture of the host's world, built from snapshots.
+
+    Stands in for a World wherever one is only drawn (the renderers, the
+    HUD) or looked at (the headless bots).
+    """
+
+    def __init__(self, description, index):
+        self.width, self.height = description['width'], description['height']
+        self.bounds = pygame.Rect(0, 0, self.width, self.height)
+        self.view_size = tuple(description['view'])
+        self.scrolling = self.width > self.view_size[0] or self.height > self.view_size[1]
+        self.mode = description['mode']
+        obstacles = description['obstacles']
+        if 'scattered' in obstacles:
+            source = ScatteredObstacles(obstacles['scattered'])
+        else:
+            source = StaticObstacles(obstacles['rects'])
+        self.chunks = ChunkMap(self.bounds, source, Obstacle)
+        self.obstacles = []
+        self.index = index
+        self.players = [RemotePlayer(i) for i in range(len(PLAYER_COLORS))]
+        self.player = self.players[index]
+        self.enemies = RemoteEntities()
+        self.echoes = RemoteEntities()
+        self.snapshots = deque(maxlen=8)
+        self.received_at = None
+        self.render_tick = None
+        self.state = PLAYING
+        self.level_number = 1
+        self.total_score = 0
+        self.events = []
+        # Fragments are simulated here from the bursts' seeds
+        self.fragments = FragmentStore(self.bounds)
+        self.shattered = []
+        self.pending_bursts = []
+        self.seen_bursts = deque(maxlen=256)
+        self.fragment_tick = None
+        self.sprites = SpriteCache()
+
+    @property
+    def score(self):
+        # Versus players see their own score, co-op players the team's
+        return self.player.score if self.mode == 'versus' else self.total_score
+
+    def time_since_death(self):
+        return None
+
+    def receive(self, tick, state, level, score, players, enemies, echoes, bursts):
+        if self.snapshots and tick <= self.snapshots[-1].tick:
+            return
+        if level > self.level_number:
+            self.events.append(EVENT_LEVEL_UP)
+        self.state, self.level_number, self.total_score = state, level, score
+        self.snapshots.append(Snapshot(tick, players, enemies, echoes))
+        self.received_at = time.perf_counter()
+        for burst in bursts.tolist():
+            key = (burst[0], burst[5])
+            if key not in self.seen_bursts:
+                self.seen_bursts.append(key)
+                self.pending_bursts.append(burst)
+
+    def update(self, dt):
+        """Move the picture on by dt seconds. Returns the events it brought."""
+        events, self.events = self.events, []
+        if not self.snapshots:
+            return events
+        newest = self.snapshots[-1].tick
+        target = newest - SNAPSHOT_DELAY + (time.perf_counter() - self.received_at) * FPS
+        if self.render_tick is None or abs(self.render_tick - target) > 2 * SNAPSHOT_DELAY:
+            self.render_tick = target
+        else:
+            # Follow the host's clock smoothly through jittery arrivals
+            self.render_tick += dt * FPS
+            self.render_tick += (target - self.render_tick) * 0.1
+        self.render_tick = min(self.render_tick, newest)
+        self.interpolate(self.render_tick)
+        self.update_chunks()
+        events.extend(self.spawn_bursts(self.render_tick))
+        self.update_fragments(self.render_tick)
+        return events
+
+    def interpolate(self, tick):
+        snapshots = self.snapshots
+        a = b = snapshots[0]
+        for snapshot in snapshots:
+            if snapshot.tick <= tick:
+                a = b = snapshot
+            else:
+                b = snapshot
+                break
+        alpha = (tick - a.tick) / (b.tick - a.tick) if b.tick > a.tick else 1.0
+        self.enemies.set(*lerp_entities(a.enemies, b.enemies, alpha))
+        self.echoes.set(*lerp_entities(a.echoes, b.echoes, alpha))
+
+        previous = {entry['index']: entry for entry in a.players}
+        for player in self.players:
+            player.alive = player.visible = False
+        for entry in b.players:
+            player = self.players[entry['index']]
+            x, y = entry['x'] * QUANTUM, entry['y'] * QUANTUM
+            before = previous.get(entry['index'])
+            if before is not None and before['flags'] & VISIBLE:
+                x += (before['x'] * QUANTUM - x) * (1 - alpha)
+                y += (before['y'] * QUANTUM - y) * (1 - alpha)
+            player.pos.update(x, y)
+            player.rect.topleft = (round(x), round(y))
+            player.alive = bool(entry['flags'] & ALIVE)
+            player.visible = bool(entry['flags'] & VISIBLE)
+            player.score = int(entry['score'])
+            if player.alive and player.shattered:
+                # Back in play; the burst it left goes
+                self.remove_shattered(player.shattered)
+                player.shattered = None
+
+    def view_rect(self):
+        return follow_view(self.player.rect, self.view_size, self.bounds)
+
+    def camera(self, alpha=1.0):
+        return self.view_rect() if self.scrolling else None
+
+    def update_chunks(self):
+        if self.chunks.update(self.view_rect()):
+            self.obstacles = self.chunks.obstacles()
+
+    def spawn_bursts(self, tick):
+        events = []
+        waiting = []
+        for burst in self.pending_bursts:
+            seed, x, y, size, kind, burst_tick = burst
+            if burst_tick > tick:
+                waiting.append(burst)
+                continue
+            rng = random.Random(seed)
+            now = burst_tick * 1000 / FPS
+            if kind == 0:
+                self.shattered.append(ShatteredEnemy(self.fragments, x, y, size, GREEN, FRAGMENTS_PER_BURST, now, rng))
+                events.append(EVENT_SHATTER)
+            else:
+                player = self.players[kind - 1]
+                if player.shattered:
+                    self.remove_shattered(player.shattered)
+                player.shattered = ShatteredPlayer(self.fragments, x, y, size, player.color, FRAGMENTS_PER_BURST, now, rng)
+                self.shattered.append(player.shattered)
+                events.append(EVENT_DEATH)
+        self.pending_bursts = waiting
+        return events
+
+    def remove_shattered(self, shattered):
+        if shattered in self.shattered:
+            self.shattered.remove(shattered)
+            shattered.release()
+
+    def update_fragments(self, tick):
+        # Fragments move in fixed ticks, as on the host, to the tick being drawn
+        if self.fragment_tick is None or tick - self.fragment_tick > FPS:
+            self.fragment_tick = tick
+        fragments = self.fragments
+        while self.fragment_tick + 1 <= tick:
+            self.fragment_tick += 1
+            if not self.shattered:
+                continue
+            rects = np.concatenate((self.enemies.rect_array(),
+                                    np.array([tuple(p.rect) for p in self.players if p.alive], dtype=np.int64).reshape(-1, 4)))
+            push_fragments(self.shattered, rects)
+            fragments.update(1 / FPS, self.obstacles, self.fragment_tick * 1000 / FPS,
+                             fragments.rows(s.group for s in self.shattered))
+            visible = fragments.visible_groups()
+            for shattered in [s for s in self.shattered if s.group not in visible]:
+                self.remove_shattered(shattered)
+            fragments.compact()
+
+    def draw_obstacles(self, surface, view=None):
+        for obstacle in self.obstacles:
+            if view is None or obstacle.rect.colliderect(view):
+                obstacle.draw(surface, view)
+
+    def draw_entities(self, surface, alpha=1.0, view=None):
+        """Draw echoes, enemies, fragments and players, as World.draw_entities() does."""
+        # Each echo's rect with its owner's index alongside
+        echoes = np.column_stack((self.echoes.rect_array(), self.echoes.handle.astype(np.int64) >> 24))
+        sequence = [(self.sprites.get(ECHO_COLORS[owner], size, None), (x, y))
+                    for x, y, size, _, owner in to_view(echoes, view).tolist()]
+        sequence += [(self.sprites.get(GREEN, size, None), (x, y))
+                     for x, y, size, _ in to_view(self.enemies.rect_array(), view).tolist()]
+        fblits = getattr(surface, 'fblits', None)
+        if fblits is not None:
+            fblits(sequence)
+        else:
+            surface.blits(sequence, doreturn=False)
+        if self.shattered:
+            self.fragments.draw(surface, self.fragments.rows(s.group for s in self.shattered), 1.0, view)
+        for player in self.players:
+            if player.visible:
+                rect = player.rect if view is None else player.rect.move(-view.x, -view.y)
+                pygame.draw.rect(surface, player.color, rect)
+
+    def entity_rects(self, alpha=1.0, view=None):
+        rects = [self.fragments.group_bounds(shattered.group) for shattered in self.shattered]
+        rects += [player.rect.copy() for player in self.players if player.visible]
+        if view is not None:
+            rects = [rect.move(-view.x, -view.y) for rect in rects if rect.colliderect(view)]
+        rects += [pygame.Rect(rect) for rect in to_view(self.echoes.rect_array(), view).tolist()]
+        rects += [pygame.Rect(rect) for rect in to_view(self.enemies.rect_array(), view).tolist()]
+        return [rect for rect in rects if rect]
+
+    def draw(self, surface, alpha=1.0, view=None):
+        self.draw_obstacles(surface, view)
+        self.draw_entities(surface, alpha, view)
+
+class NetClient:
+    """Talks to a NetHost: sends inputs, receives snapshots into a RemoteWorld."""
+
+    def __init__(self, host, port=PORT):
+        self.address = (socket.gethostbyname(host), port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.world = None
+        self.index = None
+        self.round = None
+        self.baselines = {}  # seq -> (enemies, echoes), to apply deltas to
+        self.latest = 0
+        self.echo_count = 0
+        self.last_hello = 0.0
+        self.stats = {'bytes': 0, 'snapshots': 0, 'full': 0, 'late': 0, 'undecodable': 0, 'max_bytes': 0}
+
+    def connect(self, timeout=5.0):
+        """Say hello until the host welcomes us. Raises ConnectionError if it never does or is full."""
+        deadline = time.monotonic() + timeout
+        while self.world is None:
+            if time.monotonic() > deadline:
+                raise ConnectionError(f"No answer from {self.address[0]}:{self.address[1]}")
+            self.hello()
+            time.sleep(0.05)
+            self.poll()
+        return self.world
+
+    def hello(self):
+        now = time.monotonic()
+        if now - self.last_hello >= 0.25:
+            self.last_hello = now
+            self.send(HELLO_PACKET.pack(HELLO, PROTOCOL))
+
+    def send(self, data):
+        try:
+            self.sock.sendto(data, self.address)
+        except OSError:
+            pass
+
+    def send_inputs(self, inputs):
+        """Send the held buttons, and count an echo press; a lost packet's press arrives with the next."""
+        if inputs.echo:
+            self.echo_count = (self.echo_count + 1) & 0xff
+        self.send(INPUT_PACKET.pack(INPUT, self.latest, buttons_from_inputs(inputs), self.echo_count))
+
+    def close(self):
+        self.send(BYE)
+        self.sock.close()
+
+    def poll(self):
+        while True:
+            try:
+                data, address = self.sock.recvfrom(MAX_DATAGRAM)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                continue
+            if address != self.address or not data:
+                continue
+            kind = data[:1]
+            if kind == FULL:
+                raise ConnectionError("The game is full")
+            if kind == BYE:
+                raise ConnectionError("The host has closed the game")
+            try:
+                if kind == WELCOME:
+                    self.welcome(data)
+                elif kind == SNAPSHOT:
+                    self.snapshot(data)
+            except (struct.error, ValueError, KeyError, IndexError):
+                self.stats['undecodable'] += 1
+
+    def welcome(self, data):
+        _, protocol, index, round_ = WELCOME_PACKET.unpack_from(data)
+        if protocol != PROTOCOL or round_ == self.round:
+            return
+        self.world = RemoteWorld(json.loads(data[WELCOME_PACKET.size:]), index)
+        self.index = index
+        self.round = round_
+        self.baselines.clear()
+        self.latest = 0
+
+    def snapshot(self, data):
+        _, seq, baseline, round_, tick, level, state, score, player_count = SNAPSHOT_HEADER.unpack_from(data)
+        if round_ != self.round:
+            # A new game on the host; its welcome says what the arena is
+            self.hello()
+            return
+        if seq <= self.latest:
+            self.stats['late'] += 1
+            return
+        if baseline:
+            if baseline not in self.baselines:
+                self.stats['undecodable'] += 1
+                return
+            base_enemies, base_echoes = self.baselines[baseline]
+        else:
+            base_enemies = base_echoes = NO_ENTITIES
+        offset = SNAPSHOT_HEADER.size
+        players = np.frombuffer(data, PLAYER_ENTRY, player_count, offset)
+        offset += players.nbytes
+        enemies, offset = decode_delta(data, offset, base_enemies)
+        echoes, offset = decode_delta(data, offset, base_echoes)
+        (burst_count,) = COUNT.unpack_from(data, offset)
+        bursts = np.frombuffer(data, BURST_ENTRY, burst_count, offset + COUNT.size)
+
+        self.baselines[seq] = (enemies, echoes)
+        self.baselines.pop(seq - HISTORY, None)
+        self.latest = seq
+        stats = self.stats
+        stats['bytes'] += len(data)
+        stats['snapshots'] += 1
+        stats['full'] += not baseline
+        stats['max_bytes'] = max(stats['max_bytes'], len(data))
+        self.world.receive(tick, STATES[state], level, score, players, enemies, echoes, bursts)
+
+def run_host(port, min_players=1, seconds=None, report_every=5.0, **world_options):
+    """A dedicated host: plays once `min_players` have joined, and starts a new game after everyone has fallen."""
+    from game import new_world
+
+    host = NetHost(port, local_player=False)
+    host.attach(new_world(**world_options))
+    print(f"Hosting on UDP port {host.port}; waiting for {min_players} player(s)")
+    start = time.perf_counter()
+    next_tick = start
+    next_report = start + report_every
+    dead_since = None
+    waiting = True
+    try:
+        while seconds is None or time.perf_counter() - start < seconds:
+            now = time.perf_counter()
+            if waiting:
+                host.poll()
+                if len(host.clients) >= min_players:
+                    waiting = False
+                    if host.world.state == DEAD:
+                        host.attach(new_world(**world_options))
+                    next_tick = now
+                else:
+                    time.sleep(1 / FPS)
+                continue
+            if not host.clients:
+                print("Everyone has left; waiting for players")
+                waiting = True
+                continue
+            if now < next_tick:
+                time.sleep(next_tick - now)
+                continue
+            next_tick = max(next_tick + 1 / FPS, now - 0.25)
+            host.step(dt=1 / FPS)
+            if host.world.state == DEAD:
+                dead_since = dead_since or now
+                if now - dead_since >= RESTART_DELAY:
+                    print(f"Game over at level {host.world.level_number}, score {host.world.score}; starting another")
+                    host.attach(new_world(**world_options))
+                    dead_since = None
+            if now >= next_report:
+                report_host(host, now - start)
+                next_report = now + report_every
+    except KeyboardInterrupt:
+        pass
+    finally:
+        report_host(host, time.perf_counter() - start)
+        host.close()
+
+def report_host(host, elapsed):
+    stats = host.stats
+    ticks = max(stats['ticks'], 1)
+    world = host.world
+    fragments = len(world.fragments) if world is not None else 0
+    enemies = len(world.enemies) if world is not None else 0
+    print(f"[host {elapsed:.0f}s] {len(host.clients)} clients, {enemies} enemies, {fragments} fragments, "
+          f"tick {stats['tick_ms'] / ticks:.3f} ms (snapshots {stats['snapshot_ms'] / ticks:.3f} ms)")
+    for client in host.clients.values():
+        c = client.stats
+        print(f"  player {client.index + 1}: {c['bytes'] / max(elapsed, 1e-9) / 1024:.1f} KiB/s, "
+              f"{c['bytes'] / max(c['snapshots'], 1):.0f} B/snapshot (max {c['max_bytes']}), {c['full']} full")
+    sys.stdout.flush()
+
+def run_client(host, port, bot='evasive', seconds=10.0, seed=None):
+    """A headless client played by a bot, reporting what it received."""
+    from headless import random_bot, evasive_bot
+
+    client = NetClient(host, port)
+    world = client.connect()
+    policy = (evasive_bot if bot == 'evasive' else random_bot)(random.Random(seed))
+    start = last = time.perf_counter()
+    try:
+        while time.perf_counter() - start < seconds:
+            client.poll()
+            world = client.world
+            now = time.perf_counter()
+            world.update(now - last)
+            last = now
+            inputs = policy(world) if world.player.alive else NO_INPUTS
+            client.send_inputs(inputs)
+            time.sleep(max(0.0, 1 / FPS - (time.perf_counter() - now)))
+    except ConnectionError as e:
+        print(f"Disconnected: {e}")
+    finally:
+        client.close()
+    elapsed = time.perf_counter() - start
+    stats = client.stats
+    world = client.world
+    print(f"[player {client.index + 1}] {stats['snapshots']} snapshots ({stats['full']} full, {stats['late']} late, "
+          f"{stats['undecodable']} undecodable), {stats['bytes'] / elapsed / 1024:.1f} KiB/s, "
+          f"{stats['bytes'] / max(stats['snapshots'], 1):.0f} B/snapshot (max {stats['max_bytes']}); "
+          f"level {world.level_number}, score {world.player.score}, {len(world.fragments)} fragments drawn")
+    return client
+
+def run_local(clients, seconds, port, host_options):
+    """A host and `clients` bot clients as separate processes on this machine."""
+    script = __file__
+    host = subprocess.Popen([sys.executable, script, 'host', '--port', str(port), '--players', str(clients),
+                             '--seconds', str(seconds + 3), *host_options])
+    time.sleep(1.0)
+    players = [subprocess.Popen([sys.executable, script, 'client', '--port', str(port), '--seconds', str(seconds),
+                                 '--seed', str(i), '--bot', 'evasive' if i % 2 == 0 else 'random'])
+               for i in range(clients)]
+    failed = sum(player.wait() != 0 for player in players)
+    failed += host.wait() != 0
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Networked co-op and versus over UDP.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    host_parser = commands.add_parser('host', help="run a dedicated host")
+    local_parser = commands.add_parser('local', help="run a host and bot clients as processes on this machine")
+    for p in (host_parser, local_parser):
+        p.add_argument('--port', type=int, default=PORT)
+        p.add_argument('--mode', choices=GAME_MODES, default='coop')
+        p.add_argument('--seed', type=int, default=None)
+        p.add_argument('--enemy-ai', choices=('bounce', 'pursue'), default='bounce')
+        p.add_argument('--arena', default=None, metavar='WxH', help="a scrolling arena of this size")
+        p.add_argument('--enemies', type=int, default=None, help="enemies in the first wave, for load tests")
+    host_parser.add_argument('--players', type=int, default=1, help="players to wait for before starting")
+    host_parser.add_argument('--seconds', type=float, default=None)
+    local_parser.add_argument('--clients', type=int, default=3)
+    local_parser.add_argument('--seconds', type=float, default=10.0)
+    client_parser = commands.add_parser('client', help="join a host with a headless bot")
+    client_parser.add_argument('--host', default='127.0.0.1')
+    client_parser.add_argument('--port', type=int, default=PORT)
+    client_parser.add_argument('--bot', choices=('evasive', 'random'), default='evasive')
+    client_parser.add_argument('--seconds', type=float, default=10.0)
+    client_parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == 'client':
+        try:
+            run_client(args.host, args.port, args.bot, args.seconds, args.seed)
+        except (ConnectionError, OSError) as e:
+            print(f"Could not join {args.host}:{args.port}: {e}")
+            raise SystemExit(1)
+        return
+
+    from game import parse_arena
+    try:
+        arena = parse_arena(args.arena) if args.arena else None
+        if arena:
+            check_arena(*arena)
+    except (argparse.ArgumentTypeError, ValueError) as e:
+        parser.error(str(e))
+
+    if args.command == 'local':
+        options = ['--mode', args.mode, '--enemy-ai', args.enemy_ai]
+        for name in ('seed', 'arena', 'enemies'):
+            if getattr(args, name) is not None:
+                options += [f"--{name}", str(getattr(args, name))]
+        raise SystemExit(1 if run_local(args.clients, args.seconds, args.port, options) else 0)
+
+    from world import DEFAULT_TUNING
+    tuning = DEFAULT_TUNING if args.enemies is None else DEFAULT_TUNING._replace(base_enemies=args.enemies - 1)
+    try:
+        run_host(args.port, args.players, args.seconds, seed=args.seed, arena=arena, enemy_ai=args.enemy_ai,
+                 mode=args.mode, tuning=tuning)
+    except OSError as e:
+        print(f"Could not host on port {args.port}: {e}")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""Free lists of reusable entity instances, so play doesn't allocate."""
+
+class Pool:
+    """Reusable instances of one class, handed out by acquire() and returned by release().
+
+    A reused instance is reinitialised with its reset() method, which takes
+    the same arguments as the constructor.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.free = []
+        self.stats = {'created': 0, 'reused': 0}
+
+    def __len__(self):
+        return len(self.free)
+
+    def acquire(self, *args, **kwargs):
+        if self.free:
+            item = self.free.pop()
+            item.reset(*args, **kwargs)
+            self.stats['reused'] += 1
+        else:
+            item = self.factory(*args, **kwargs)
+            self.stats['created'] += 1
+        return item
+
+    def release(self, item):
+        self.free.append(item)
+
+    def in_use(self):
+        return self.stats['created'] - len(self.free)
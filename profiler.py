@@ -0,0 +1,361 @@
+"""Frame profiler: per-phase timers, an on-screen overlay and trace export.
+
+While disabled the only cost is a flag check per mark() in the game loop;
+the per-phase timers are wrapped around the real functions only while the
+profiler is enabled.
+"""
+import cProfile
+import csv
+import gc
+import io
+import json
+import os
+import pstats
+import sys
+import time
+from collections import defaultdict, deque
+
+import numpy as np
+import pygame
+
+import world as world_module
+from world import World, Player, FPS
+from fragments import FragmentStore
+from swarm import EnemySwarm
+from flowfield import FlowField
+
+PROFILE_DIR = 'profiles'
+HISTORY_FRAMES = 3600  # one minute at 60 FPS
+GRAPH_FRAMES = 180
+OVERLAY_REFRESH = 0.25  # seconds between overlay text updates
+
+# Functions timed as phases: (phase, owner, attribute). Times are inclusive,
+# so the player phase also contains the fragment pushes it triggers.
+PHASES = [
+    ('player', Player, 'handle_movement'),
+    ('collisions', World, 'check_player_death'),
+    ('echoes', World, 'update_echoes'),
+    ('despawn', World, 'despawn'),
+    ('enemies', EnemySwarm, 'move'),
+    ('enemies', FlowField, 'update'),
+    ('enemies', FlowField, 'steer'),
+    ('fragments', FragmentStore, 'update'),
+    ('fragments', FragmentStore, 'push'),
+    ('spawn', World, 'spawn_wave'),
+    ('spawn', world_module, 'generate_enemy_position'),
+]
+
+RENDER_PHASES = [
+    ('draw', World, 'draw'),
+    ('draw', World, 'draw_entities'),
+    ('present', pygame.display, 'flip'),
+    ('present', pygame.display, 'update'),
+]
+
+class PhaseTimer:
+    """Adds up the wall time spent in named functions while active.
+
+    The functions (methods, or functions looked up on their module) are
+    wrapped on entry and restored on exit, so nothing is measured, or slowed
+    down, outside of a `with` block. A phase called from inside itself is
+    only counted once. With `spans`, each call's (phase, start, end) is kept
+    too.
+    """
+
+    def __init__(self, phases=PHASES, spans=False):
+        self.phases = phases
+        self.totals = defaultdict(float)
+        self.spans = [] if spans else None
+        self.originals = []
+
+    def __enter__(self):
+        depth = defaultdict(int)
+        for name, owner, attribute in self.phases:
+            original = owner.__dict__[attribute]
+            self.originals.append((owner, attribute, original))
+            setattr(owner, attribute, self.wrap(name, original, depth))
+        return self
+
+    def __exit__(self, *exc):
+        for owner, attribute, original in reversed(self.originals):
+            setattr(owner, attribute, original)
+        self.originals = []
+
+    def wrap(self, name, function, depth):
+        totals = self.totals
+        spans = self.spans
+        perf_counter = time.perf_counter
+
+        def timed(*args, **kwargs):
+            if depth[name]:
+                return function(*args, **kwargs)
+            depth[name] += 1
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                end = perf_counter()
+                depth[name] -= 1
+                totals[name] += end - start
+                if spans is not None:
+                    spans.append((name, start, end))
+        return timed
+
+    def take(self):
+        """Seconds per phase since the last call."""
+        totals = dict(self.totals)
+        self.totals.clear()
+        return totals
+
+    def take_spans(self):
+        spans = self.spans or []
+        self.spans = [] if self.spans is not None else None
+        return spans
+
+class Frame:
+    __slots__ = ('index', 'start', 'end', 'sections', 'phases', 'spans', 'blocks', 'collections')
+
+    def __init__(self, index, start):
+        self.index = index
+        self.start = start
+        self.end = start
+        self.sections = []  # (name, start, end) in loop order
+        self.phases = {}
+        self.spans = []
+        self.blocks = 0  # net memory blocks allocated during the frame
+        self.collections = []  # (generation, start, end) of each GC run
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+class FrameProfiler:
+    """Records where each frame of the game loop goes.
+
+    The loop calls begin_frame() once per frame and mark(name) after each
+    section; the time since the previous mark is booked to `name`. Inside
+    those sections, PHASES and RENDER_PHASES break the work down further.
+    """
+
+    def __init__(self, enabled=False, history=HISTORY_FRAMES, directory=PROFILE_DIR):
+        self.enabled = False
+        self.frames = deque(maxlen=history)
+        self.directory = directory
+        self.timer = None
+        self.frame = None
+        self.last_mark = None
+        self.frame_count = 0
+        self.origin = time.perf_counter()
+        self.capture = None
+        self.blocks = 0
+        self.gc_start = None
+        if enabled:
+            self.enable()
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.timer = PhaseTimer(PHASES + RENDER_PHASES, spans=True)
+        self.timer.__enter__()
+        gc.callbacks.append(self.on_gc)
+        self.enabled = True
+        self.frame = None
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.timer.__exit__(None, None, None)
+        self.timer = None
+        gc.callbacks.remove(self.on_gc)
+        self.enabled = False
+        self.frame = None
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    def on_gc(self, phase, info):
+        now = time.perf_counter()
+        if phase == 'start':
+            self.gc_start = now
+        elif self.frame is not None and self.gc_start is not None:
+            self.frame.collections.append((info['generation'], self.gc_start, now))
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        blocks = sys.getallocatedblocks()
+        frame = self.frame
+        if frame is not None:
+            frame.blocks = blocks - self.blocks
+            # Whatever the loop did after its last mark, mostly waiting in clock.tick()
+            frame.sections.append(('wait', self.last_mark, now))
+            frame.end = now
+            frame.phases = self.timer.take()
+            frame.spans = self.timer.take_spans()
+            self.frames.append(frame)
+        else:
+            self.timer.take()
+            self.timer.take_spans()
+        self.frame_count += 1
+        self.frame = Frame(self.frame_count, now)
+        self.last_mark = now
+        self.blocks = blocks
+
+    def mark(self, name):
+        if not self.enabled or self.frame is None:
+            return
+        now = time.perf_counter()
+        self.frame.sections.append((name, self.last_mark, now))
+        self.last_mark = now
+
+    def frame_times(self, count=None):
+        frames = list(self.frames)[-count:] if count else self.frames
+        return np.array([frame.duration for frame in frames])
+
+    def allocations(self, count=FPS):
+        """Mean net blocks allocated per frame, GC runs and milliseconds spent in GC over the last `count` frames."""
+        frames = list(self.frames)[-count:]
+        if not frames:
+            return 0.0, 0, 0.0
+        collections = [end - start for frame in frames for _, start, end in frame.collections]
+        return sum(frame.blocks for frame in frames) / len(frames), len(collections), sum(collections) * 1000
+
+    def breakdown(self, count=FPS):
+        """Mean milliseconds per section and phase over the last `count` frames."""
+        frames = list(self.frames)[-count:]
+        totals = defaultdict(float)
+        for frame in frames:
+            for name, start, end in frame.sections:
+                totals[name] += end - start
+            for name, seconds in frame.phases.items():
+                totals[name] += seconds
+        return {name: total * 1000 / len(frames) for name, total in totals.items()} if frames else {}
+
+    def toggle_capture(self):
+        """Start a cProfile capture, or stop the running one and save it. Returns the saved path."""
+        if self.capture is None:
+            self.capture = cProfile.Profile()
+            self.capture.enable()
+            print("cProfile capture started")
+            return None
+        self.capture.disable()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}.prof")
+        self.capture.dump_stats(path)
+        summary = io.StringIO()
+        pstats.Stats(self.capture, stream=summary).sort_stats('cumulative').print_stats(15)
+        print(summary.getvalue())
+        print(f"Saved cProfile capture to {path}")
+        self.capture = None
+        return path
+
+    def section_names(self):
+        names = []
+        for frame in self.frames:
+            for name, _, _ in frame.sections:
+                if name not in names:
+                    names.append(name)
+        return names
+
+    def export_csv(self, path):
+        sections = self.section_names()
+        phases = sorted({name for frame in self.frames for name in frame.phases})
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'start_ms', 'total_ms'] + [f'{name}_ms' for name in sections + phases] +
+                            ['blocks', 'gc_runs', 'gc_ms'])
+            for frame in self.frames:
+                totals = defaultdict(float)
+                for name, start, end in frame.sections:
+                    totals[name] += end - start
+                totals.update(frame.phases)
+                gc_ms = sum(end - start for _, start, end in frame.collections) * 1000
+                writer.writerow([frame.index, round((frame.start - self.origin) * 1000, 3), round(frame.duration * 1000, 3)] +
+                                [round(totals.get(name, 0.0) * 1000, 3) for name in sections + phases] +
+                                [frame.blocks, len(frame.collections), round(gc_ms, 3)])
+
+    def export_trace(self, path):
+        """Write the frames as a Chrome trace (chrome://tracing or Perfetto)."""
+        def event(name, start, end, category):
+            return {'name': name, 'cat': category, 'ph': 'X', 'pid': 1, 'tid': 1,
+                    'ts': round((start - self.origin) * 1e6, 1), 'dur': round((end - start) * 1e6, 1)}
+
+        events = []
+        for frame in self.frames:
+            events.append(event(f'frame {frame.index}', frame.start, frame.end, 'frame'))
+            events.extend(event(name, start, end, 'section') for name, start, end in frame.sections)
+            events.extend(event(name, start, end, 'phase') for name, start, end in frame.spans)
+            events.extend(event(f'gc gen {generation}', start, end, 'gc') for generation, start, end in frame.collections)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def export(self):
+        """Save the recorded frames as CSV and a Chrome trace. Returns both paths."""
+        if not self.frames:
+            print("No profiled frames to export")
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        stem = os.path.join(self.directory, time.strftime('%Y%m%d-%H%M%S'))
+        self.export_csv(stem + '.csv')
+        self.export_trace(stem + '.trace.json')
+        print(f"Exported {len(self.frames)} frames to {stem}.csv and {stem}.trace.json")
+        return stem + '.csv', stem + '.trace.json'
+
+class ProfilerOverlay:
+    """Rolling frame-time graph and per-phase breakdown, drawn over the game."""
+
+    def __init__(self, profiler, font, position=(10, 360), size=(300, 230)):
+        self.profiler = profiler
+        self.font = font
+        self.rect = pygame.Rect(position, size)
+        self.panel = pygame.Surface(size, pygame.SRCALPHA)
+        self.lines = []
+        self.refreshed = 0
+
+    @property
+    def visible(self):
+        return self.profiler.enabled
+
+    def refresh_text(self):
+        times = self.profiler.frame_times(FPS) * 1000
+        if not len(times):
+            return
+        lines = [f"frame p50 {np.percentile(times, 50):.1f}  p95 {np.percentile(times, 95):.1f}  max {times.max():.1f} ms"]
+        breakdown = sorted(self.profiler.breakdown().items(), key=lambda item: -item[1])
+        lines.extend(f"{name:<11}{ms:6.2f} ms" for name, ms in breakdown[:8])
+        blocks, collections, gc_ms = self.profiler.allocations()
+        lines.append(f"alloc {blocks:+.0f} blocks/frame  gc {collections}x {gc_ms:.1f} ms")
+        if self.profiler.capture is not None:
+            lines.append("cProfile capturing (F4 to stop)")
+        self.lines = [self.font.render(line, True, (255, 255, 255)) for line in lines]
+
+    def draw(self, surface):
+        now = time.perf_counter()
+        if now - self.refreshed >= OVERLAY_REFRESH:
+            self.refresh_text()
+            self.refreshed = now
+
+        panel = self.panel
+        panel.fill((0, 0, 0, 170))
+        width, height = self.rect.size
+        graph_height = 60
+        budget = 1000 / FPS
+        scale = graph_height / (2 * budget)  # the graph tops out at two frames' budget
+        times = self.profiler.frame_times(GRAPH_FRAMES) * 1000
+        x0 = width - len(times)
+        for i, ms in enumerate(times.tolist()):
+            bar = min(graph_height, int(ms * scale) + 1)
+            color = (90, 220, 90) if ms <= budget * 1.05 else (230, 70, 60)
+            pygame.draw.line(panel, color, (x0 + i, height - 1), (x0 + i, height - bar))
+        budget_y = height - int(budget * scale)
+        pygame.draw.line(panel, (255, 255, 0), (0, budget_y), (width, budget_y))
+
+        y = 4
+        for line in self.lines:
+            panel.blit(line, (6, y))
+            y += line.get_height()
+        surface.blit(panel, self.rect)
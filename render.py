@@ -0,0 +1,144 @@
+"""Drawing a World onto the screen."""
+import pygame
+
+from hud import Hud
+from world import WIDTH, HEIGHT, WHITE, PAUSED, DEAD
+
+def merge_rects(rects):
+    """Merge overlapping rects until none overlap, so every pixel is covered once."""
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        while True:
+            index = rect.collidelist(merged)
+            if index == -1:
+                break
+            rect.union_ip(merged.pop(index))
+        merged.append(rect)
+    return merged
+
+class Renderer:
+    """Clears and redraws the whole screen every frame, then flips."""
+
+    def __init__(self, screen, font, large_font):
+        self.screen = screen
+        self.hud = Hud(font, large_font)
+        self.overlays = []  # debug overlays with a rect, draw() and visible, e.g. the profiler
+
+    def draw_hud(self, world):
+        for surface, pos in self.hud.items(world):
+            self.screen.blit(surface, pos)
+
+    def draw_death_overlay(self):
+        self.screen.blit(self.hud.death_overlay(), (0, 0))
+        death_text = self.hud.death_text()
+        self.screen.blit(death_text, death_text.get_rect(center=(WIDTH//2, HEIGHT//2)))
+
+    def visible_overlays(self):
+        return [overlay for overlay in self.overlays if overlay.visible]
+
+    def render(self, world, alpha=1.0):
+        """Draw a frame. alpha is how far the frame falls between the world's last two steps."""
+        if world.state == PAUSED:
+            pause_text = self.hud.pause_text()
+            self.screen.blit(pause_text, pause_text.get_rect(center=(WIDTH//2, HEIGHT//2)))
+            pygame.display.flip()
+            return
+
+        self.screen.fill(WHITE)
+        world.draw(self.screen, alpha, world.camera(alpha))
+        self.draw_hud(world)
+        if world.state == DEAD:
+            self.draw_death_overlay()
+        for overlay in self.visible_overlays():
+            overlay.draw(self.screen)
+        pygame.display.flip()
+
+class DirtyRectRenderer(Renderer):
+    """Redraws and presents only the parts of the screen that changed.
+
+    The background and obstacles never move within a session, so they are
+    composited once into a cached surface. Each frame the areas covered last
+    frame are restored from that cache, the moving entities and HUD are drawn
+    again, and only the old and new areas go to pygame.display.update().
+    In a scrolling world the cache is redrawn, and the whole screen updated,
+    on frames where the view has moved or new obstacles were streamed in.
+    """
+
+    def __init__(self, screen, font, large_font):
+        super().__init__(screen, font, large_font)
+        self.background = pygame.Surface(screen.get_size()).convert()
+        self.world = None
+        self.last_state = None
+        self.previous = []
+        self.screen_rect = screen.get_rect()
+        self.view = None
+        self.obstacles = None
+        self.full_redraw = True
+
+    def draw_background(self, world, view):
+        self.background.fill(WHITE)
+        world.draw_obstacles(self.background, view)
+        self.view = view
+        self.obstacles = world.obstacles
+
+    def reset(self, world):
+        self.world = world
+        self.draw_background(world, world.camera())
+        self.screen.blit(self.background, (0, 0))
+        self.previous = []
+        self.last_state = None
+        # Nothing blitted above has been presented yet, so the next frame updates the whole screen
+        self.full_redraw = True
+
+    def render(self, world, alpha=1.0):
+        if world is not self.world:
+            self.reset(world)
+        view = world.camera(alpha)
+        scrolled = view != self.view or world.obstacles is not self.obstacles
+        if scrolled and world.state != PAUSED:
+            self.draw_background(world, view)
+
+        if world.state == PAUSED:
+            # The frame underneath doesn't change while paused, so the text only needs drawing once
+            if self.last_state != PAUSED:
+                pause_text = self.hud.pause_text()
+                rect = self.screen.blit(pause_text, pause_text.get_rect(center=(WIDTH//2, HEIGHT//2)))
+                self.previous.append(rect)
+                pygame.display.update(self.screen_rect if self.full_redraw else rect)
+                self.full_redraw = False
+            self.last_state = PAUSED
+            return
+
+        hud = self.hud.items(world)
+        overlays = self.visible_overlays()
+        current = (world.entity_rects(alpha, view) + [surface.get_rect(topleft=pos) for surface, pos in hud] +
+                   [overlay.rect.copy() for overlay in overlays])
+        if (world.state == DEAD and self.last_state != DEAD) or scrolled or self.full_redraw:
+            # The tint covers the whole screen, so the first dead frame is a full redraw
+            regions = [self.screen_rect]
+        else:
+            regions = [rect.clip(self.screen_rect) for rect in merge_rects(self.previous + current)]
+
+        # Regions don't overlap, so everything below touches each pixel once
+        for region in regions:
+            self.screen.blit(self.background, region, region)
+        world.draw_entities(self.screen, alpha, view)
+        self.screen.blits(hud, doreturn=False)
+        if world.state == DEAD:
+            overlay = self.hud.death_overlay()
+            death_text = self.hud.death_text()
+            death_rect = death_text.get_rect(center=(WIDTH//2, HEIGHT//2))
+            for region in regions:
+                self.screen.blit(overlay, region, region)
+                if region.colliderect(death_rect):
+                    self.screen.set_clip(region)
+                    self.screen.blit(death_text, death_rect)
+                    self.screen.set_clip(None)
+        for overlay in overlays:
+            overlay.draw(self.screen)
+
+        pygame.display.update(regions)
+        self.previous = current
+        self.last_state = world.state
+        self.full_redraw = False
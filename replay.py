@@ -0,0 +1,149 @@
+"""Record and play back deterministic sessions.
+
+A session is fully described by the world seed plus the input of every tick.
+The inputs are stored as run-length encoded bitmasks, so a replay of a whole
+session is usually a few hundred bytes.
+"""
+import argparse
+import os
+import struct
+import time
+
+from world import World, Inputs, FPS
+
+MAGIC = b'EOTR'
+VERSION = 2  # 2: echoes replay one sample per tick
+HEADER = struct.Struct('<4sBQHII')  # magic, version, seed, tick rate, ticks, checksum
+SEED_LIMIT = 2 ** 64  # seeds are stored unsigned in the header's 64 bits
+
+INPUT_BITS = Inputs._fields
+
+def inputs_to_bits(inputs):
+    bits = 0
+    for i, pressed in enumerate(inputs):
+        if pressed:
+            bits |= 1 << i
+    return bits
+
+def inputs_from_bits(bits):
+    return Inputs(*(bool(bits >> i & 1) for i in range(len(INPUT_BITS))))
+
+def write_varint(out, value):
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+def read_varint(data, offset):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+class Replay:
+    def __init__(self, seed, tick_rate=FPS, runs=None, checksum=0):
+        self.seed = seed
+        self.tick_rate = tick_rate
+        self.runs = runs if runs is not None else []  # [count, bits] pairs
+        self.checksum = checksum
+
+    @property
+    def ticks(self):
+        return sum(count for count, _ in self.runs)
+
+    @property
+    def dt(self):
+        return 1 / self.tick_rate
+
+    def record(self, inputs):
+        bits = inputs_to_bits(inputs)
+        if self.runs and self.runs[-1][1] == bits:
+            self.runs[-1][0] += 1
+        else:
+            self.runs.append([1, bits])
+
+    def inputs(self):
+        for count, bits in self.runs:
+            inputs = inputs_from_bits(bits)
+            for _ in range(count):
+                yield inputs
+
+    def to_bytes(self):
+        out = bytearray(HEADER.pack(MAGIC, VERSION, self.seed, self.tick_rate, self.ticks, self.checksum))
+        write_varint(out, len(self.runs))
+        for count, bits in self.runs:
+            write_varint(out, count)
+            out.append(bits)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, seed, tick_rate, ticks, checksum = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not an Echoes of Time replay")
+        if version != VERSION:
+            raise ValueError(f"Unsupported replay version {version}")
+        offset = HEADER.size
+        num_runs, offset = read_varint(data, offset)
+        runs = []
+        for _ in range(num_runs):
+            count, offset = read_varint(data, offset)
+            runs.append([count, data[offset]])
+            offset += 1
+        replay = cls(seed, tick_rate, runs, checksum)
+        if replay.ticks != ticks:
+            raise ValueError("Replay is truncated")
+        return replay
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+def play(replay, to_tick=None):
+    """Step a fresh world through the replay as fast as possible. Returns the world."""
+    world = World(seed=replay.seed)
+    dt = replay.dt
+    for tick, inputs in enumerate(replay.inputs()):
+        if to_tick is not None and tick >= to_tick:
+            break
+        world.step(inputs, dt)
+    return world
+
+def main():
+    # Set here rather than on import, since the game imports this module too
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    parser = argparse.ArgumentParser(description="Play back a replay without rendering.")
+    parser.add_argument('path')
+    parser.add_argument('--to-tick', type=int, default=None, help="stop after this many ticks")
+    args = parser.parse_args()
+
+    replay = Replay.load(args.path)
+    start = time.perf_counter()
+    world = play(replay, args.to_tick)
+    elapsed = time.perf_counter() - start
+    print(f"seed {replay.seed}, {world.steps}/{replay.ticks} ticks in {elapsed:.3f}s")
+    print(f"state {world.state}, level {world.level_number}, score {world.score}, enemies {len(world.enemies)}")
+    if world.steps == replay.ticks:
+        if world.checksum() == replay.checksum:
+            print("checksum OK")
+        else:
+            print("checksum MISMATCH: the replay no longer reproduces the recorded session")
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -55,9 +55,9 @@ Write-Host "Setting up virtual environment..."
 python3 -m venv venv
 .\venv\Scripts\Activate.ps1
 
-# Install Pygame
-Write-Host "Installing Pygame..."
-pip install pygame --quiet
+# Install Pygame and NumPy
+Write-Host "Installing Pygame and NumPy..."
+pip install pygame numpy --quiet
 
 # Run the game
 Write-Host "Running the game..."
@@ -0,0 +1,164 @@
+"""Structure-of-arrays storage shared by the fragment store, the enemy swarm and the echoes."""
+import numpy as np
+
+def round_half_away(values):
+    # pygame.Rect rounds float coordinates half away from zero
+    return np.trunc(values + np.copysign(0.5, values))
+
+def lerp(previous, current, alpha):
+    return previous + (current - previous) * alpha
+
+def to_view(rects, view):
+    """The (n, 4) x, y, w, h rects that overlap the view rect, moved into its coordinates.
+
+    A view of None leaves the rects as they are.
+    """
+    if view is None:
+        return rects
+    visible = ((rects[:, 0] < view.right) & (rects[:, 0] + rects[:, 2] > view.left) &
+               (rects[:, 1] < view.bottom) & (rects[:, 1] + rects[:, 3] > view.top))
+    rects = rects[visible]
+    rects[:, 0] -= view.x
+    rects[:, 1] -= view.y
+    return rects
+
+class ColumnStore:
+    """Rows of entities kept as one preallocated NumPy array per field.
+
+    Subclasses list their columns in FIELDS. `store.x` is a view of the x
+    column for the rows in use, refreshed whenever rows are added or dropped;
+    the backing arrays grow by doubling.
+    """
+
+    FIELDS = {}
+
+    def __init__(self, capacity=64):
+        self.count = 0
+        self.capacity = capacity
+        for name, dtype in self.FIELDS.items():
+            setattr(self, '_' + name, np.zeros(capacity, dtype=dtype))
+        self.refresh_views()
+
+    def __len__(self):
+        return self.count
+
+    def refresh_views(self):
+        for name in self.FIELDS:
+            setattr(self, name, getattr(self, '_' + name)[:self.count])
+
+    def grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        for name in self.FIELDS:
+            old = getattr(self, '_' + name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, '_' + name, new)
+        self.capacity = capacity
+
+    def add_rows(self, n):
+        """Make room for n more rows. Returns the index of the first new row."""
+        if self.count + n > self.capacity:
+            self.grow(self.count + n)
+        start = self.count
+        self.count += n
+        self.refresh_views()
+        return start
+
+    def select(self, rows):
+        """Narrow the column views to copies of the given rows, until restore() writes them back.
+
+        Code that works on the views, like a whole-store update, then only
+        touches those rows. Rows can't be added or dropped in between.
+        """
+        self.selected = (rows, self.count)
+        for name in self.FIELDS:
+            setattr(self, name, getattr(self, '_' + name)[:self.count][rows])
+        self.count = len(rows)
+
+    def restore(self):
+        rows, self.count = self.selected
+        self.selected = None
+        for name in self.FIELDS:
+            getattr(self, '_' + name)[rows] = getattr(self, name)
+        self.refresh_views()
+
+    def keep(self, mask):
+        """Drop the rows where mask is False, keeping the order of the rest."""
+        kept = int(mask.sum())
+        for name in self.FIELDS:
+            column = getattr(self, '_' + name)
+            column[:kept] = column[:self.count][mask]
+        self.count = kept
+        self.refresh_views()
+
+class EntityStore(ColumnStore):
+    """A ColumnStore whose rows are entities with stable handles.
+
+    Every spawned row gets a handle, stored in its `handle` column, that is
+    never reused; row_of() finds the entity's current row. Rows are deleted
+    by moving rows from the end into the holes, so deletion costs O(1) per
+    row but doesn't keep the order. despawn() only queues a handle and
+    flush() deletes everything queued at once, so a system can kill entities
+    while it is still working through the rows.
+    """
+
+    def __init__(self, capacity=64):
+        super().__init__(capacity)
+        self.next_handle = 0
+        self.rows = {}  # handle -> row
+        self.pending = []
+
+    def spawn_rows(self, n):
+        """Add n rows with fresh handles. Returns the index of the first new row."""
+        start = self.add_rows(n)
+        handles = range(self.next_handle, self.next_handle + n)
+        self._handle[start:start + n] = handles
+        self.rows.update(zip(handles, range(start, start + n)))
+        self.next_handle += n
+        return start
+
+    def row_of(self, handle):
+        return self.rows[handle]
+
+    def alive(self, handle):
+        return handle in self.rows and handle not in self.pending
+
+    def despawn(self, handle):
+        """Queue an entity for deletion at the next flush()."""
+        self.pending.append(handle)
+
+    def flush(self):
+        """Delete every queued entity. Returns whether any rows went."""
+        if not self.pending:
+            return False
+        rows = sorted({self.rows.pop(handle) for handle in self.pending if handle in self.rows})
+        self.pending.clear()
+        if rows:
+            self.swap_remove(np.array(rows, dtype=np.intp))
+        return bool(rows)
+
+    def swap_remove(self, rows):
+        """Delete the given sorted, unique rows by moving the last rows into the holes."""
+        count = self.count - len(rows)
+        holes = rows[rows < count]
+        tail = np.arange(count, self.count)
+        movers = tail[~np.isin(tail, rows)]
+        for name in self.FIELDS:
+            column = getattr(self, '_' + name)
+            column[holes] = column[movers]
+        self.rows.update(zip(self._handle[holes].tolist(), holes.tolist()))
+        self.count = count
+        self.refresh_views()
+
+    def keep(self, mask):
+        super().keep(mask)
+        self.rows = dict(zip(self.handle.tolist(), range(self.count)))
+        self.pending = [handle for handle in self.pending if handle in self.rows]
+
+    def clear(self):
+        self.count = 0
+        self.rows.clear()
+        self.pending.clear()
+        self.refresh_views()
@@ -0,0 +1,91 @@
+"""Uniform-grid spatial index used by every collision query in the world."""
+from collections import defaultdict
+
+CELL_SIZE = 64  # pixels; a little larger than the player so most rects touch 1-4 cells
+
+def cell_range(rect, cell_size=CELL_SIZE):
+    """Inclusive ranges of cell columns and rows a rect overlaps."""
+    return (range(rect.left // cell_size, (rect.right - 1) // cell_size + 1),
+            range(rect.top // cell_size, (rect.bottom - 1) // cell_size + 1))
+
+class SpatialGrid:
+    """Maps grid cells to the items whose rects overlap them.
+
+    query() is a broad phase: it returns every item sharing a cell with the
+    rect, in insertion order, and callers still do the exact colliderect test.
+    Because candidates come back in insertion order, inserting items in list
+    order gives exactly the same pairs, in the same order, as looping over
+    the list.
+    """
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        self.entries = {}  # id(item) -> (order, item, cells)
+        self.next_order = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.cells.clear()
+        self.entries.clear()
+        self.next_order = 0
+
+    def insert(self, item, rect):
+        columns, rows = cell_range(rect, self.cell_size)
+        cells = [(cx, cy) for cx in columns for cy in rows]
+        entry = (self.next_order, item, cells)
+        self.next_order += 1
+        self.entries[id(item)] = entry
+        for cell in cells:
+            self.cells[cell].append(entry)
+
+    def remove(self, item):
+        entry = self.entries.pop(id(item), None)
+        if entry is None:
+            return
+        for cell in entry[2]:
+            bucket = self.cells[cell]
+            bucket.remove(entry)
+            if not bucket:
+                del self.cells[cell]
+
+    def rebuild(self, items):
+        self.clear()
+        for item in items:
+            self.insert(item, item.rect)
+
+    def query(self, rect):
+        columns, rows = cell_range(rect, self.cell_size)
+        cells = self.cells
+        found = {}
+        for cx in columns:
+            for cy in rows:
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    for entry in bucket:
+                        found[entry[0]] = entry[1]
+        return [found[order] for order in sorted(found)]
+
+    def sweep(self, rect):
+        """Yield candidates for a rect that the caller moves while iterating.
+
+        Items come out in insertion order and the cells are looked up again with
+        the rect's current position before each one, so a loop that resolves
+        collisions one after another (and moves the rect in between) sees
+        exactly the items a loop over the whole list would find colliding.
+        """
+        last = -1
+        while True:
+            columns, rows = cell_range(rect, self.cell_size)
+            best = None
+            for cx in columns:
+                for cy in rows:
+                    for entry in self.cells.get((cx, cy), ()):
+                        if entry[0] > last and (best is None or entry[0] < best[0]):
+                            best = entry
+            if best is None:
+                return
+            last = best[0]
+            yield best[1]
@@ -0,0 +1,118 @@
+"""Enemy spawn placement from a precomputed free-space map."""
+import math
+
+import numpy as np
+import pygame
+
+SPAWN_BUFFER = 50  # keep spawns this far from the arena edges
+SPAWN_GRID_STEP = 4  # pixels between candidate spawn cells
+
+class ArenaFullError(Exception):
+    """Raised when a wave can't fit in the arena. `positions` holds the ones that did."""
+
+    def __init__(self, requested, positions):
+        super().__init__(f"Arena is full: placed {len(positions)} of {requested} enemies")
+        self.requested = requested
+        self.positions = positions
+
+class SpawnPlanner:
+    """Places whole waves of enemies in bounded time.
+
+    The arena is cut into SPAWN_GRID_STEP cells and every cell where an enemy
+    could stand without touching an obstacle is found once, up front. A wave is
+    then placed by walking those cells in a random order (jittering inside each
+    cell) and keeping every candidate far enough from the player and from the
+    enemies already placed, which is Poisson-disk sampling over the free space.
+    Each wave costs at most one pass over the free cells.
+
+    With a level layout (levels.py) the free cells come from its occupancy
+    table rather than from each obstacle, and are limited to its spawn
+    regions if it has any.
+    """
+
+    def __init__(self, bounds, obstacles, enemy_size, buffer=SPAWN_BUFFER, step=SPAWN_GRID_STEP, layout=None):
+        self.bounds = pygame.Rect(bounds)
+        self.enemy_size = enemy_size
+        self.step = step
+        self.max_x = self.bounds.right - enemy_size - buffer
+        self.max_y = self.bounds.bottom - enemy_size - buffer
+        xs = np.arange(self.bounds.left + buffer, self.max_x + 1, step)
+        ys = np.arange(self.bounds.top + buffer, self.max_y + 1, step)
+
+        # A cell is free only if an enemy anywhere inside it misses every obstacle
+        reach = enemy_size + step - 1
+        if layout is not None:
+            blocked = layout.rects_touching(xs[None, :], ys[:, None], xs[None, :] + reach, ys[:, None] + reach)
+            if layout.spawn_regions:
+                inside = np.zeros_like(blocked)
+                for r in layout.spawn_regions:
+                    inside |= (((xs >= r.left) & (xs + reach <= r.right))[None, :] &
+                               ((ys >= r.top) & (ys + reach <= r.bottom))[:, None])
+                blocked |= ~inside
+        else:
+            blocked = np.zeros((len(ys), len(xs)), dtype=bool)
+            for obstacle in obstacles:
+                r = obstacle.rect
+                blocked |= (((xs < r.right) & (xs + reach > r.left))[None, :] &
+                            ((ys < r.bottom) & (ys + reach > r.top))[:, None])
+        free_y, free_x = np.nonzero(~blocked)
+        self.free_x = xs[free_x]
+        self.free_y = ys[free_y]
+
+    def __len__(self):
+        return len(self.free_x)
+
+    def plan(self, count, player_pos, min_distance, rng, occupied=(), player_size=50, other_players=()):
+        """Return `count` (x, y) spawn positions, or raise ArenaFullError.
+
+        `occupied` is a list of existing enemies to keep clear of, and
+        `other_players` the positions of any players besides the first. Randomness
+        comes from `rng` (a random.Random), so seeded worlds stay reproducible.
+        """
+        size = self.enemy_size
+        if count <= 0:
+            return []
+        generator = np.random.default_rng(rng.getrandbits(64))
+        order = generator.permutation(len(self.free_x))
+        x = self.free_x[order] + generator.integers(0, self.step, len(order))
+        y = self.free_y[order] + generator.integers(0, self.step, len(order))
+        x = np.minimum(x, self.max_x)
+        y = np.minimum(y, self.max_y)
+
+        player_x = player_pos.x + player_size / 2
+        player_y = player_pos.y + player_size / 2
+        far_enough = np.hypot(x + size / 2 - player_x, y + size / 2 - player_y) >= min_distance + size / 2
+        for pos in other_players:
+            far_enough &= (np.hypot(x + size / 2 - (pos.x + player_size / 2), y + size / 2 - (pos.y + player_size / 2))
+                           >= min_distance + size / 2)
+        x, y = x[far_enough], y[far_enough]
+
+        # Spatial hash of placed enemy centres; no two can be closer than `size`
+        cell = max(size, max((enemy.size for enemy in occupied), default=size))
+        placed = {}
+        for enemy in occupied:
+            center = (enemy.rect.x + enemy.size / 2, enemy.rect.y + enemy.size / 2, enemy.size)
+            placed.setdefault((int(center[0] // cell), int(center[1] // cell)), []).append(center)
+
+        positions = []
+        for px, py in zip(x.tolist(), y.tolist()):
+            cx, cy = px + size / 2, py + size / 2
+            col, row = int(cx // cell), int(cy // cell)
+            clear = True
+            for c in (col - 1, col, col + 1):
+                for r in (row - 1, row, row + 1):
+                    for ox, oy, other_size in placed.get((c, r), ()):
+                        if math.hypot(cx - ox, cy - oy) < (size + other_size) / 2:
+                            clear = False
+                            break
+                    if not clear:
+                        break
+                if not clear:
+                    break
+            if not clear:
+                continue
+            placed.setdefault((col, row), []).append((cx, cy, size))
+            positions.append((px, py))
+            if len(positions) == count:
+                return positions
+        raise ArenaFullError(count, positions)
@@ -0,0 +1,364 @@
+"""Array-backed enemy swarm.
+
+All enemies live in one set of NumPy columns (position, direction, speed,
+stuck timer, collision count), and a whole wave moves, bounces off the arena
+edges, resolves obstacle hits and recovers from getting stuck in a handful of
+vectorised operations per step. Enemy objects are small read-only views onto
+a row, so code that looks at `enemy.rect` or `enemy.pos` keeps working.
+"""
+import random
+
+import numpy as np
+import pygame
+
+from fragments import SpriteCache, as_rect_array
+from soa import EntityStore, round_half_away, lerp, to_view
+
+ENEMY_SIZE = 40
+MAX_COLLISIONS_BEFORE_RANDOM_DIRECTION = 3
+STUCK_DISTANCE = 1  # pixels moved per step below which an enemy counts as stuck
+STUCK_TIME = 1.0  # seconds stuck before the direction is nudged
+
+def normalize(x, y):
+    length = np.sqrt(x * x + y * y)
+    return x / length, y / length
+
+class Enemy:
+    """A view of one row of an EnemySwarm, looked up by its stable handle."""
+
+    def __init__(self, swarm, handle):
+        self.swarm = swarm
+        self.handle = handle
+
+    def __eq__(self, other):
+        return isinstance(other, Enemy) and other.swarm is self.swarm and other.handle == self.handle
+
+    def __hash__(self):
+        return hash(self.handle)
+
+    @property
+    def index(self):
+        return self.swarm.row_of(self.handle)
+
+    @property
+    def pos(self):
+        i = self.index
+        return pygame.Vector2(self.swarm.x[i], self.swarm.y[i])
+
+    @property
+    def direction(self):
+        i = self.index
+        return pygame.Vector2(self.swarm.dx[i], self.swarm.dy[i])
+
+    @property
+    def rect(self):
+        i = self.index
+        size = int(self.swarm.size[i])
+        rect = pygame.Rect(0, 0, size, size)
+        rect.topleft = (self.swarm.x[i], self.swarm.y[i])
+        return rect
+
+    @property
+    def size(self):
+        return int(self.swarm.size[self.index])
+
+    @property
+    def speed(self):
+        return float(self.swarm.speed[self.index])
+
+    @property
+    def color(self):
+        return self.swarm.color
+
+class EnemySwarm(EntityStore):
+    FIELDS = {
+        'x': np.float64,
+        'y': np.float64,
+        'dx': np.float64,
+        'dy': np.float64,
+        'speed': np.float64,
+        'size': np.int64,
+        'stuck': np.float64,
+        'last_x': np.float64,
+        'last_y': np.float64,
+        'collisions': np.int64,
+        'handle': np.int64,
+        'px': np.float64,  # position before the current step, for drawing between steps
+        'py': np.float64,
+    }
+
+    def __init__(self, bounds, color, max_dt, capacity=64):
+        super().__init__(capacity)
+        self.bounds = bounds
+        self.color = color
+        self.max_dt = max_dt
+        self.sprites = SpriteCache()
+        self.cached_rects = None
+        self.obstacle_source = None
+        self.obstacle_boxes = None
+        self.layout = None  # a level layout whose occupancy table can rule out obstacle hits
+
+    def __iter__(self):
+        return iter([Enemy(self, handle) for handle in self.handle.tolist()])
+
+    def __bool__(self):
+        return self.count > 0
+
+    def spawn(self, x, y, speed, size=ENEMY_SIZE, rng=random):
+        """Add one enemy heading in a random direction. Returns its view."""
+        i = self.spawn_rows(1)
+        self.cached_rects = None
+        angle = rng.uniform(0, 360)
+        direction = pygame.Vector2(1, 0).rotate(angle).normalize()
+        self._x[i] = self._last_x[i] = self._px[i] = x
+        self._y[i] = self._last_y[i] = self._py[i] = y
+        self._dx[i] = direction.x
+        self._dy[i] = direction.y
+        self._speed[i] = speed
+        self._size[i] = size
+        self._stuck[i] = 0
+        self._collisions[i] = 0
+        return Enemy(self, int(self._handle[i]))
+
+    def remove(self, enemy):
+        """Remove an enemy straight away; despawn() defers it to the next flush()."""
+        self.despawn(enemy.handle)
+        self.flush()
+
+    def flush(self):
+        if super().flush():
+            self.cached_rects = None
+            return True
+        return False
+
+    def keep(self, mask):
+        super().keep(mask)
+        self.cached_rects = None
+
+    def save_previous(self):
+        self.px[:] = self.x
+        self.py[:] = self.y
+
+    def rect_array(self, alpha=1.0):
+        """(n, 4) int64 array of the enemies' rects as x, y, w, h. Don't modify it.
+
+        alpha below 1 gives the rects that far between the previous step and this one.
+        """
+        if alpha >= 1 and self.cached_rects is not None:
+            return self.cached_rects
+        rects = np.empty((self.count, 4), dtype=np.int64)
+        if alpha >= 1:
+            rects[:, 0] = round_half_away(self.x)
+            rects[:, 1] = round_half_away(self.y)
+        else:
+            rects[:, 0] = round_half_away(lerp(self.px, self.x, alpha))
+            rects[:, 1] = round_half_away(lerp(self.py, self.y, alpha))
+        rects[:, 2] = self.size
+        rects[:, 3] = self.size
+        if alpha >= 1:
+            self.cached_rects = rects
+        return rects
+
+    def rects(self, alpha=1.0, view=None):
+        return [pygame.Rect(rect) for rect in to_view(self.rect_array(alpha), view).tolist()]
+
+    def overlapping(self, rect):
+        """Enemies whose rects overlap rect, in swarm order."""
+        rects = self.rect_array()
+        hit = ((rects[:, 0] < rect.right) & (rects[:, 0] + rects[:, 2] > rect.left) &
+               (rects[:, 1] < rect.bottom) & (rects[:, 1] + rects[:, 3] > rect.top))
+        return [Enemy(self, handle) for handle in self.handle[hit].tolist()]
+
+    def overlap_matrix(self, rects):
+        """(k, n) bool array of which of k x, y, w, h rects overlap which enemy."""
+        rects = as_rect_array(rects)[:, None, :]
+        enemies = self.rect_array()[None, :, :]
+        return ((enemies[..., 0] < rects[..., 0] + rects[..., 2]) & (enemies[..., 0] + enemies[..., 2] > rects[..., 0]) &
+                (enemies[..., 1] < rects[..., 1] + rects[..., 3]) & (enemies[..., 1] + enemies[..., 3] > rects[..., 1]))
+
+    def move(self, dt, obstacles, rng=random, rows=None, max_dt=None):
+        """Advance every enemy, or only the given rows, by one step.
+
+        Enemies whose obstacle hits would need a new random direction part way
+        through the step are rerun one at a time, so every enemy draws its
+        random numbers in swarm order, exactly as a loop over the enemies would.
+        dt is capped at max_dt, by default the swarm's own.
+        """
+        if rows is not None:
+            if len(rows):
+                self.select(rows)
+                try:
+                    self.move(dt, obstacles, rng, max_dt=max_dt)
+                finally:
+                    self.restore()
+                    self.cached_rects = None
+            return
+        if not self.count:
+            return
+        self.cached_rects = None
+        dt = min(dt, self.max_dt if max_dt is None else max_dt)
+        x, y, dx, dy = self.x, self.y, self.dx, self.dy
+        size = self.size
+        bounds = self.bounds
+
+        step = self.speed * dt
+        x += dx * step
+        y += dy * step
+
+        # Bounce off the arena edges
+        right = bounds.right - size
+        bottom = bounds.bottom - size
+        out_x = (x < bounds.left) | (x > right)
+        out_y = (y < bounds.top) | (y > bottom)
+        if out_x.any():
+            x[out_x] = np.where(x[out_x] < bounds.left, bounds.left, right[out_x])
+            dx[out_x] *= -1
+        if out_y.any():
+            y[out_y] = np.where(y[out_y] < bounds.top, bounds.top, bottom[out_y])
+            dy[out_y] *= -1
+
+        rerun = self.resolve_obstacles(obstacles)
+
+        stuck = self.stuck
+        if rerun is not None:
+            held = stuck[rerun]
+        moved = np.sqrt((x - self.last_x) ** 2 + (y - self.last_y) ** 2) >= STUCK_DISTANCE
+        stuck += dt
+        stuck[moved] = 0
+        if rerun is not None:
+            stuck[rerun] = held
+        nudge = stuck > STUCK_TIME
+        if nudge.any() or rerun is not None:
+            if rerun is not None:
+                nudge &= ~rerun
+            stuck[nudge] = 0
+            for i in np.flatnonzero(nudge if rerun is None else nudge | rerun).tolist():
+                if rerun is not None and rerun[i]:
+                    self.move_one(i, dt, obstacles, rng)
+                else:
+                    self.nudge(i, rng)
+        self.last_x[:] = x
+        self.last_y[:] = y
+
+    def resolve_obstacles(self, obstacles):
+        """Push enemies out of obstacles, one obstacle at a time in order.
+
+        Returns None, or a mask of the enemies that hit more obstacles than
+        MAX_COLLISIONS_BEFORE_RANDOM_DIRECTION allows. Those rows are put back
+        as they were before any obstacle and must be redone by move_one().
+        """
+        x, y, dx, dy = self.x, self.y, self.dx, self.dy
+        size, collisions = self.size, self.collisions
+        if not obstacles:
+            return None
+        # Most steps nobody touches an obstacle, so test them all at once first
+        left, top = round_half_away(x), round_half_away(y)
+        if self.layout is not None and not self.layout.rects_touching(left, top, left + size, top + size).any():
+            return None
+        boxes = self.obstacle_array(obstacles)
+        touching = ((left[:, None] < boxes[:, 2]) & ((left + size)[:, None] > boxes[:, 0]) &
+                    (top[:, None] < boxes[:, 3]) & ((top + size)[:, None] > boxes[:, 1]))
+        touched = np.flatnonzero(touching.any(axis=0))
+        if not len(touched):
+            return None
+
+        # Resolve from the first touched obstacle on, in order, as the rects
+        # move. Only enemies touching something at the start can be moved.
+        index = np.flatnonzero(touching.any(axis=1))
+        x_, y_, dx_, dy_, size_, count_ = x[index], y[index], dx[index], dy[index], size[index], collisions[index]
+        left, top = left[index], top[index]
+        rerun = np.zeros(len(index), dtype=bool)
+        for obstacle in obstacles[touched[0]:]:
+            r = obstacle.rect
+            hit = ~rerun & (left < r.right) & (left + size_ > r.left) & (top < r.bottom) & (top + size_ > r.top)
+            if not hit.any():
+                continue
+            count_[hit] += 1
+            overlap_x = np.minimum(left + size_, r.right) - np.maximum(left, r.left)
+            overlap_y = np.minimum(top + size_, r.bottom) - np.maximum(top, r.top)
+            across = hit & (overlap_x < overlap_y)
+            along = hit & ~(overlap_x < overlap_y)
+            x_[across] = np.where(dx_[across] > 0, r.left - size_[across], r.right)
+            dx_[across] *= -1
+            y_[along] = np.where(dy_[along] > 0, r.top - size_[along], r.bottom)
+            dy_[along] *= -1
+            dx_[hit], dy_[hit] = normalize(dx_[hit], dy_[hit])
+            left[hit] = round_half_away(x_[hit])
+            top[hit] = round_half_away(y_[hit])
+            rerun |= hit & (count_ > MAX_COLLISIONS_BEFORE_RANDOM_DIRECTION)
+
+        # Rows that need a random direction are left as they were for move_one()
+        done = index[~rerun]
+        for column, value in zip((x, y, dx, dy, collisions), (x_, y_, dx_, dy_, count_)):
+            column[done] = value[~rerun]
+        if not rerun.any():
+            return None
+        mask = np.zeros(self.count, dtype=bool)
+        mask[index[rerun]] = True
+        return mask
+
+    def obstacle_array(self, obstacles):
+        """(m, 4) array of obstacle left, top, right, bottom, cached per obstacle list."""
+        if self.obstacle_source is not obstacles or len(self.obstacle_boxes) != len(obstacles):
+            self.obstacle_source = obstacles
+            self.obstacle_boxes = np.array([(o.rect.left, o.rect.top, o.rect.right, o.rect.bottom) for o in obstacles],
+                                           dtype=np.int64).reshape(-1, 4)
+        return self.obstacle_boxes
+
+    def move_one(self, i, dt, obstacles, rng):
+        """Obstacle resolution and stuck recovery for a single enemy."""
+        size = int(self.size[i])
+        pos = pygame.Vector2(self.x[i], self.y[i])
+        direction = pygame.Vector2(self.dx[i], self.dy[i])
+        collisions = int(self.collisions[i])
+        rect = pygame.Rect(0, 0, size, size)
+        rect.topleft = pos
+        for obstacle in obstacles:
+            r = obstacle.rect
+            if not rect.colliderect(r):
+                continue
+            collisions += 1
+            overlap_x = min(rect.right, r.right) - max(rect.left, r.left)
+            overlap_y = min(rect.bottom, r.bottom) - max(rect.top, r.top)
+            if overlap_x < overlap_y:
+                pos.x = r.left - size if direction.x > 0 else r.right
+                direction.x *= -1
+            else:
+                pos.y = r.top - size if direction.y > 0 else r.bottom
+                direction.y *= -1
+            direction = direction.normalize()
+            rect.topleft = pos
+            if collisions > MAX_COLLISIONS_BEFORE_RANDOM_DIRECTION:
+                direction = pygame.Vector2(rng.uniform(-1, 1), rng.uniform(-1, 1)).normalize()
+                collisions = 0
+        self.x[i], self.y[i] = pos
+        self.dx[i], self.dy[i] = direction
+        self.collisions[i] = collisions
+
+        if pygame.Vector2(self.last_x[i], self.last_y[i]).distance_to(pos) < STUCK_DISTANCE:
+            self.stuck[i] += dt
+        else:
+            self.stuck[i] = 0
+        if self.stuck[i] > STUCK_TIME:
+            self.nudge(i, rng)
+            self.stuck[i] = 0
+
+    def nudge(self, i, rng):
+        # Turn a stuck enemy by up to 45 degrees either way
+        direction = pygame.Vector2(self.dx[i], self.dy[i])
+        direction.rotate_ip(rng.uniform(-45, 45))
+        self.dx[i], self.dy[i] = direction.normalize()
+
+    def draw(self, surface, alpha=1.0, view=None):
+        """Draw every enemy in view with one batched blit of cached squares."""
+        if not self.count:
+            return
+        rects = to_view(self.rect_array(alpha), view)
+        sizes = np.unique(rects[:, 2])
+        sprites = {size: self.sprites.get(self.color, size, None) for size in sizes.tolist()}
+        sequence = [(sprites[size], (x, y)) for x, y, size, _ in rects.tolist()]
+        fblits = getattr(surface, 'fblits', None)
+        if fblits is not None:
+            fblits(sequence)
+        else:
+            surface.blits(sequence, doreturn=False)
@@ -0,0 +1,163 @@
+"""Batch-simulate seeded games across a process pool to tune difficulty.
+
+Every combination of the given Tuning values is played `--runs` times by a
+scripted bot, one game per task, spread over all cores. Each finished run is
+appended to a JSONL file as it arrives, and the runs are then aggregated
+into survival curves per parameter set.
+
+    python3 sweep.py --base-speed 100,120,140 --min-spawn-distance 100,200 --runs 200
+"""
+import argparse
+import importlib
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import time
+from collections import defaultdict
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import numpy as np
+
+from world import World, Tuning, DEFAULT_TUNING, DEAD, FPS, EVENT_ECHO, EVENT_SHATTER
+from headless import random_bot, evasive_bot
+
+BOTS = {
+    'random': random_bot,
+    'evasive': evasive_bot,
+}
+MAX_SECONDS = 300  # a run that survives this long is cut off and counted as alive
+CURVE_STEP = 5  # seconds between points on the survival curves
+# How each Tuning value is parsed: enemy counts are whole, everything else
+# (speeds, distances, seconds) can be swept at fractional steps
+TUNING_TYPES = {field: float for field in Tuning._fields}
+TUNING_TYPES.update(base_enemies=int, enemies_per_level=int)
+
+def load_bot(name):
+    """A bot factory by name, or any `module:function` taking an rng and returning a policy."""
+    if name in BOTS:
+        return BOTS[name]
+    module, _, attribute = name.partition(':')
+    return getattr(importlib.import_module(module), attribute)
+
+def simulate(job):
+    """Play one game to death or the time limit. Returns its result as a dict."""
+    tuning, bot, seed, max_seconds = job
+    world = World(seed=seed, tuning=Tuning(*tuning))
+    policy = load_bot(bot)(random.Random(seed))
+    max_steps = int(max_seconds * FPS)
+    echoes = kills = 0
+    start = time.perf_counter()
+    while world.steps < max_steps and world.state != DEAD:
+        world.step(policy(world), 1 / FPS)
+        for event in world.events:
+            if event == EVENT_ECHO:
+                echoes += 1
+            elif event == EVENT_SHATTER:
+                kills += 1
+    return {
+        'tuning': dict(zip(Tuning._fields, tuning)),
+        'bot': bot,
+        'seed': seed,
+        'died': world.state == DEAD,
+        'survival_time': world.steps / FPS,
+        'level': world.level_number,
+        'score': world.score,
+        'kills': kills,
+        'echoes': echoes,
+        'kills_per_echo': kills / echoes if echoes else None,
+        'elapsed': time.perf_counter() - start,
+    }
+
+def tuning_key(tuning):
+    return json.dumps(tuning, sort_keys=True)
+
+def survival_curve(runs, max_seconds, step=CURVE_STEP):
+    """Fraction of runs still alive at each time, Kaplan-Meier style with cut-off runs censored."""
+    times = np.arange(0, max_seconds + step, step)
+    deaths = np.array([run['survival_time'] for run in runs if run['died']])
+    return {'time': times.tolist(),
+            'alive': [round(float(1 - (deaths <= t).sum() / len(runs)), 4) for t in times]}
+
+def level_curve(runs):
+    """Fraction of runs that reached each level."""
+    levels = np.array([run['level'] for run in runs])
+    return {'level': list(range(1, int(levels.max()) + 1)),
+            'reached': [round(float((levels >= level).mean()), 4) for level in range(1, int(levels.max()) + 1)]}
+
+def aggregate(results_path, max_seconds):
+    """Group the streamed runs by parameter set and summarise each."""
+    groups = defaultdict(list)
+    with open(results_path) as f:
+        for line in f:
+            run = json.loads(line)
+            groups[tuning_key(run['tuning'])].append(run)
+
+    summary = []
+    for key, runs in groups.items():
+        survival = np.array([run['survival_time'] for run in runs])
+        kills_per_echo = [run['kills_per_echo'] for run in runs if run['kills_per_echo'] is not None]
+        summary.append({
+            'tuning': json.loads(key),
+            'runs': len(runs),
+            'deaths': sum(run['died'] for run in runs),
+            'survival_median': float(np.median(survival)),
+            'survival_mean': float(survival.mean()),
+            'level_mean': float(np.mean([run['level'] for run in runs])),
+            'kills_per_echo': float(np.mean(kills_per_echo)) if kills_per_echo else None,
+            'survival_curve': survival_curve(runs, max_seconds),
+            'level_curve': level_curve(runs),
+        })
+    summary.sort(key=lambda group: -group['survival_median'])
+    return summary
+
+def parse_values(text, kind):
+    return [kind(value) for value in text.split(',')]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    for field, default in zip(Tuning._fields, DEFAULT_TUNING):
+        parser.add_argument('--' + field.replace('_', '-'), default=str(default),
+                            help=f"comma-separated values to sweep (default {default})")
+    parser.add_argument('--runs', type=int, default=100, help="seeded runs per parameter set")
+    parser.add_argument('--bot', default='evasive', help=f"one of {', '.join(BOTS)} or module:function")
+    parser.add_argument('--seed', type=int, default=0, help="first seed; run n uses seed + n")
+    parser.add_argument('--max-seconds', type=float, default=MAX_SECONDS)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--out', default='sweep', help="directory for runs.jsonl and summary.json")
+    args = parser.parse_args()
+
+    values = []
+    for field in Tuning._fields:
+        values.append(parse_values(getattr(args, field), TUNING_TYPES[field]))
+    load_bot(args.bot)  # fail early on a bad name
+    jobs = [(tuning, args.bot, args.seed + run, args.max_seconds)
+            for tuning in itertools.product(*values) for run in range(args.runs)]
+
+    os.makedirs(args.out, exist_ok=True)
+    results_path = os.path.join(args.out, 'runs.jsonl')
+    print(f"{len(jobs)} runs of {len(jobs) // args.runs} parameter sets on {args.workers} workers")
+    start = time.perf_counter()
+    with open(results_path, 'w') as f, multiprocessing.Pool(args.workers) as pool:
+        chunksize = max(1, len(jobs) // (args.workers * 16))
+        for done, result in enumerate(pool.imap_unordered(simulate, jobs, chunksize), 1):
+            f.write(json.dumps(result) + '\n')
+            if done % 100 == 0 or done == len(jobs):
+                f.flush()
+                print(f"{done}/{len(jobs)} runs, {time.perf_counter() - start:.0f} s")
+
+    summary = aggregate(results_path, args.max_seconds)
+    summary_path = os.path.join(args.out, 'summary.json')
+    with open(summary_path, 'w') as f:
+        json.dump(summary, f, indent=2)
+    for group in summary:
+        changed = {k: v for k, v in group['tuning'].items() if v != getattr(DEFAULT_TUNING, k)}
+        print(f"{json.dumps(changed) if changed else 'defaults':60} median survival {group['survival_median']:6.1f} s  "
+              f"level {group['level_mean']:.1f}  deaths {group['deaths']}/{group['runs']}")
+    print(f"Wrote {results_path} and {summary_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Session telemetry and high scores, written to disk off the frame loop.
+
+Every finished session becomes one line of JSON in an append-only log:
+score, level reached, echoes used, kills, time played and a summary of
+frame times. The frame loop only hands the finished record to a bounded
+queue; a background thread writes whatever has queued up in one batch, so
+a slow disk never stalls a frame. If the queue is full the record is
+dropped and counted rather than waited on. The high-score table is read
+from the same log on another thread at start-up and shows up once it is
+ready.
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+
+from world import EVENT_ECHO, EVENT_SHATTER
+
+SESSION_LOG = 'sessions.jsonl'
+MAX_QUEUED = 64  # records waiting for the writer; more are dropped
+BATCH_SIZE = 32  # records per write
+HIGH_SCORES = 10
+FRAME_BIN_MS = 0.25  # frame-time histogram resolution
+FRAME_BINS = 400  # frames of 100 ms or more all land in the last bin
+
+class SessionStats:
+    """Counts for one session, updated from the frame loop without allocating."""
+
+    def __init__(self, seed=None, **mode):
+        self.seed = seed
+        self.mode = mode  # how the session was played, e.g. enemy_ai or level_file
+        self.started = time.time()
+        self.echoes = 0
+        self.kills = 0
+        self.frames = 0
+        self.frame_bins = [0] * FRAME_BINS
+        self.max_frame_ms = 0.0
+
+    def frame(self, frame_dt, events):
+        """Call once per frame with its duration in seconds and the world events it produced."""
+        ms = frame_dt * 1000
+        self.frames += 1
+        self.frame_bins[min(int(ms / FRAME_BIN_MS), FRAME_BINS - 1)] += 1
+        if ms > self.max_frame_ms:
+            self.max_frame_ms = ms
+        for event in events:
+            if event == EVENT_ECHO:
+                self.echoes += 1
+            elif event == EVENT_SHATTER:
+                self.kills += 1
+
+    def frame_percentile(self, p):
+        """Upper edge of the histogram bin holding the p-th percentile frame, in ms."""
+        if not self.frames:
+            return None
+        rank = p / 100 * self.frames
+        total = 0
+        for i, count in enumerate(self.frame_bins):
+            total += count
+            if total >= rank:
+                return round(min((i + 1) * FRAME_BIN_MS, self.max_frame_ms), 2)
+        return round(self.max_frame_ms, 2)
+
+    def record(self, world):
+        """The finished session as a JSON-ready dict."""
+        return {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.started)),
+            'seed': self.seed,
+            'score': world.score,
+            'level': world.level_number,
+            'echoes': self.echoes,
+            'kills': self.kills,
+            'seconds': round(world.time / 1000, 2),
+            'frames': self.frames,
+            'frame_ms': {
+                'p50': self.frame_percentile(50),
+                'p95': self.frame_percentile(95),
+                'p99': self.frame_percentile(99),
+                'max': round(self.max_frame_ms, 2),
+            },
+            **self.mode,
+        }
+
+class SessionLog:
+    """Appends records to a JSONL file from a background writer thread."""
+
+    def __init__(self, path=SESSION_LOG, max_queued=MAX_QUEUED, batch_size=BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.queue = queue.Queue(max_queued)
+        self.thread = None
+        self.stats = {'written': 0, 'dropped': 0, 'batches': 0, 'errors': 0}
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='session-log', daemon=True)
+            self.thread.start()
+
+    def record(self, entry):
+        """Queue a record for writing. Never blocks; returns False if it had to be dropped."""
+        try:
+            self.queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            self.stats['dropped'] += 1
+            return False
+
+    def close(self, timeout=2.0):
+        """Write out what is queued and stop the writer, waiting at most `timeout` seconds."""
+        if self.thread is None:
+            return
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+        self.thread = None
+
+    def run(self):
+        while True:
+            entry = self.queue.get()
+            batch = []
+            while entry is not None:
+                batch.append(entry)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    entry = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self.write(batch)
+            if entry is None:
+                return
+
+    def write(self, batch):
+        lines = ''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in batch)
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            print(f"Could not write session log {self.path}: {e}")
+            self.stats['errors'] += 1
+            return
+        self.stats['written'] += len(batch)
+        self.stats['batches'] += 1
+
+def read_sessions(path):
+    """Every record in a session log, skipping lines that don't parse (like a torn last write)."""
+    sessions = []
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    sessions.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return sessions
+
+def rank_key(entry):
+    return (-(entry.get('score') or 0), -(entry.get('level') or 0), entry.get('time') or '')
+
+class HighScores:
+    """The best sessions in a log, loaded on a background thread.
+
+    Until loading has finished, best() and top() return None and [].
+    """
+
+    def __init__(self, path=SESSION_LOG, size=HIGH_SCORES):
+        self.path = path
+        self.size = size
+        self.entries = None
+        self.added = []  # sessions finished since start-up
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.load, name='high-scores', daemon=True)
+            self.thread.start()
+
+    def load(self):
+        try:
+            entries = sorted(read_sessions(self.path), key=rank_key)[:self.size]
+        except OSError as e:
+            print(f"Could not read high scores from {self.path}: {e}")
+            entries = []
+        with self.lock:
+            # Sessions that finished while loading may or may not have been in the file yet
+            entries += [entry for entry in self.added if entry not in entries]
+            self.entries = sorted(entries, key=rank_key)[:self.size]
+
+    def add(self, entry):
+        with self.lock:
+            self.added.append(entry)
+            if self.entries is not None:
+                self.entries = sorted(self.entries + [entry], key=rank_key)[:self.size]
+
+    def top(self):
+        entries = self.entries
+        return list(entries) if entries is not None else []
+
+    def best(self):
+        entries = self.entries
+        return entries[0]['score'] if entries else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the high scores and totals from a session log.")
+    parser.add_argument('path', nargs='?', default=SESSION_LOG)
+    parser.add_argument('--top', type=int, default=HIGH_SCORES)
+    args = parser.parse_args()
+
+    sessions = read_sessions(args.path)
+    if not sessions:
+        print(f"No sessions in {args.path}")
+        return
+    print(f"{len(sessions)} sessions, {sum(s.get('seconds', 0) for s in sessions) / 60:.1f} minutes played, "
+          f"{sum(s.get('kills', 0) for s in sessions)} kills")
+    for rank, entry in enumerate(sorted(sessions, key=rank_key)[:args.top], 1):
+        print(f"{rank:2}. {entry.get('score') or 0:6}  level {entry.get('level') or 0:3}  {entry.get('time') or ''}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""A fixed pool of mixer channels shared out by priority."""
+import time
+from collections import namedtuple
+
+import pygame
+
+NUM_VOICES = 8
+
+# How a sound may use the pool. Repeats within `cooldown` ms are merged into
+# the voice already playing, at most `max_voices` copies play at once, and a
+# sound can take over a channel from one of lower or equal priority.
+VoicePolicy = namedtuple('VoicePolicy', ['priority', 'max_voices', 'cooldown'], defaults=(0, 1, 0))
+
+def milliseconds():
+    # pygame.time.get_ticks() stays at 0 unless pygame.init() has run, and the
+    # game only initialises the subsystems it needs
+    return time.perf_counter() * 1000
+
+class Voice:
+    __slots__ = ('channel', 'name', 'priority', 'started')
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.name = None
+        self.priority = 0
+        self.started = 0
+
+    def busy(self):
+        return self.name is not None and self.channel.get_busy()
+
+class VoiceManager:
+    """Plays sounds on a fixed set of reserved channels.
+
+    pygame's own Sound.play() grabs any free channel and silently drops the
+    sound when there is none. Here every channel is reserved up front, and
+    each play either coalesces with a recent identical sound, takes a free
+    channel, or steals the oldest voice of the lowest priority, so a burst
+    of kills can never drown out a death sound.
+    """
+
+    def __init__(self, num_voices=NUM_VOICES, clock=milliseconds):
+        pygame.mixer.set_num_channels(num_voices)
+        pygame.mixer.set_reserved(num_voices)
+        self.voices = [Voice(pygame.mixer.Channel(i)) for i in range(num_voices)]
+        self.clock = clock
+        self.last_played = {}
+        self.stats = {'played': 0, 'coalesced': 0, 'stolen': 0, 'dropped': 0}
+
+    def active(self, name=None):
+        return [voice for voice in self.voices if voice.busy() and (name is None or voice.name == name)]
+
+    def choose(self, name, policy):
+        """The voice to play on, or None to drop the sound."""
+        same = self.active(name)
+        if len(same) >= policy.max_voices:
+            # Restart the oldest copy rather than stacking another one
+            return min(same, key=lambda voice: voice.started)
+        for voice in self.voices:
+            if not voice.busy():
+                return voice
+        victim = min(self.voices, key=lambda voice: (voice.priority, voice.started))
+        if victim.priority <= policy.priority:
+            return victim
+        return None
+
+    def play(self, name, sound, policy=VoicePolicy()):
+        """Play a sound under its policy. Returns the channel, or None if it was merged or dropped."""
+        now = self.clock()
+        last = self.last_played.get(name)
+        if last is not None and now - last < policy.cooldown:
+            self.stats['coalesced'] += 1
+            return None
+
+        voice = self.choose(name, policy)
+        if voice is None:
+            self.stats['dropped'] += 1
+            return None
+        if voice.busy():
+            self.stats['stolen'] += 1
+        voice.channel.play(sound)
+        voice.name = name
+        voice.priority = policy.priority
+        voice.started = now
+        self.last_played[name] = now
+        self.stats['played'] += 1
+        return voice.channel
+
+    def stop(self):
+        for voice in self.voices:
+            voice.channel.stop()
+            voice.name = None
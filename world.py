@@ -0,0 +1,746 @@
+import random
+import struct
+import warnings
+import zlib
+from collections import namedtuple
+
+import numpy as np
+import pygame
+
+from history import HistoryBuffer
+from spatial import SpatialGrid
+from spawn import SpawnPlanner, ArenaFullError
+from fragments import FragmentStore, ShatteredPlayer, ShatteredEnemy, push_fragments
+from swarm import EnemySwarm, Enemy, ENEMY_SIZE
+from echoes import EchoStore
+from pool import Pool
+from arena import ChunkMap, StaticObstacles, follow_view
+from levels import OccupancyIndex
+from flowfield import FlowField
+
+# Arena settings
+WIDTH, HEIGHT = 800, 600
+
+# Colors
+WHITE = (255, 255, 255)
+BLUE = (0, 120, 215)
+RED = (220, 20, 60)
+DARK_RED = (139, 0, 0)
+GREEN = (0, 255, 0)
+BLACK = (0, 0, 0)
+GRAY = (200, 200, 200)
+TINT_COLOR = (0, 0, 0, 180)  # Semi-transparent black
+
+# Player settings
+PLAYER_SIZE = 50
+PLAYER_SPEED = 300  # pixels per second
+
+# Echo settings
+ECHO_DURATION = 2  # seconds
+FPS = 60
+
+FRAGMENTS_PER_BURST = 25  # Increased number of fragments
+
+# Multiplayer (see net.py): up to MAX_PLAYERS, each starting at its own spot
+# with its own colours. 'coop' brings fallen players back at the next level;
+# in 'versus' echoes shatter other players too, and the fallen stay down.
+MAX_PLAYERS = 4
+PLAYER_STARTS = [(50, 50), (130, 50), (50, 130), (130, 130)]
+PLAYER_COLORS = [BLUE, (230, 120, 0), (140, 60, 200), (0, 160, 150)]
+ECHO_COLORS = [DARK_RED, (150, 75, 0), (80, 30, 120), (0, 90, 85)]
+GAME_MODES = ('coop', 'versus')
+PLAYER_KILL_SCORE = 50
+
+# Minimum spawn distance for enemies
+MIN_SPAWN_DISTANCE = 100  # Adjusted to balance spawning
+
+# Off-screen enemies in loaded chunks only move every OFFSCREEN_TICKS steps, by that many steps at once
+OFFSCREEN_TICKS = 4
+SIMULATION_MARGIN = 200  # enemies this close to the view move every step
+
+# How enemies choose their direction: bouncing around at random, or chasing
+# the player along a shared flow field
+ENEMY_AI_MODES = ('bounce', 'pursue')
+
+# Game states
+PLAYING = 'playing'
+PAUSED = 'paused'
+DEAD = 'dead'
+
+# Events emitted by World.step() for the frontend to react to (sounds etc.)
+EVENT_ECHO = 'echo'
+EVENT_DEATH = 'death'
+EVENT_SHATTER = 'shatter'
+EVENT_LEVEL_UP = 'level_up'
+EVENT_PAUSE = 'pause'
+
+DEFAULT_OBSTACLES = [
+    (200, 150, 100, 300),
+    (500, 100, 50, 400),
+    (350, 250, 100, 100),
+]
+
+# Difficulty knobs, for tuning sweeps. Level n has base_enemies + enemies_per_level * n
+# enemies moving at base_speed + speed_per_level * n pixels per second.
+Tuning = namedtuple('Tuning', ['base_enemies', 'enemies_per_level', 'base_speed', 'speed_per_level',
+                               'min_spawn_distance', 'echo_duration'],
+                    defaults=(3, 1, 120, 20, MIN_SPAWN_DISTANCE, ECHO_DURATION))
+DEFAULT_TUNING = Tuning()
+
+# Held movement keys plus one-shot presses for a single step
+Inputs = namedtuple('Inputs', ['left', 'right', 'up', 'down', 'echo', 'pause'], defaults=(False,) * 6)
+NO_INPUTS = Inputs()
+
+def check_collision(rect1, rect2):
+    return rect1.colliderect(rect2)
+
+_spawn_planners = {}
+
+def get_spawn_planner(bounds, obstacles, enemy_size, layout=None):
+    """SpawnPlanner for an arena layout, built once and reused."""
+    key = (tuple(bounds), tuple(tuple(obstacle.rect) for obstacle in obstacles), enemy_size, layout)
+    planner = _spawn_planners.get(key)
+    if planner is None:
+        if len(_spawn_planners) >= 32:
+            _spawn_planners.clear()
+        planner = _spawn_planners[key] = SpawnPlanner(bounds, obstacles, enemy_size, layout=layout)
+    return planner
+
+def generate_enemy_position(player_pos, obstacles, enemies, min_distance, enemy_size, bounds=None, rng=random):
+    """A single free spawn position, or None if the arena is full."""
+    if bounds is None:
+        bounds = pygame.Rect(0, 0, WIDTH, HEIGHT)
+    planner = get_spawn_planner(bounds, obstacles, enemy_size)
+    try:
+        return planner.plan(1, player_pos, min_distance, rng, occupied=enemies, player_size=PLAYER_SIZE)[0]
+    except ArenaFullError:
+        return None
+
+class Level:
+    def __init__(self, level_number, tuning=DEFAULT_TUNING, layout=None):
+        self.level_number = level_number
+        if layout is not None:
+            self.num_enemies, self.enemy_speed = layout.wave(level_number, tuning)
+        else:
+            self.num_enemies = tuning.base_enemies + tuning.enemies_per_level * level_number
+            self.enemy_speed = tuning.base_speed + (level_number * tuning.speed_per_level)
+
+class Player:
+    def __init__(self, x, y, bounds=None, echo_duration=ECHO_DURATION, color=BLUE, index=0):
+        self.pos = pygame.Vector2(x, y)
+        self.size = PLAYER_SIZE
+        self.color = color
+        self.index = index
+        self.speed = PLAYER_SPEED
+        self.history = HistoryBuffer(int(echo_duration * FPS))
+        self.rect = pygame.Rect(self.pos.x, self.pos.y, self.size, self.size)
+        self.bounds = bounds if bounds is not None else pygame.Rect(0, 0, WIDTH, HEIGHT)
+        self.visible = True
+        self.previous = pygame.Vector2(self.pos)  # position before the current step, for drawing between steps
+        self.original_pos = pygame.Vector2()  # scratch vectors reused every step
+        self.movement = pygame.Vector2()
+        self.alive = True
+        self.active = True  # False once dropped from a multiplayer game
+        self.score = 0  # this player's share of the world's score
+        self.echoes = None  # the player's EchoStore, set by the World
+        self.shattered = None  # the ShatteredPlayer after a death
+
+    def respawn(self, x, y):
+        """Back in play at (x, y) with no history to echo."""
+        self.pos.update(x, y)
+        self.previous.update(x, y)
+        self.rect.topleft = self.pos
+        self.history.clear()
+        self.alive = True
+        self.visible = True
+        if self.shattered:
+            self.shattered.release()
+            self.shattered = None
+
+    def handle_movement(self, inputs, obstacle_grid, shattered_enemies, dt):
+        original_pos = self.original_pos
+        original_pos.update(self.pos)
+        movement = self.get_movement_vector(inputs, dt)
+        self.apply_movement(movement, obstacle_grid, shattered_enemies, original_pos)
+        self.clamp_position()
+
+    def get_movement_vector(self, inputs, dt):
+        movement = self.movement
+        movement.update(0, 0)
+        if inputs.left:
+            movement.x -= 1
+        if inputs.right:
+            movement.x += 1
+        if inputs.up:
+            movement.y -= 1
+        if inputs.down:
+            movement.y += 1
+
+        if movement.length_squared() > 0:
+            movement.normalize_ip()
+            movement *= self.speed
+            movement *= dt
+        return movement
+
+    def apply_movement(self, movement, obstacle_grid, shattered_enemies, original_pos):
+        self.pos += movement
+        self.rect.topleft = self.pos
+        for obstacle in obstacle_grid.sweep(self.rect):
+            if self.rect.colliderect(obstacle.rect):
+                self.handle_collision(movement, obstacle, original_pos)
+
+        push_fragments(shattered_enemies, [self.rect])
+
+    def handle_collision(self, movement, obstacle, original_pos):
+        self.pos.update(original_pos)
+        self.rect.topleft = self.pos
+
+        if movement.x != 0:
+            self.pos.x += movement.x
+            self.rect.x = self.pos.x
+            if self.rect.colliderect(obstacle.rect):
+                if movement.x > 0:
+                    self.pos.x = obstacle.rect.left - self.size
+                elif movement.x < 0:
+                    self.pos.x = obstacle.rect.right
+            self.rect.x = self.pos.x
+
+        if movement.y != 0:
+            self.pos.y += movement.y
+            self.rect.y = self.pos.y
+            if self.rect.colliderect(obstacle.rect):
+                if movement.y > 0:
+                    self.pos.y = obstacle.rect.top - self.size
+                elif movement.y < 0:
+                    self.pos.y = obstacle.rect.bottom
+            self.rect.y = self.pos.y
+
+    def clamp_position(self):
+        self.pos.x = max(self.bounds.left, min(self.bounds.right - self.size, self.pos.x))
+        self.pos.y = max(self.bounds.top, min(self.bounds.bottom - self.size, self.pos.y))
+        self.rect.topleft = self.pos
+
+    def update_history(self):
+        self.history.append(self.pos.x, self.pos.y)
+
+    def rect_at(self, alpha=1.0):
+        """The rect `alpha` of the way from the previous step's position to the current one."""
+        if alpha >= 1:
+            return self.rect
+        rect = pygame.Rect(0, 0, self.size, self.size)
+        rect.topleft = self.previous.lerp(self.pos, alpha)
+        return rect
+
+    def draw(self, surface, color=None, alpha=1.0, view=None):
+        if self.visible:
+            if color is None:
+                color = self.color
+            rect = self.rect_at(alpha)
+            if view is not None:
+                rect = rect.move(-view.x, -view.y)
+            return pygame.draw.rect(surface, color, rect)
+
+class Obstacle:
+    def __init__(self, x, y, width, height):
+        self.rect = pygame.Rect(x, y, width, height)
+        self.color = BLACK
+
+    def draw(self, surface, view=None):
+        rect = self.rect if view is None else self.rect.move(-view.x, -view.y)
+        return pygame.draw.rect(surface, self.color, rect)
+
+class World:
+    """The whole game simulation, advanced with step(). Owns no display, audio or clock.
+
+    Passing a seed makes the world deterministic: all randomness comes from the
+    seeded generator, so the same seed, inputs and dt always give the same game.
+
+    A world bigger than view_size scrolls: the view follows the player, only
+    the obstacle chunks near it are loaded (obstacles can be a list of rects
+    or a chunked source from arena.py), and enemies away from it are
+    simulated less often.
+
+    A compiled level (levels.LevelLayout) replaces the size and obstacles,
+    sets each level's wave, and lets its occupancy table answer most
+    obstacle checks.
+
+    More players can join with add_player(); `player` is always the first,
+    and the game is over once every player has fallen.
+    """
+
+    def __init__(self, width=WIDTH, height=HEIGHT, obstacles=DEFAULT_OBSTACLES, seed=None, tuning=DEFAULT_TUNING,
+                 view_size=(WIDTH, HEIGHT), layout=None, enemy_ai='bounce', mode='coop'):
+        if enemy_ai not in ENEMY_AI_MODES:
+            raise ValueError(f"Unknown enemy AI {enemy_ai!r}, expected one of {ENEMY_AI_MODES}")
+        if mode not in GAME_MODES:
+            raise ValueError(f"Unknown game mode {mode!r}, expected one of {GAME_MODES}")
+        if layout is not None:
+            width, height, obstacles = layout.width, layout.height, layout
+        self.deterministic = seed is not None
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.width = width
+        self.height = height
+        self.bounds = pygame.Rect(0, 0, width, height)
+        self.tuning = tuning
+        self.layout = layout
+        self.mode = mode
+        self.players = []
+        self.player = self.new_player()
+        self.echoes = self.player.echoes
+        self.inputs = (NO_INPUTS,)  # this step's inputs, one per player
+        self.fragments = FragmentStore(self.bounds)
+        self.shattered_pool = Pool(ShatteredEnemy)
+        self.shattered_enemies = []
+        self.interpolate = False  # keep pre-step positions so frames can be drawn between steps
+        # Give every fragment burst a generator of its own, seeded from the
+        # world's, and list (seed, x, y, size, kind) for each in `bursts`, so
+        # a networked client can rebuild it (kind is 0 for an enemy, k + 1 for player k)
+        self.seeded_bursts = False
+        self.bursts = []
+        self.view_size = view_size
+        self.scrolling = width > view_size[0] or height > view_size[1]
+        source = obstacles if hasattr(obstacles, 'chunk') else StaticObstacles(obstacles)
+        self.chunks = ChunkMap(self.bounds, source, Obstacle)
+        self.obstacles = []
+        self.obstacle_grid = SpatialGrid() if layout is None else OccupancyIndex(layout, SpatialGrid())
+        self.enemy_ai = enemy_ai
+        self.flow_field = None  # built with the first obstacles when enemies pursue
+        self.stream_chunks(NO_INPUTS, 0)
+
+        self.level_number = 1
+        self.level = Level(self.level_number, tuning, layout)
+        self.enemies = EnemySwarm(self.bounds, GREEN, 1 / FPS)
+        self.enemies.layout = layout
+        self.spawn_wave(enemy_size=50)
+
+        self.score = 0
+        self.state = PLAYING
+        self.time = 0  # simulated milliseconds since the world was created
+        self.death_time = None
+        self.steps = 0
+        self.events = []
+
+        # Run in this order once per step. Each entity is simulated exactly
+        # once; entities killed along the way are queued and only removed by
+        # the despawn system. Systems are named rather than bound so that the
+        # profiler's timers, patched onto the class, apply to live worlds too.
+        self.systems = [
+            'stream_chunks',
+            'spawn_echo',
+            'update_player',
+            'check_player_death',
+            'update_echoes',
+            'despawn',
+            'push_fragments',
+            'move_enemies',
+            'update_fragments',
+            'check_level',
+        ]
+
+    def new_player(self):
+        index = len(self.players)
+        player = Player(*PLAYER_STARTS[index], self.bounds, self.tuning.echo_duration, PLAYER_COLORS[index], index)
+        player.echoes = EchoStore(player.history, PLAYER_SIZE, ECHO_COLORS[index])
+        self.players.append(player)
+        return player
+
+    def add_player(self):
+        """Bring in another player, reusing a dropped one's slot. Raises ValueError when the game is full.
+
+        A player joining a finished game stays down with the rest.
+        """
+        for player in self.players:
+            if not player.active:
+                break
+        else:
+            if len(self.players) >= MAX_PLAYERS:
+                raise ValueError(f"No room for more than {MAX_PLAYERS} players")
+            player = self.new_player()
+        player.active = True
+        player.respawn(*PLAYER_STARTS[player.index])
+        if self.state == DEAD:
+            player.alive = player.visible = False
+        else:
+            self.clear_start(player)
+        return player
+
+    def clear_start(self, player):
+        """Move enemies that are too close to a player joining mid-wave to where a new wave could have put them."""
+        enemies = self.enemies
+        centre_x, centre_y = player.rect.center
+        distance = np.hypot(enemies.x + enemies.size / 2 - centre_x, enemies.y + enemies.size / 2 - centre_y)
+        rows = np.flatnonzero(distance < self.tuning.min_spawn_distance + enemies.size / 2)
+        if not len(rows):
+            return
+        planner = get_spawn_planner(self.chunks.area(), self.obstacles, ENEMY_SIZE, self.layout)
+        others = [other.pos for other in self.players[1:] if other.alive]
+        try:
+            positions = planner.plan(len(rows), self.player.pos, self.tuning.min_spawn_distance, self.rng,
+                                     occupied=enemies, player_size=PLAYER_SIZE, other_players=others)
+        except ArenaFullError as e:
+            positions = e.positions
+        for row, (x, y) in zip(rows.tolist(), positions):
+            enemies.x[row] = enemies.px[row] = x
+            enemies.y[row] = enemies.py[row] = y
+        enemies.cached_rects = None
+
+    def drop_player(self, player):
+        """Take a player out of the game, e.g. when their connection is lost."""
+        player.active = False
+        player.echoes.clear()
+        if player.alive:
+            player.alive = player.visible = False
+            self.check_game_over()
+
+    def active_players(self):
+        return [player for player in self.players if player.active]
+
+    def living_players(self):
+        return [player for player in self.players if player.alive]
+
+    def controls(self):
+        """(player, inputs) for every player still in play."""
+        inputs = self.inputs
+        return [(player, inputs[player.index] if player.index < len(inputs) else NO_INPUTS)
+                for player in self.players if player.alive]
+
+    def spawn_wave(self, enemy_size=ENEMY_SIZE):
+        # Waves only spawn where obstacles are loaded
+        planner = get_spawn_planner(self.chunks.area(), self.obstacles, enemy_size, self.layout)
+        others = [player.pos for player in self.players[1:] if player.alive]
+        try:
+            positions = planner.plan(self.level.num_enemies, self.player.pos, self.tuning.min_spawn_distance, self.rng,
+                                     occupied=self.enemies, player_size=PLAYER_SIZE, other_players=others)
+        except ArenaFullError as e:
+            warnings.warn(f"Level {self.level_number}: {e}")
+            positions = e.positions
+        for x, y in positions:
+            self.enemies.spawn(x, y, self.level.enemy_speed, rng=self.rng)
+
+    def time_since_death(self):
+        if self.death_time is None:
+            return None
+        return self.time - self.death_time
+
+    def step(self, inputs=NO_INPUTS, dt=1 / FPS, others=()):
+        """Advance the simulation by dt seconds. Returns the events emitted during the step.
+
+        `inputs` control the first player and `others` the rest, in order;
+        only the first player can pause.
+        """
+        self.events = []
+        self.bursts = []
+        self.inputs = (inputs, *others)
+        self.time += dt * 1000
+        self.steps += 1
+        if self.interpolate:
+            self.save_previous()
+
+        if inputs.pause:
+            if self.state == PLAYING:
+                self.state = PAUSED
+                self.events.append(EVENT_PAUSE)
+            elif self.state == PAUSED:
+                self.state = PLAYING
+                self.events.append(EVENT_PAUSE)
+        if self.state == PAUSED:
+            return self.events
+
+        for name in self.systems:
+            getattr(self, name)(inputs, dt)
+        return self.events
+
+    def save_previous(self):
+        for player in self.players:
+            player.previous.update(player.pos)
+            player.echoes.save_previous()
+        self.enemies.save_previous()
+        self.fragments.save_previous()
+
+    def view_rect(self, alpha=1.0, player=None):
+        """The part of the world on screen: view_size centred on the player, kept inside the world."""
+        if not self.interpolate:
+            alpha = 1.0
+        return follow_view((player or self.player).rect_at(alpha), self.view_size, self.bounds)
+
+    def views(self):
+        """view_rect() of every player in the game, or of the first if none are left."""
+        return [self.view_rect(player=player) for player in self.players if player.active] or [self.view_rect()]
+
+    def camera(self, alpha=1.0):
+        """view_rect() for a scrolling world, None for one that fits on screen and is drawn as is."""
+        return self.view_rect(alpha) if self.scrolling else None
+
+    def stream_chunks(self, inputs, dt):
+        views = self.views() if len(self.players) > 1 else [self.view_rect()]
+        if self.chunks.update(views[0].unionall(views[1:])):
+            self.obstacles = self.chunks.obstacles()
+            self.obstacle_grid.rebuild(self.obstacles)
+            if self.enemy_ai == 'pursue':
+                if self.flow_field is None:
+                    self.flow_field = FlowField(self.chunks.area(), self.obstacles)
+                else:
+                    self.flow_field.reset(self.chunks.area(), self.obstacles)
+
+    def spawn_echo(self, inputs, dt):
+        if self.state != PLAYING:
+            return
+        for player, player_inputs in self.controls():
+            if player_inputs.echo and len(player.history) > 0:
+                player.echoes.spawn()
+                self.events.append(EVENT_ECHO)
+
+    def update_player(self, inputs, dt):
+        if self.state != PLAYING:
+            for player in self.players:
+                player.visible = False
+            return
+        for player, player_inputs in self.controls():
+            player.visible = True
+            player.handle_movement(player_inputs, self.obstacle_grid, self.shattered_enemies, dt)
+            player.update_history()
+
+    def check_player_death(self, inputs, dt):
+        if self.state == PLAYING:
+            for player in self.living_players():
+                if self.enemies.overlapping(player.rect):
+                    self.kill_player(player)
+
+    def burst(self, x, y, size, kind):
+        """(rng, x, y) for a fragment burst: the world's own generator, or with
+        seeded_bursts a fresh one from a recorded seed, at a whole-pixel origin."""
+        if not self.seeded_bursts:
+            return self.rng, x, y
+        seed = self.rng.getrandbits(32)
+        x, y = round(x), round(y)
+        self.bursts.append((seed, x, y, size, kind))
+        return random.Random(seed), x, y
+
+    def kill_player(self, player=None):
+        player = player or self.player
+        rng, x, y = self.burst(player.pos.x, player.pos.y, player.size, player.index + 1)
+        player.shattered = ShatteredPlayer(
+            self.fragments,
+            x,
+            y,
+            player.size,
+            player.color,
+            num_fragments=FRAGMENTS_PER_BURST,
+            now=self.time,
+            rng=rng
+        )
+        player.alive = player.visible = False
+        self.events.append(EVENT_DEATH)
+        self.check_game_over()
+
+    def check_game_over(self):
+        if self.state != DEAD and not self.living_players():
+            self.state = DEAD
+            self.death_time = self.time
+
+    def shatter_enemy(self, enemy, player=None):
+        """Burst an enemy into fragments; it is removed at the next despawn."""
+        rng, x, y = self.burst(enemy.pos.x, enemy.pos.y, enemy.size, 0)
+        self.shattered_enemies.append(self.shattered_pool.acquire(
+            self.fragments,
+            x,
+            y,
+            enemy.size,
+            enemy.color,
+            num_fragments=FRAGMENTS_PER_BURST,
+            now=self.time,
+            rng=rng
+        ))
+        self.enemies.despawn(enemy.handle)
+        self.score += 10
+        (player or self.player).score += 10
+        self.events.append(EVENT_SHATTER)
+
+    def update_echoes(self, inputs, dt):
+        """Advance the echoes one sample; while playing, each shatters the first enemy it touches and is used up.
+
+        All of a player's echoes are tested against all enemies in one batch,
+        then hits are applied in row order, skipping enemies an earlier echo
+        already took. In versus, echoes that hit no enemy can still take
+        another player.
+        """
+        for player in self.players:
+            echoes = player.echoes
+            moved = echoes.advance()
+            if self.state != PLAYING or not moved.any():
+                continue
+            enemies = self.enemies
+            if enemies:
+                hits = enemies.overlap_matrix(echoes.rect_array()[moved])
+                handles = enemies.handle.tolist()
+                echo_handles = echoes.handle[moved].tolist()
+                taken = set()
+                for j in np.flatnonzero(hits.any(axis=1)).tolist():
+                    for k in np.flatnonzero(hits[j]).tolist():
+                        if handles[k] not in taken and enemies.alive(handles[k]):
+                            taken.add(handles[k])
+                            self.shatter_enemy(Enemy(enemies, handles[k]), player)
+                            echoes.despawn(echo_handles[j])
+                            break
+            if self.mode == 'versus':
+                self.echo_hits_players(player, moved)
+
+    def echo_hits_players(self, owner, moved):
+        echoes = owner.echoes
+        rects = echoes.rect_array()
+        for row in np.flatnonzero(moved).tolist():
+            handle = int(echoes.handle[row])
+            if not echoes.alive(handle):
+                continue
+            rect = pygame.Rect(rects[row].tolist())
+            for player in self.living_players():
+                if player is not owner and rect.colliderect(player.rect):
+                    self.kill_player(player)
+                    owner.score += PLAYER_KILL_SCORE
+                    self.score += PLAYER_KILL_SCORE
+                    echoes.despawn(handle)
+                    break
+
+    def despawn(self, inputs, dt):
+        for player in self.players:
+            player.echoes.flush()
+        self.enemies.flush()
+
+    def push_fragments(self, inputs, dt):
+        if self.state == PLAYING:
+            enemy_rects = self.enemies.rect_array()
+            for player in self.players:
+                if player.shattered:
+                    push_fragments([player.shattered],
+                                   [other.rect for other in self.living_players()] + enemy_rects.tolist())
+            push_fragments(self.shattered_enemies, enemy_rects)
+
+    def move_enemies(self, inputs, dt):
+        # Enemies keep moving after the player has died
+        enemies = self.enemies
+        if self.flow_field is not None:
+            # The field is only rebuilt when its target has moved to a new cell;
+            # with several players it follows the first one still standing
+            target = next(iter(self.living_players()), self.player)
+            self.flow_field.update(*target.rect.center)
+            self.flow_field.steer(enemies)
+        if not self.scrolling:
+            enemies.move(dt, self.obstacles, self.rng)
+            return
+        # Enemies near a view move every step, others in loaded chunks in
+        # staggered batches of OFFSCREEN_TICKS steps, and the rest wait
+        rects = enemies.rect_array()
+        area = self.chunks.area()
+        x, y = rects[:, 0], rects[:, 1]
+        centre_x, centre_y = x + rects[:, 2] // 2, y + rects[:, 3] // 2
+        views = self.views() if len(self.players) > 1 else [self.view_rect()]
+        is_near = np.zeros(len(x), dtype=bool)
+        for view in views:
+            near = view.inflate(2 * SIMULATION_MARGIN, 2 * SIMULATION_MARGIN)
+            is_near |= (x < near.right) & (x + rects[:, 2] > near.left) & (y < near.bottom) & (y + rects[:, 3] > near.top)
+        loaded = (centre_x >= area.left) & (centre_x < area.right) & (centre_y >= area.top) & (centre_y < area.bottom)
+        due = loaded & ~is_near & ((enemies.handle + self.steps) % OFFSCREEN_TICKS == 0)
+        enemies.move(dt, self.obstacles, self.rng, rows=np.flatnonzero(is_near))
+        enemies.move(dt * OFFSCREEN_TICKS, self.obstacles, self.rng, rows=np.flatnonzero(due),
+                     max_dt=enemies.max_dt * OFFSCREEN_TICKS)
+
+    def update_fragments(self, inputs, dt):
+        for player in self.players:
+            if player.shattered:
+                if not player.alive:
+                    player.shattered.update(dt, self.obstacles, self.time)
+                # Fragment pushes don't feed back into enemy movement, so a shattered
+                # player is pushed by all enemies in one batch after they have moved
+                push_fragments([player.shattered], self.enemies.rect_array())
+
+        if self.shattered_enemies:
+            fragments = self.fragments
+            fragments.update(dt, self.obstacles, self.time, fragments.rows(s.group for s in self.shattered_enemies))
+            visible = fragments.visible_groups()
+            shattered_enemies = self.shattered_enemies
+            kept = 0
+            for shattered_enemy in shattered_enemies:
+                if shattered_enemy.group in visible:
+                    shattered_enemies[kept] = shattered_enemy
+                    kept += 1
+                else:
+                    shattered_enemy.release()
+                    self.shattered_pool.release(shattered_enemy)
+            del shattered_enemies[kept:]
+            fragments.compact()
+
+    def check_level(self, inputs, dt):
+        if self.state == PLAYING and not self.enemies:
+            self.next_level()
+
+    def next_level(self):
+        self.level_number += 1
+        self.level = Level(self.level_number, self.tuning, self.layout)
+        if self.mode == 'coop':
+            for player in self.players:
+                if player.active and not player.alive:
+                    player.respawn(*PLAYER_STARTS[player.index])
+        self.spawn_wave()
+        for player in self.players:
+            player.echoes.clear()
+        self.events.append(EVENT_LEVEL_UP)
+
+    def checksum(self):
+        """CRC of the gameplay-relevant state, for checking that a replay reproduces a run."""
+        values = [self.steps, self.score, self.level_number, self.player.pos.x, self.player.pos.y]
+        enemies = self.enemies
+        values.extend(np.stack((enemies.x, enemies.y, enemies.dx, enemies.dy), axis=1).ravel().tolist())
+        values.extend(np.stack((self.echoes.x, self.echoes.y), axis=1).ravel().tolist())
+        for player in self.players[1:]:
+            values.extend([player.index, player.pos.x, player.pos.y, player.score, player.alive])
+            values.extend(np.stack((player.echoes.x, player.echoes.y), axis=1).ravel().tolist())
+        state = struct.pack(f'<{len(values)}d', *values) + self.state.encode()
+        return zlib.crc32(state)
+
+    def draw_obstacles(self, surface, view=None):
+        """Draw the obstacles; with a view rect, only those in it, in screen coordinates."""
+        for obstacle in self.obstacles:
+            if view is None or obstacle.rect.colliderect(view):
+                obstacle.draw(surface, view)
+
+    def draw_entities(self, surface, alpha=1.0, view=None):
+        """Draw everything that moves; entity_rects() gives the areas this touches.
+
+        With `interpolate` on, alpha in [0, 1) draws the entities that far
+        between their positions before and after the last step. With a view
+        rect (see camera()), only what is in it is drawn, shifted to its topleft.
+        """
+        if not self.interpolate:
+            alpha = 1.0
+        for player in self.players:
+            player.echoes.draw(surface, alpha, view)
+        if self.shattered_enemies:
+            self.fragments.draw(surface, self.fragments.rows(s.group for s in self.shattered_enemies), alpha, view)
+        self.enemies.draw(surface, alpha, view)
+        for player in self.players:
+            if player.shattered:
+                player.shattered.draw(surface, alpha, view)
+        for player in self.players:
+            player.draw(surface, alpha=alpha, view=view)
+
+    def entity_rects(self, alpha=1.0, view=None):
+        """The areas draw_entities() would draw on, without drawing."""
+        if not self.interpolate:
+            alpha = 1.0
+        rects = [self.fragments.group_bounds(shattered_enemy.group, alpha) for shattered_enemy in self.shattered_enemies]
+        for player in self.players:
+            if player.shattered:
+                rects.append(self.fragments.group_bounds(player.shattered.group, alpha))
+        for player in self.players:
+            if player.visible:
+                rects.append(player.rect_at(alpha).copy())
+        if view is not None:
+            rects = [rect.move(-view.x, -view.y) for rect in rects if rect.colliderect(view)]
+        echo_rects = [rect for player in self.players for rect in player.echoes.rects(alpha, view)]
+        rects = echo_rects + rects + self.enemies.rects(alpha, view)
+        return [rect for rect in rects if rect]
+
+    def draw(self, surface, alpha=1.0, view=None):
+        self.draw_obstacles(surface, view)
+        self.draw_entities(surface, alpha, view)